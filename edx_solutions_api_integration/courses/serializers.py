@@ -14,7 +14,20 @@ class GradeSerializer(serializers.Serializer):
 
 
 class BaseCourseLeadersSerializer(serializers.Serializer):
-    """ Base Serializer for course leaderboard """
+    """
+    Base Serializer for course leaderboard
+    Leaderboard rows are cached as tuples of `row_fields` values, see `compact_rows` and `expand_rows`
+    """
+    user_fields = (
+        'user__id',
+        'user__username',
+        'user__first_name',
+        'user__last_name',
+        'user__profile__title',
+        'user__profile__profile_image_uploaded_at',
+    )
+    score_fields = ()
+
     id = serializers.IntegerField(source='user__id')  # pylint: disable=invalid-name
     username = serializers.CharField(source='user__username')
     title = serializers.CharField(source='user__profile__title')
@@ -39,9 +52,34 @@ class BaseCourseLeadersSerializer(serializers.Serializer):
         last = data['user__last_name'][0] if data['user__last_name'] else ''
         return ('{} {}'.format(data['user__first_name'], last)).strip()
 
+    @classmethod
+    def row_fields(cls):
+        """
+        Returns fields of a leaderboard row needed to serialize it
+        """
+        return cls.user_fields + cls.score_fields
+
+    @classmethod
+    def compact_rows(cls, rows):
+        """
+        Encodes leaderboard rows as tuples of raw values, presentation fields are left out
+        """
+        row_fields = cls.row_fields()
+        return [tuple(row[field] for field in row_fields) for row in rows]
+
+    @classmethod
+    def expand_rows(cls, compact_rows):
+        """
+        Decodes leaderboard rows encoded by `compact_rows` back to dicts
+        """
+        row_fields = cls.row_fields()
+        return [dict(zip(row_fields, row)) for row in compact_rows]
+
 
 class CourseProficiencyLeadersSerializer(BaseCourseLeadersSerializer):
     """ Serializer for course proficiency leaderboard """
+    score_fields = ('grade', 'modified')
+
     # Percentage grade (versus letter grade)
     grade = serializers.FloatField()
     recorded = serializers.DateTimeField(source='modified')
@@ -49,6 +87,8 @@ class CourseProficiencyLeadersSerializer(BaseCourseLeadersSerializer):
 
 class CourseCompletionsLeadersSerializer(BaseCourseLeadersSerializer):
     """ Serializer for course completions leaderboard """
+    score_fields = ('percent',)
+
     completions = serializers.SerializerMethodField('get_completion_percentage')
 
     def get_completion_percentage(self, obj):
@@ -60,10 +100,29 @@ class CourseCompletionsLeadersSerializer(BaseCourseLeadersSerializer):
 
 class CourseSocialLeadersSerializer(BaseCourseLeadersSerializer):
     """ Serializer for course leaderboard """
+    score_fields = ('score', 'modified')
+
     score = serializers.IntegerField()
     recorded = serializers.DateTimeField(source='modified')
 
 
+class OrganizationCompletionsLeadersSerializer(BaseCourseLeadersSerializer):
+    """ Serializer for organization completions leaderboard across courses """
+    score_fields = ('courses', 'total_earned', 'total_possible')
+
+    courses = serializers.IntegerField()
+    earned = serializers.FloatField(source='total_earned')
+    completions = serializers.SerializerMethodField('get_completion_percentage')
+
+    def get_completion_percentage(self, obj):
+        """
+        formats completions earned across courses as percentage of possible completions
+        """
+        if not obj['total_possible']:
+            return 0
+        return obj['total_earned'] / obj['total_possible'] * 100
+
+
 class CourseSerializer(serializers.Serializer):
     """ Serializer for Courses """
     id = serializers.CharField()  # pylint: disable=invalid-name
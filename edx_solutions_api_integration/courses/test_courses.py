@@ -22,7 +22,7 @@ from completion_aggregator.models import Aggregator
 from completion_aggregator.tasks import aggregation_tasks
 from dateutil.relativedelta import relativedelta
 from django.conf import settings
-from django.contrib.auth.models import Group
+from django.contrib.auth.models import Group, User
 from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
 from django.urls import reverse
@@ -32,11 +32,15 @@ from django.utils import timezone
 from openedx.core.djangoapps.django_comment_common.models import FORUM_ROLE_MODERATOR, Role
 from edx_solutions_api_integration.courseware_access import (
     get_course_descriptor, get_course_key)
+from edx_solutions_api_integration.models import CourseMetricsSnapshot
 from edx_solutions_api_integration.test_utils import (
     APIClientMixin, CourseGradingMixin, SignalDisconnectTestMixin,
     make_non_atomic)
 from edx_solutions_api_integration.utils import (
-    COHORT_NAMESPACE, COHORT_SWITCH, strip_whitespaces_and_newlines)
+    COHORT_NAMESPACE, COHORT_SWITCH, FORUM_STATS_CIRCUIT_BREAKER,
+    get_cache_stats, get_cached_data, get_cached_data_many,
+    invalid_user_data_cache, reset_cache_stats,
+    strip_whitespaces_and_newlines)
 from edx_solutions_organizations.models import Organization
 from edx_solutions_projects.models import Project, Workgroup
 from freezegun import freeze_time
@@ -49,7 +53,7 @@ from openedx.core.djangolib.testing.utils import CacheIsolationTestCase
 from requests.exceptions import ConnectionError
 from rest_framework import status
 from social_engagement.models import StudentSocialEngagementScore
-from student.models import CourseEnrollment
+from student.models import CourseAccessRole, CourseEnrollment
 from student.tests.factories import (CourseEnrollmentFactory, GroupFactory,
                                      UserFactory)
 from waffle.testutils import override_switch
@@ -2397,6 +2401,112 @@ class CoursesApiTests(
         self.assertEqual(len(response.data['leaders']), 4)
         self.assertEqual('{:.3f}'.format(response.data['course_avg']), expected_course_avg)
 
+    def test_course_metrics_leaders_single_cache_fetch(self):
+        """
+        Test combined course metrics leaders fetches cached data of all leaderboards at once
+        """
+        setup_data = self._setup_courses_completions_leaders()
+        test_uri = '{}/{}/metrics/leaders/?user_id={}'.format(
+            self.base_courses_uri, str(setup_data['course'].id), setup_data['users'][0].id
+        )
+        with mock.patch(
+            'edx_solutions_api_integration.courses.views.get_cached_data_many', wraps=get_cached_data_many
+        ) as mock_get_cached_data_many:
+            response = self.do_get(test_uri)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_get_cached_data_many.call_count, 1)
+        self.assertEqual(len(response.data['completions']['leaders']), 3)
+
+    def test_courses_completions_leaders_list_get_positions(self):
+        """
+        Test positions of several users are returned at once, honoring group filter and exclusions
+        """
+        setup_data = self._setup_courses_completions_leaders()
+        users = setup_data['users']
+        user_ids = [users[3].id, users[0].id, users[4].id, 987654]
+        test_uri = '{}?user_ids={}'.format(setup_data['leaders_uri'], ','.join(str(user_id) for user_id in user_ids))
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        positions = {position['id']: position for position in response.data['positions']}
+        self.assertEqual(positions[users[3].id]['position'], 1)
+        self.assertGreater(positions[users[3].id]['completions'], positions[users[0].id]['completions'])
+        self.assertEqual(positions[users[0].id]['position'], 4)
+        # observers and users without progress have no position
+        self.assertIsNone(positions[users[4].id]['position'])
+        self.assertIsNone(positions[987654]['position'])
+        self.assertIsNone(positions[987654]['completions'])
+
+        response = self.do_get('{}&groups={}'.format(test_uri, setup_data['groups'][1].id))
+        self.assertEqual(response.status_code, 200)
+        positions = {position['id']: position for position in response.data['positions']}
+        self.assertEqual(positions[users[3].id]['position'], 1)
+        self.assertEqual(positions[users[0].id]['position'], 3)
+
+        # users no longer enrolled are left out of positions with or without filters
+        with mock.patch('edx_solutions_api_integration.receivers.transaction.on_commit', lambda func: func()):
+            CourseEnrollment.unenroll(users[3], setup_data['course'].id)
+        response = self.do_get(test_uri)
+        positions = {position['id']: position for position in response.data['positions']}
+        self.assertIsNone(positions[users[3].id]['position'])
+        self.assertEqual(positions[users[0].id]['position'], 3)
+        response = self.do_get('{}&groups={}'.format(test_uri, setup_data['groups'][1].id))
+        positions = {position['id']: position for position in response.data['positions']}
+        self.assertEqual(positions[users[0].id]['position'], 2)
+
+    def test_courses_completions_leaders_list_get_around(self):
+        """
+        Test leaders around a user are returned with their positions
+        """
+        setup_data = self._setup_courses_completions_leaders()
+        users = setup_data['users']
+        response = self.do_get('{}?around={}&radius=2'.format(setup_data['leaders_uri'], users[3].id))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([leader['position'] for leader in response.data['around']], [1, 2, 3])
+        self.assertEqual(response.data['around'][0]['id'], users[3].id)
+
+        response = self.do_get('{}?around={}&radius=1'.format(setup_data['leaders_uri'], users[0].id))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([leader['position'] for leader in response.data['around']], [3, 4])
+        self.assertEqual(response.data['around'][1]['id'], users[0].id)
+        self.assertIn('profile_image', response.data['around'][1])
+
+        # observers are excluded from leaderboard
+        response = self.do_get('{}?around={}'.format(setup_data['leaders_uri'], users[4].id))
+        self.assertEqual(response.data['around'], [])
+
+        # users no longer enrolled are left out of positions as well as neighbours
+        with mock.patch('edx_solutions_api_integration.receivers.transaction.on_commit', lambda func: func()):
+            CourseEnrollment.unenroll(users[3], setup_data['course'].id)
+        response = self.do_get('{}?around={}&radius=1'.format(setup_data['leaders_uri'], users[0].id))
+        self.assertEqual([leader['position'] for leader in response.data['around']], [1, 2, 3])
+        self.assertNotIn(users[3].id, [leader['id'] for leader in response.data['around']])
+
+        response = self.do_get('{}?around=abc'.format(setup_data['leaders_uri']))
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_course_metrics_completions_leaders_compact_cache(self):
+        """
+        Test completions leaderboard is cached as compact rows and expanded at response time
+        """
+        setup_data = self._setup_courses_completions_leaders()
+        course_id = str(setup_data['course'].id)
+        test_uri = '{}?user_id={}'.format(setup_data['leaders_uri'], setup_data['users'][0].id)
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('leader_rows', response.data)
+
+        cached_leaderboard = get_cached_data('progress_leaderboard', course_id)
+        self.assertNotIn('leaders', cached_leaderboard)
+        self.assertEqual(len(cached_leaderboard['leader_rows']), 3)
+        self.assertIsInstance(cached_leaderboard['leader_rows'][0], tuple)
+
+        cached_response = self.do_get(test_uri)
+        self.assertEqual(cached_response.status_code, 200)
+        self.assertEqual(cached_response.data['leaders'], response.data['leaders'])
+        self.assertIn('profile_image', cached_response.data['leaders'][0])
+
     def test_course_project_list(self):
         projects_uri = self.base_projects_uri
 
@@ -2502,6 +2612,207 @@ class CoursesApiTests(
         response = self.do_get(course_metrics_uri)
         self.assertEqual(response.status_code, 404)
 
+    @mock.patch(
+        "edx_solutions_api_integration.courses.views.get_course_thread_stats",
+        mock.Mock(side_effect=ConnectionError('Forum service is down')),
+    )
+    def test_courses_data_metrics_partial_results(self):
+        self.addCleanup(FORUM_STATS_CIRCUIT_BREAKER.reset)
+        self.login()
+        course = CourseFactory()
+        for _ in range(0, 2):
+            CourseEnrollmentFactory(user=UserFactory(), course_id=course.id)
+
+        course_metrics_uri = '{}/?metrics_required=users_started,thread_stats'.format(
+            reverse('course-metrics', kwargs={'course_id': str(course.id)})
+        )
+        response = self.do_get(course_metrics_uri)
+        self.assertEqual(response.status_code, 200)
+        # metrics computed before the forum error are still returned
+        self.assertEqual(response.data['users_enrolled'], 2)
+        self.assertEqual(response.data['users_not_started'], 2)
+        self.assertNotIn('thread_stats', response.data)
+        self.assertEqual(response.data['metrics_errors'], {'thread_stats': 'unavailable'})
+        self.assertEqual(response.data['err_msg'], 'Forum service is unavailable')
+
+    def test_courses_data_metrics_snapshot(self):
+        course = CourseFactory()
+        for _ in range(0, 2):
+            CourseEnrollmentFactory(user=UserFactory(), course_id=course.id)
+        CourseMetricsSnapshot.objects.create(
+            course_key=course.id,
+            users_enrolled=10,
+            users_started=7,
+            modules_completed=30,
+            users_completed=2,
+            users_passed=3,
+            avg_progress=45.5,
+            avg_grade=0.7,
+        )
+        course_metrics_uri = '{}/?metrics_required={}'.format(
+            reverse('course-metrics', kwargs={'course_id': str(course.id)}),
+            'users_started,modules_completed,users_completed,users_passed,avg_grade,avg_progress',
+        )
+        response = self.do_get(course_metrics_uri)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['users_enrolled'], 10)
+        self.assertEqual(response.data['users_started'], 7)
+        self.assertEqual(response.data['users_not_started'], 3)
+        self.assertEqual(response.data['modules_completed'], 30)
+        self.assertEqual(response.data['users_completed'], 2)
+        self.assertEqual(response.data['users_passed'], 3)
+        self.assertEqual(response.data['avg_progress'], 45.5)
+        self.assertEqual(response.data['avg_grade'], 0.7)
+        self.assertIsNotNone(response.data['grade_cutoffs'])
+
+        response = self.do_get('{}&fresh=true'.format(course_metrics_uri))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['users_enrolled'], 2)
+
+        response = self.do_get('{}/{}/enrollment_count'.format(self.base_courses_uri, str(course.id)))
+        self.assertEqual(response.data['enrollment_count'], 10)
+        response = self.do_get('{}/{}/enrollment_count?fresh=true'.format(self.base_courses_uri, str(course.id)))
+        self.assertEqual(response.data['enrollment_count'], 2)
+
+        response = self.do_get('{}/{}/average_scores/proficiency'.format(self.base_courses_uri, str(course.id)))
+        self.assertEqual(response.data['proficiency'], 0.7)
+
+    def test_courses_metrics_distribution(self):
+        course = CourseFactory()
+        for earned, grade in [(1, 0.2), (3, 0.4), (5, 0.6), (10, 0.95)]:
+            user = UserFactory()
+            CourseEnrollmentFactory(user=user, course_id=course.id)
+            Aggregator.objects.submit_completion(
+                user=user,
+                course_key=course.id,
+                block_key=course.location,
+                aggregation_name='course',
+                possible=10,
+                earned=earned,
+                last_modified=timezone.now(),
+            )
+            StudentGradebook.objects.update_or_create(
+                user=user, course_id=course.id, defaults={'grade': grade, 'proforma_grade': grade}
+            )
+
+        distribution_uri = reverse('course-metrics-distribution', kwargs={'course_id': str(course.id)})
+        response = self.do_get('{}?metric=progress&buckets=2&percentiles=50,100'.format(distribution_uri))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_users'], 4)
+        self.assertEqual(
+            response.data['histogram'],
+            [{'min': 0.0, 'max': 0.5, 'count': 2}, {'min': 0.5, 'max': 1.0, 'count': 2}]
+        )
+        self.assertEqual(response.data['percentiles'], {'50': 0.3, '100': 1.0})
+
+        response = self.do_get('{}?metric=grade&buckets=10'.format(distribution_uri))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['histogram']), 10)
+        self.assertEqual([bucket['count'] for bucket in response.data['histogram']], [0, 0, 1, 0, 1, 0, 1, 0, 0, 1])
+        self.assertEqual(round(response.data['average'], 2), 0.54)
+
+        response = self.do_get('{}?metric=social'.format(distribution_uri))
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_courses_engagement_summary(self):
+        self.staff_login()
+        course = CourseFactory()
+        users = UserFactory.create_batch(3)
+        for user, earned in zip(users, [5, 10, 2]):
+            CourseEnrollmentFactory(user=user, course_id=course.id)
+            Aggregator.objects.submit_completion(
+                user=user,
+                course_key=course.id,
+                block_key=course.location,
+                aggregation_name='course',
+                possible=10,
+                earned=earned,
+                last_modified=timezone.now(),
+            )
+        User.objects.filter(id=users[0].id).update(last_login=timezone.now())
+        User.objects.filter(id=users[1].id).update(last_login=timezone.now() - timedelta(days=30))
+        User.objects.filter(id=users[2].id).update(is_active=False)
+
+        summary_uri = '{}/{}/engagement_summary'.format(self.base_courses_uri, str(course.id))
+        response = self.do_get(summary_uri)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_users'], 3)
+        self.assertEqual(response.data['active_users'], 2)
+        self.assertEqual(response.data['engaged_users'], 2)
+        self.assertEqual(response.data['last_week_login_users'], 1)
+        self.assertEqual(response.data['total_course_progress'], 50)
+        self.assertEqual(response.data['engaged_users_progress'], 75)
+        self.assertEqual(response.data['last_week_login_users_progress'], 50)
+
+        # summary is served from cache unless fresh one is requested
+        User.objects.filter(id=users[1].id).update(last_login=timezone.now())
+        response = self.do_get(summary_uri)
+        self.assertEqual(response.data['last_week_login_users'], 1)
+        response = self.do_get('{}?fresh=true'.format(summary_uri))
+        self.assertEqual(response.data['last_week_login_users'], 2)
+        self.assertEqual(response.data['last_week_login_users_progress'], 75)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_organization_metrics_completions_leaders(self):
+        """
+        Test leaders are ranked by completions earned across courses of an organization and cached
+        """
+        organization = Organization.objects.create(name='Leaders Org', display_name='Leaders Org')
+        courses = [CourseFactory(), CourseFactory()]
+        users = UserFactory.create_batch(3)
+        outsider = UserFactory()
+        organization.users.add(*users)
+        earned = {
+            (users[0], courses[0]): 5, (users[0], courses[1]): 2,
+            (users[1], courses[0]): 8,
+            (users[2], courses[0]): 10, (users[2], courses[1]): 1,
+            (outsider, courses[0]): 10,
+        }
+        for (user, course), user_earned in earned.items():
+            CourseEnrollmentFactory(user=user, course_id=course.id)
+            Aggregator.objects.submit_completion(
+                user=user,
+                course_key=course.id,
+                block_key=course.location,
+                aggregation_name='course',
+                possible=10,
+                earned=user_earned,
+                last_modified=timezone.now(),
+            )
+        # observers are left out of courses they observe
+        CourseAccessRole.objects.create(user=users[2], course_id=courses[0].id, role='observer')
+
+        leaders_uri = reverse('organization-metrics-completions-leaders', kwargs={'organization_id': organization.id})
+        response = self.do_get(leaders_uri)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([leader['id'] for leader in response.data['leaders']], [users[1].id, users[0].id, users[2].id])
+        self.assertEqual(response.data['leaders'][1]['courses'], 2)
+        self.assertEqual(response.data['leaders'][1]['earned'], 7)
+        self.assertEqual(response.data['leaders'][1]['completions'], 35)
+
+        response = self.do_get('{}?count=1&courses={}'.format(leaders_uri, str(courses[1].id)))
+        self.assertEqual([leader['id'] for leader in response.data['leaders']], [users[0].id])
+
+        # leaderboard is served from cache until organization members change
+        Aggregator.objects.submit_completion(
+            user=users[0],
+            course_key=courses[0].id,
+            block_key=courses[0].location,
+            aggregation_name='course',
+            possible=10,
+            earned=10,
+            last_modified=timezone.now(),
+        )
+        response = self.do_get(leaders_uri)
+        self.assertEqual(response.data['leaders'][0]['id'], users[1].id)
+        organization.users.add(outsider)
+        response = self.do_get(leaders_uri)
+        self.assertEqual([leader['id'] for leader in response.data['leaders']], [users[0].id, outsider.id, users[1].id])
+
+        response = self.do_get(reverse('organization-metrics-completions-leaders', kwargs={'organization_id': 9999}))
+        self.assertEqual(response.status_code, 404)
+
     def test_course_data_metrics_user_group_filter_for_empty_group(self):
         group = GroupFactory.create()
 
@@ -2687,6 +2998,47 @@ class CoursesApiTests(
         response = self.do_get('{}/{}/metrics/cities/'.format(self.base_courses_uri, self.test_bogus_course_id))
         self.assertEqual(response.status_code, 404)
 
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_course_users_count_by_city_cache(self):
+        course = CourseFactory()
+        users = []
+        for city in ['Denver', 'Denver', 'Dallas', 'Boston']:
+            user = UserFactory()
+            user.profile.city = city
+            user.profile.save()
+            CourseEnrollmentFactory(user=user, course_id=course.id)
+            users.append(user)
+        reset_cache_stats()
+        self.addCleanup(reset_cache_stats)
+
+        cities_uri = '{}/{}/metrics/cities/'.format(self.base_courses_uri, str(course.id))
+        response = self.do_get('{}?city=Denver,dallas'.format(cities_uri))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, [{'city': 'Denver', 'count': 2}, {'city': 'Dallas', 'count': 1}])
+
+        # same cities in another order and case are served from cache
+        response = self.do_get('{}?city=DALLAS, denver&page_size=10'.format(cities_uri))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, [{'city': 'Denver', 'count': 2}, {'city': 'Dallas', 'count': 1}])
+        self.assertEqual(get_cache_stats()['cities_count']['hits'], 1)
+
+        response = self.do_get('{}?city=Boston'.format(cities_uri))
+        self.assertEqual(response.data, [{'city': 'Boston', 'count': 1}])
+        self.assertEqual(get_cache_stats()['cities_count']['misses'], 2)
+
+        # excluded users of the course changing invalidates cached counts
+        invalid_user_data_cache('exclude_users', str(course.id))
+        response = self.do_get('{}?city=Boston'.format(cities_uri))
+        self.assertEqual(get_cache_stats()['cities_count']['misses'], 3)
+
+        # an enrolled user moving to another city invalidates cached counts
+        with mock.patch('edx_solutions_api_integration.receivers.transaction.on_commit', lambda func: func()):
+            users[3].profile.city = 'Dallas'
+            users[3].profile.save()
+        response = self.do_get('{}?city=Boston'.format(cities_uri))
+        self.assertEqual(response.data, [])
+        self.assertEqual(get_cache_stats()['cities_count']['misses'], 4)
+
     def test_courses_roles_list_get(self):
         allow_access(self.course, self.users[0], 'staff')
         allow_access(self.course, self.users[1], 'instructor')
@@ -3686,6 +4038,31 @@ class CoursesSocialMetricsApiTests(
         self.assertEqual(response.data['course_avg'], 4)
         self.assertEqual(len(response.data['leaders']), len(org_users))
 
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_social_metrics_leader_list_with_organizations_cache(self):
+        """
+        Tests organization filtered social leaderboard is cached until organization members change
+        """
+        org_id = self._create_org_with_users([self.users[0].id, self.users[1].id])
+        uri = "{}?organizations={}&user_id={}".format(self.social_leaders_api, org_id, self.users[0].id)
+        response = self.do_get(uri)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([leader['id'] for leader in response.data['leaders']], [self.users[1].id, self.users[0].id])
+
+        # leaderboard of the same filters is served from cache
+        StudentSocialEngagementScore.objects.filter(user=self.users[0], course_id=self.course.id).update(score=100)
+        response = self.do_get(uri)
+        self.assertEqual([leader['id'] for leader in response.data['leaders']], [self.users[1].id, self.users[0].id])
+        self.assertEqual(response.data['position'], 2)
+
+        Organization.objects.get(id=org_id).users.add(self.users[2])
+        response = self.do_get(uri)
+        self.assertEqual(
+            [leader['id'] for leader in response.data['leaders']],
+            [self.users[0].id, self.users[2].id, self.users[1].id],
+        )
+        self.assertEqual(response.data['position'], 1)
+
     def test_social_metrics_leader_list_with_user_position(self):
         """
         Tests social metrics leader list API with user_id parameter
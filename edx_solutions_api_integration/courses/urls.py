@@ -42,6 +42,8 @@ urlpatterns = [
         courses_views.CoursesMetricsCities.as_view(), name='courses-cities-metrics'),
     url(r'^{}/metrics/completions/leaders/*$'.format(COURSE_ID_PATTERN),
         courses_views.CoursesMetricsCompletionsLeadersList.as_view(), name='course-metrics-completions-leaders'),
+    url(r'^{}/metrics/distribution/*$'.format(COURSE_ID_PATTERN),
+        courses_views.CoursesMetricsDistribution.as_view(), name='course-metrics-distribution'),
     url(r'^{}/metrics/grades/*$'.format(COURSE_ID_PATTERN), courses_views.CoursesMetricsGradesList.as_view()),
     url(r'^{}/metrics/grades/leaders/*$'.format(COURSE_ID_PATTERN),
         courses_views.CoursesMetricsGradesLeadersList.as_view(), name='course-metrics-grades-leaders'),
@@ -1,10 +1,55 @@
+import logging
+import math
+from collections import defaultdict
+from itertools import chain
+
+from completion.models import BlockCompletion
 from completion_aggregator.models import Aggregator
-from django.db.models import Avg, Q, Sum
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import (Avg, BooleanField, Case, Count, Exists, F,
+                              Max, Min, OuterRef, Q, Sum, Value, When,
+                              Window)
+from django.db.models.functions import Floor, Least, Rank, RowNumber
+from django.utils import timezone
+from edx_solutions_api_integration.courses.serializers import (
+    CourseCompletionsLeadersSerializer, CourseProficiencyLeadersSerializer,
+    CourseSocialLeadersSerializer, OrganizationCompletionsLeadersSerializer)
 from edx_solutions_api_integration.courseware_access import get_course_key
+from edx_solutions_api_integration.models import (CourseDailyMetric,
+                                                  CourseMetricsSnapshot)
 from edx_solutions_api_integration.utils import (
-    cache_course_data, get_aggregate_exclusion_user_ids,
-    get_cached_data, get_non_actual_company_users)
-from student.models import CourseEnrollment
+    TIME_SERIES_CACHE_TTL, RankIndex, Round, UserExclusion, cache_course_data,
+    exclude_users_from, get_cache_category, get_cache_generation,
+    get_cache_generations, get_cached_data, get_rank_index,
+    get_time_series_data, invalid_user_data_cache, is_int,
+    record_rank_index_change, run_concurrently, strip_time)
+from edx_solutions_organizations.models import Organization
+from gradebook.models import StudentGradebook
+from lms.djangoapps.courseware.models import StudentModule
+from social_engagement.models import StudentSocialEngagementScore
+from student.models import CourseAccessRole, CourseEnrollment
+from student.roles import CourseObserverRole
+
+log = logging.getLogger(__name__)
+
+# model, course key field, score field and filters of scores ranked by each leaderboard metric
+RANK_INDEX_SOURCES = {
+    'progress': (Aggregator, 'course_key', 'percent', {'aggregation_name': 'course'}),
+    'grade': (StudentGradebook, 'course_id', 'grade', {}),
+    'social': (StudentSocialEngagementScore, 'course_id', 'score', {}),
+}
+
+# course roles of users left out of progress leaderboard notifications
+PROGRESS_LEADERS_EXCLUDED_ROLES = ['staff', 'observer', 'assistant', 'instructor']
+
+# cache categories precomputed by `warm_course_metrics_cache`
+WARMED_CACHE_CATEGORIES = [
+    'course_enrollments', 'grade_leaderboard', 'grade', 'passed_count', 'completed_count',
+    'progress_leaderboard', 'progress', 'social_leaderboard', 'social',
+]
 
 
 def get_filtered_aggregation_queryset(course_key, **kwargs):
@@ -14,7 +59,15 @@ def get_filtered_aggregation_queryset(course_key, **kwargs):
         user__courseenrollment__is_active=True,
         user__courseenrollment__course_id__exact=course_key,
         aggregation_name='course',
-    ).exclude(user_id__in=kwargs.get('exclude_users') or [])
+    )
+    return _filter_aggregation_queryset(queryset, **kwargs)
+
+
+def _filter_aggregation_queryset(queryset, **kwargs):
+    """
+    Applies excluded users, organization, group and cohort filters to a queryset of course aggregations
+    """
+    queryset = exclude_users_from(queryset, kwargs.get('exclude_users'))
 
     if kwargs.get('org_ids'):
         queryset = queryset.filter(user__organizations__in=kwargs.get('org_ids'))
@@ -82,6 +135,66 @@ def generate_leaderboard(course_key, **kwargs):
     return queryset
 
 
+def get_organization_aggregation_queryset(org_id, **kwargs):
+    """
+    Returns course aggregations of users of an organization across all courses they are enrolled in,
+    or only in `course_keys` when given. Users having one of `exclude_roles` (`AGGREGATION_EXCLUDE_ROLES`
+    setting by default) in a course are left out of that course
+    """
+    queryset = Aggregator.objects.filter(
+        user__is_active=True,
+        user__courseenrollment__is_active=True,
+        user__courseenrollment__course_id=F('course_key'),
+        aggregation_name='course',
+    )
+    if kwargs.get('course_keys'):
+        queryset = queryset.filter(course_key__in=kwargs.get('course_keys'))
+
+    excluded_roles = CourseAccessRole.objects.filter(
+        user_id=OuterRef('user_id'),
+        course_id=OuterRef('course_key'),
+        role__in=kwargs.get('exclude_roles') or getattr(
+            settings, 'AGGREGATION_EXCLUDE_ROLES', [CourseObserverRole.ROLE]
+        ),
+    )
+    queryset = queryset.annotate(has_excluded_role=Exists(excluded_roles)).filter(has_excluded_role=False)
+    return _filter_aggregation_queryset(
+        queryset, org_ids=[org_id], exclude_users=kwargs.get('exclude_users')
+    )
+
+
+def generate_organization_leaderboard(org_id, **kwargs):
+    """
+    Assembles Top N users of an organization by completions earned across courses of the organization,
+    aggregating course progress of all courses in a single GROUP BY query
+
+    data = [
+            {
+                'user__id': 123,
+                'user__username': 'testuser1',
+                ...
+                'courses': 4,
+                'total_earned': 120.0,
+                'total_possible': 160.0,
+            },
+    ]
+    """
+    count = kwargs.get('count')
+    queryset = get_organization_aggregation_queryset(org_id, **kwargs).filter(percent__gt=0)
+    queryset = queryset.values(
+        *OrganizationCompletionsLeadersSerializer.user_fields
+    ).annotate(
+        courses=Count('course_key', distinct=True),
+        total_earned=Sum('earned'),
+        total_possible=Sum('possible'),
+        last_modified=Max('modified'),
+    ).order_by('-total_earned', 'last_modified')
+    if count:
+        queryset = queryset[:int(count)]
+
+    return queryset
+
+
 def get_total_completions(course_key, **kwargs):
     queryset = get_filtered_aggregation_queryset(course_key, **kwargs)
     aggregate = queryset.aggregate(earned=Sum('earned'), possible=Avg('possible'))
@@ -99,6 +212,12 @@ def get_user_position(course_key, **kwargs):
     data = {"completions": 22, "position": 4}
     """
     data = {"completions": 0, "position": 0}
+    indexed_position = get_indexed_user_position('progress', course_key, **kwargs)
+    if indexed_position is not None:
+        user_completions, data['position'] = indexed_position
+        data['completions'] = user_completions * 100
+        return data
+
     try:
         queryset = Aggregator.objects.get(
             course_key=course_key,
@@ -123,7 +242,8 @@ def get_user_position(course_key, **kwargs):
             course_key=course_key,
             user__is_active=True,
             aggregation_name='course',
-        ).exclude(user__id__in=kwargs.get('exclude_users') or [])
+        )
+        users_above_qs = exclude_users_from(users_above_qs, kwargs.get('exclude_users'))
 
         if kwargs.get('cohort_user_ids'):
             users_above_qs = users_above_qs.filter(user__id__in=kwargs.get('cohort_user_ids'))
@@ -135,6 +255,342 @@ def get_user_position(course_key, **kwargs):
     return data
 
 
+def get_course_rank_index(metric, course_key, exclude_users=None):
+    """
+    Returns rank index of scores of a leaderboard metric (`progress`, `grade` or `social`) in a course,
+    holding the same users actively enrolled in the course as `get_filtered_score_queryset` except
+    `exclude_users`, a `UserExclusion`.
+    Completion aggregator updates most course aggregators with bulk upserts, which send no `post_save`
+    signal, so progress positions served from the index may lag those writes until the index expires
+    from worker's local cache after `RANK_INDEX_LOCAL_CACHE_TTL` seconds and is rebuilt
+    """
+    score_field = RANK_INDEX_SOURCES[metric][2]
+
+    def _build_rank_index():
+        return get_filtered_score_queryset(metric, course_key).values_list('user_id', score_field, 'modified')
+
+    return get_rank_index(metric, course_key, _build_rank_index, exclude_users=exclude_users)
+
+
+def _get_course_rank_index_for(metric, course_key, **kwargs):
+    """
+    Returns course rank index of a leaderboard metric leaving out users excluded from the leaderboard
+    """
+    exclude_users = kwargs.get('exclude_users')
+    return get_course_rank_index(
+        metric, course_key, exclude_users=exclude_users if isinstance(exclude_users, UserExclusion) else None
+    )
+
+
+def _is_rank_indexed(**kwargs):
+    """
+    Returns whether positions in a leaderboard filtered by `kwargs` can be looked up in a course rank index,
+    which holds all users of the course except users of a `UserExclusion`
+    """
+    exclude_users = kwargs.get('exclude_users')
+    if any(kwargs.get(param) for param in ('org_ids', 'group_ids', 'cohort_user_ids')):
+        return False
+    return isinstance(exclude_users, UserExclusion) or not exclude_users
+
+
+def record_user_rank_index_changes(user_id, course_key, metrics=None):
+    """
+    Shares current scores of a user in leaderboard `metrics` of a course, all of them by default, with
+    rank indexes. Scores are read the way indexes are built, so entries of users who are not actively
+    enrolled in the course are removed
+    """
+    for metric in metrics or RANK_INDEX_SOURCES:
+        score_field = RANK_INDEX_SOURCES[metric][2]
+        user_score = get_filtered_score_queryset(metric, course_key).filter(
+            user_id=user_id
+        ).values_list(score_field, 'modified').first()
+        record_rank_index_change(metric, course_key, user_id, *(user_score or ()))
+
+
+def get_indexed_user_position(metric, course_key, **kwargs):
+    """
+    Returns a tuple of user's score and position in a leaderboard metric looked up in rank index.
+    Returns None when leaderboard is filtered by organizations, groups or cohort, or user has no score,
+    callers then fall back to counting users ranked above
+    """
+    user_id = kwargs.get('user_id')
+    if user_id is None or not is_int(user_id) or not _is_rank_indexed(**kwargs):
+        return None
+
+    rank_index = _get_course_rank_index_for(metric, course_key, **kwargs)
+    position = rank_index.get_position(int(user_id))
+    if position is None:
+        return None
+    return rank_index.get_score(int(user_id)), position
+
+
+def get_filtered_score_queryset(metric, course_key, **kwargs):
+    """
+    Returns scores of a leaderboard metric of users actively enrolled in a course, filtered the same way
+    as `get_filtered_aggregation_queryset`. Organization and group filters are subqueries, so each user
+    appears once and can be ranked with a window function
+    """
+    model, course_field, _, filters = RANK_INDEX_SOURCES[metric]
+    queryset = model.objects.filter(
+        user__is_active=True,
+        user__courseenrollment__is_active=True,
+        user__courseenrollment__course_id__exact=course_key,
+        **{course_field: course_key},
+        **filters
+    )
+    queryset = exclude_users_from(queryset, kwargs.get('exclude_users'))
+
+    if kwargs.get('org_ids'):
+        queryset = queryset.filter(user_id__in=User.objects.filter(organizations__in=kwargs.get('org_ids')))
+
+    if kwargs.get('group_ids'):
+        queryset = queryset.filter(user_id__in=User.objects.filter(groups__in=kwargs.get('group_ids')))
+
+    if kwargs.get('cohort_user_ids'):
+        queryset = queryset.filter(user_id__in=kwargs.get('cohort_user_ids'))
+
+    return queryset
+
+
+def _get_ranked_scores(metric, course_key, user_ids, **kwargs):
+    """
+    Returns a dict of user id to a tuple of score and rank for given users, ranking all users
+    of the filtered leaderboard with `RANK() OVER (ORDER BY score DESC, modified ASC)` in a single query
+    """
+    score_field = RANK_INDEX_SOURCES[metric][2]
+    queryset = get_filtered_score_queryset(metric, course_key, **kwargs).annotate(
+        rank=Window(expression=Rank(), order_by=[F(score_field).desc(), F('modified').asc()])
+    ).values_list('user_id', score_field, 'rank')
+
+    # ranks must be computed over the whole leaderboard before picking users
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT * FROM ({sql}) ranked_scores WHERE ranked_scores.user_id IN ({user_ids})'.format(
+                sql=sql,
+                user_ids=', '.join(['%s'] * len(user_ids)),
+            ),
+            list(params) + list(user_ids),
+        )
+        return {user_id: (score, rank) for user_id, score, rank in cursor.fetchall()}
+
+
+def get_users_positions(metric, course_key, user_ids, **kwargs):
+    """
+    Returns scores and positions of given users in a leaderboard metric (`progress`, `grade` or `social`)
+    data = {
+        12: {"score": 0.8, "position": 4},
+        13: {"score": None, "position": None},
+    }
+    Positions of unfiltered leaderboards are looked up in the rank index, filtered leaderboards are ranked
+    with a window function, or ranked in python from a single query where database doesn't support it
+    """
+    user_ids = [int(user_id) for user_id in user_ids]
+    if _is_rank_indexed(**kwargs):
+        rank_index = _get_course_rank_index_for(metric, course_key, **kwargs)
+        ranked_scores = {
+            user_id: (rank_index.get_score(user_id), rank_index.get_position(user_id)) for user_id in user_ids
+        }
+    elif connection.features.supports_over_clause:
+        ranked_scores = _get_ranked_scores(metric, course_key, user_ids, **kwargs)
+    else:
+        score_field = RANK_INDEX_SOURCES[metric][2]
+        rank_index = RankIndex(
+            get_filtered_score_queryset(metric, course_key, **kwargs).values_list('user_id', score_field, 'modified')
+        )
+        ranked_scores = {
+            user_id: (rank_index.get_score(user_id), rank_index.get_position(user_id)) for user_id in user_ids
+        }
+
+    data = {}
+    for user_id in user_ids:
+        score, position = ranked_scores.get(user_id, (None, None))
+        data[user_id] = {'score': score, 'position': position}
+    return data
+
+
+def get_leaderboard_window(metric, course_key, user_id, radius, row_fields, **kwargs):
+    """
+    Returns `row_fields` values of a user and up to `radius` users ranked right above and below the
+    user in a leaderboard metric, with their positions. Neighbours are fetched with keyset queries
+    seeking from the user's score. User's position is looked up in the course rank index unless the
+    leaderboard is filtered by organizations, groups or cohort, which have no index, then it is counted
+    on the same filtered scores at a cost growing with the position.
+    Returns an empty list if user has no score
+    """
+    score_field = RANK_INDEX_SOURCES[metric][2]
+    queryset = get_filtered_score_queryset(metric, course_key, **kwargs)
+    user_row = queryset.filter(user_id=user_id).values(score_field, 'modified').first()
+    if user_row is None:
+        return []
+
+    score, modified = user_row[score_field], user_row['modified']
+    ranked_above = Q(**{'{}__gt'.format(score_field): score}) | Q(
+        **{score_field: score, 'modified__lt': modified}
+    ) | Q(**{score_field: score, 'modified': modified, 'user_id__lt': user_id})
+    user_position = None
+    if _is_rank_indexed(**kwargs):
+        user_position = _get_course_rank_index_for(metric, course_key, **kwargs).get_position(user_id)
+    if user_position is None:
+        user_position = queryset.filter(ranked_above).count() + 1
+    ranked_below = Q(**{'{}__lt'.format(score_field): score}) | Q(
+        **{score_field: score, 'modified__gt': modified}
+    ) | Q(**{score_field: score, 'modified': modified, 'user_id__gt': user_id})
+
+    rows_above = list(queryset.filter(ranked_above).values(*row_fields).order_by(
+        score_field, '-modified', '-user_id'
+    )[:radius])
+    rows_above.reverse()
+    user_rows = list(queryset.filter(user_id=user_id).values(*row_fields))
+    rows_below = list(queryset.filter(ranked_below).values(*row_fields).order_by(
+        '-{}'.format(score_field), 'modified', 'user_id'
+    )[:radius])
+
+    rows = rows_above + user_rows + rows_below
+    first_position = user_position - len(rows_above)
+    for offset, row in enumerate(rows):
+        row['position'] = first_position + offset
+    return rows
+
+
+def get_score_distribution(metric, course_key, buckets=10, percentiles=(), **kwargs):
+    """
+    Returns histogram and percentiles of scores between 0 and 1 of a leaderboard metric (`progress`
+    or `grade`), filtered the same way as `get_filtered_aggregation_queryset`, aggregated in database.
+    data = {
+        "total_users": 20,
+        "average": 0.42,
+        "histogram": [{"min": 0.0, "max": 0.5, "count": 12}, {"min": 0.5, "max": 1.0, "count": 8}],
+        "percentiles": {"50": 0.4},
+    }
+    A score equal to 1 falls in the last bucket, percentiles use nearest rank method
+    """
+    score_field = RANK_INDEX_SOURCES[metric][2]
+    queryset = get_filtered_score_queryset(metric, course_key, **kwargs)
+    aggregate = queryset.aggregate(total_users=Count('id'), average=Avg(score_field))
+    total_users = aggregate['total_users']
+
+    bucket_counts = dict(queryset.annotate(
+        bucket=Least(Floor(F(score_field) * buckets), Value(buckets - 1))
+    ).values_list('bucket').annotate(count=Count('id')).values_list('bucket', 'count').order_by())
+
+    data = {
+        'total_users': total_users,
+        'average': aggregate['average'],
+        'histogram': [
+            {
+                'min': float(bucket) / buckets,
+                'max': float(bucket + 1) / buckets,
+                'count': bucket_counts.get(bucket, 0),
+            }
+            for bucket in range(buckets)
+        ],
+        'percentiles': {},
+    }
+    ordered_scores = queryset.order_by(score_field).values_list(score_field, flat=True)
+    for percentile in percentiles:
+        if total_users:
+            rank = max(int(math.ceil(percentile / 100.0 * total_users)), 1)
+            data['percentiles'][str(percentile)] = ordered_scores[rank - 1]
+        else:
+            data['percentiles'][str(percentile)] = None
+    return data
+
+
+def get_course_progress_metrics(course_key, **kwargs):
+    """
+    returns a dict containing these course progress metrics
+    `course_avg`: average progress in course
+    `completions`: given user's progress percentage
+    `position`: given user's position in progress leaderboard
+    `total_users`: total user's enrolled
+    `total_possible_completions`: total possible modules to be completed
+    """
+    data = {'course_avg': 0}
+    total_actual_completions, total_possible_completions = get_total_completions(course_key, **kwargs)
+    if kwargs.get('user_id'):
+        data.update(get_user_position(course_key, **kwargs))
+    if not any([kwargs.get('org_ids'), kwargs.get('group_ids'), kwargs.get('cohort_user_ids')]):
+        course_id = str(course_key)
+        total_users = get_course_enrollment_count(course_id)
+    else:
+        total_users_qs = exclude_users_from(
+            CourseEnrollment.objects.users_enrolled_in(course_key), kwargs.get('exclude_users'), user_field='id'
+        )
+        if kwargs.get('org_ids'):
+            total_users_qs = total_users_qs.filter(organizations__in=kwargs.get('org_ids'))
+        if kwargs.get('group_ids'):
+            total_users_qs = total_users_qs.filter(groups__in=kwargs.get('group_ids')).distinct()
+        if kwargs.get('cohort_user_ids'):
+            total_users_qs = total_users_qs.filter(id__in=kwargs.get('cohort_user_ids'))
+        total_users = total_users_qs.count()
+
+    data['course_avg'] = get_course_avg_progress(total_actual_completions, total_possible_completions, total_users)
+    data['total_users'] = total_users
+    data['total_possible_completions'] = total_possible_completions
+    return data
+
+
+def get_course_avg_progress(total_actual_completions, total_possible_completions, total_users):
+    """
+    Returns average progress percentage of users in a course from their total completions
+    """
+    if not (total_users and total_actual_completions and total_possible_completions):
+        return 0
+    course_avg = total_actual_completions / float(total_users)
+    return min(100 * (course_avg / total_possible_completions), 100)
+
+
+def get_course_engagement_summary(course_key, **kwargs):
+    """
+    Returns engagement summary of users enrolled in a course, counted with conditional aggregation
+    in one query over enrolled users and one over their course progress
+    """
+    last_week = (timezone.now() - timezone.timedelta(days=7), timezone.now())
+
+    user_qs = exclude_users_from(
+        CourseEnrollment.objects.users_enrolled_in(course_key), kwargs.get('exclude_users'), user_field='id'
+    )
+    if kwargs.get('org_ids'):
+        user_qs = user_qs.filter(organizations__in=kwargs.get('org_ids') or [])
+    users = user_qs.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(is_active=True)),
+        last_week_login=Count('id', filter=Q(last_login__range=last_week)),
+    )
+
+    progress = get_filtered_aggregation_queryset(course_key, **kwargs).aggregate(
+        users=Count('id'),
+        percent=Sum(Round(F('percent') * 100)),
+        last_week_login_percent=Sum('percent', filter=Q(user__last_login__range=last_week)),
+    )
+    progress_sum = progress['percent'] or 0
+    last_week_progress_sum = (progress['last_week_login_percent'] or 0) * 100
+
+    def safe_division(dividend, divisor):
+        return 0 if divisor == 0 else dividend / divisor
+
+    total_users = users['total']
+    data = {}
+    data['total_users'] = total_users
+    data['total_course_progress'] = safe_division(float(progress_sum), total_users)
+
+    data['active_users'] = users['active']
+    data['active_users_percentage'] = safe_division(float(users['active']), total_users) * 100
+    data['active_users_progress'] = safe_division(float(progress_sum), users['active'])
+
+    data['engaged_users'] = progress['users']
+    data['engaged_users_percentage'] = safe_division(float(progress['users']), total_users) * 100
+    data['engaged_users_progress'] = safe_division(float(progress_sum), progress['users'])
+
+    data['last_week_login_users'] = users['last_week_login']
+    data['last_week_login_users_percentage'] = safe_division(float(users['last_week_login']), total_users) * 100
+    data['last_week_login_users_progress'] = safe_division(
+        float(last_week_progress_sum), users['last_week_login']
+    )
+    return data
+
+
 def get_course_enrollment_count(course_id, org_id=None, exclude_org_admins=False):
     """
     Get enrollment count of a course
@@ -142,25 +598,350 @@ def get_course_enrollment_count(course_id, org_id=None, exclude_org_admins=False
     """
     cache_category = 'course_enrollments'
     if org_id:
-        cache_category = '{}_{}'.format(cache_category, org_id)
+        cache_category = get_cache_category(cache_category, org_id)
         if exclude_org_admins:
-            cache_category = '{}_exclude_admins'.format(cache_category)
+            cache_category = get_cache_category(cache_category, 'exclude_admins')
 
-    enrollment_count = get_cached_data(cache_category, course_id)
+    generation = get_cache_generation(cache_category, course_id)
+    enrollment_count = get_cached_data(cache_category, course_id, generation=generation)
     if enrollment_count is not None:
         return enrollment_count.get('enrollment_count')
 
-    course_key = get_course_key(course_id)
-    exclude_user_ids = get_aggregate_exclusion_user_ids(course_key)
-    users_enrolled_qs = CourseEnrollment.objects.users_enrolled_in(course_key).exclude(id__in=exclude_user_ids)
+    enrollment_count = _compute_course_enrollment_count(get_course_key(course_id), org_id)
+    cache_course_data(cache_category, course_id, {'enrollment_count': enrollment_count}, generation=generation)
+
+    return enrollment_count
+
+
+def _compute_course_enrollment_count(course_key, org_id=None):
+    """
+    Counts users enrolled in a course, bypassing cache
+    """
+    users_enrolled_qs = UserExclusion(course_key).exclude_from(
+        CourseEnrollment.objects.users_enrolled_in(course_key), user_field='id'
+    )
 
     if org_id:
         users_enrolled_qs = users_enrolled_qs.filter(organizations=org_id).distinct()
-        if exclude_org_admins:
-            non_company_users = get_non_actual_company_users('mcka_role_company_admin', org_id)
-            users_enrolled_qs.exclude(id__in=non_company_users)
 
-    enrollment_count = users_enrolled_qs.count()
-    cache_course_data(cache_category, course_id, {'enrollment_count': enrollment_count})
+    return users_enrolled_qs.count()
 
-    return enrollment_count
+
+def refresh_course_metrics_snapshot(course_key, org_id=None):
+    """
+    Computes metrics of a course live and stores them in course metrics snapshot
+    if org_id is passed then metrics are limited to that org's users
+    """
+    exclude_users = UserExclusion(course_key)
+    org_ids = [org_id] if org_id else None
+
+    # enrollments are counted live, a stale cached count would otherwise be persisted
+    users_enrolled = _compute_course_enrollment_count(course_key, org_id=org_id)
+    users_started = get_num_users_started(course_key, exclude_users=exclude_users, org_ids=org_ids)
+    modules_completed, possible_completions = get_total_completions(
+        course_key, exclude_users=exclude_users, org_ids=org_ids
+    )
+    snapshot, _ = CourseMetricsSnapshot.objects.update_or_create(
+        course_key=course_key,
+        org_id=org_id or CourseMetricsSnapshot.ALL_ORGANIZATIONS,
+        defaults={
+            'users_enrolled': users_enrolled,
+            'users_started': users_started,
+            'modules_completed': modules_completed or 0,
+            'users_completed': StudentGradebook.get_num_users_completed(
+                course_key, exclude_users=exclude_users, org_ids=org_ids
+            ),
+            'users_passed': StudentGradebook.get_passed_users_gradebook(
+                course_key, exclude_users=exclude_users, org_ids=org_ids
+            ).count(),
+            'avg_progress': get_course_avg_progress(modules_completed, possible_completions, users_enrolled),
+            'avg_grade': StudentGradebook.course_grade_avg(
+                course_key, exclude_users=exclude_users, org_ids=org_ids
+            ) or 0,
+        }
+    )
+    return snapshot
+
+
+def refresh_course_metrics_snapshots(course_key):
+    """
+    Refreshes course metrics snapshot of a course and of every organization having users enrolled in it
+    """
+    refresh_course_metrics_snapshot(course_key)
+    org_ids = Organization.objects.filter(
+        users__courseenrollment__course_id=course_key,
+        users__courseenrollment__is_active=True,
+    ).distinct().values_list('id', flat=True)
+    for org_id in org_ids:
+        refresh_course_metrics_snapshot(course_key, org_id=org_id)
+
+
+def get_time_series_querysets(course_key, org_id=None, group_ids=None):
+    """
+    Returns querysets of time series metrics of a course, limited to users of an organization
+    and of groups when given, as {metric: (queryset, date field, date field model, aggregate)}
+    """
+    exclude_users = UserExclusion(course_key)
+    grade_complete_match_range = getattr(settings, 'GRADEBOOK_GRADE_COMPLETE_PROFORMA_MATCH_RANGE', 0.01)
+    grades_complete_qs = StudentGradebook.objects.filter(
+        course_id__exact=course_key,
+        user__is_active=True,
+        user__courseenrollment__is_active=True,
+        user__courseenrollment__course_id__exact=course_key,
+        proforma_grade__lte=F('grade') + grade_complete_match_range,
+        proforma_grade__gt=0,
+    )
+    enrolled_qs = CourseEnrollment.objects.filter(course_id__exact=course_key, user__is_active=True, is_active=True)
+    users_started_qs = Aggregator.objects.filter(
+        course_key__exact=course_key,
+        user__is_active=True,
+        user__courseenrollment__is_active=True,
+        user__courseenrollment__course_id__exact=course_key,
+        aggregation_name='course',
+        earned__gt=0.0,
+    )
+    modules_completed_qs = BlockCompletion.objects.filter(
+        context_key__exact=course_key,
+        user__courseenrollment__is_active=True,
+        user__courseenrollment__course_id__exact=course_key,
+        user__is_active=True,
+        completion__gt=0.0,
+    )
+    active_users_qs = StudentModule.objects.filter(
+        course_id__exact=course_key,
+        student__is_active=True,
+        student__courseenrollment__is_active=True,
+        student__courseenrollment__course_id__exact=course_key,
+    )
+
+    metric_querysets = {
+        'users_enrolled': (enrolled_qs, 'created', CourseEnrollment, Count('id', distinct=True), 'user'),
+        'users_started': (users_started_qs, 'created', Aggregator, Count('user', distinct=True), 'user'),
+        'users_completed': (grades_complete_qs, 'modified', StudentGradebook, Count('id', distinct=True), 'user'),
+        'modules_completed': (modules_completed_qs, 'created', BlockCompletion, Count('id', distinct=True), 'user'),
+        'active_users': (active_users_qs, 'modified', StudentModule, Count('student', distinct=True), 'student'),
+    }
+    querysets = {}
+    for metric, (queryset, date_field, date_field_model, aggregate, user_field) in metric_querysets.items():
+        queryset = exclude_users_from(queryset, exclude_users, '{}_id'.format(user_field))
+        if org_id:
+            queryset = queryset.filter(**{'{}__organizations'.format(user_field): org_id})
+        if group_ids:
+            queryset = queryset.filter(**{'{}__groups__in'.format(user_field): group_ids}).distinct()
+        querysets[metric] = (queryset, date_field, date_field_model, aggregate)
+    return querysets
+
+
+def refresh_course_daily_metrics(course_key, start_day, end_day, org_id=None):
+    """
+    Rolls up daily values of time series metrics of a course from start_day up to end_day included,
+    along with earlier days reopened since they were rolled up
+    if org_id is passed then metrics are limited to that org's users
+    """
+    reopened_day = CourseDailyMetric.objects.filter(
+        course_key=course_key,
+        org_id=org_id or CourseDailyMetric.ALL_ORGANIZATIONS,
+        day__lt=start_day,
+        is_final=False,
+    ).aggregate(day=Min('day'))['day']
+    start = strip_time(reopened_day or start_day)
+    end = strip_time(end_day)
+    querysets = get_time_series_querysets(course_key, org_id=org_id)
+    for metric in CourseDailyMetric.ROLLUP_METRICS:
+        queryset, date_field, date_field_model, aggregate = querysets[metric]
+        series = get_time_series_data(
+            queryset, start, end, interval='days', date_field=date_field, date_field_model=date_field_model,
+            aggregate=aggregate
+        )
+        CourseDailyMetric.store_daily_values(
+            course_key, metric, [(dt_key.date(), value) for dt_key, value in series], org_id=org_id
+        )
+
+
+def refresh_course_daily_metrics_of_orgs(course_key, start_day, end_day):
+    """
+    Rolls up daily metrics of a course and of every organization having users enrolled in it
+    """
+    refresh_course_daily_metrics(course_key, start_day, end_day)
+    org_ids = Organization.objects.filter(
+        users__courseenrollment__course_id=course_key,
+        users__courseenrollment__is_active=True,
+    ).distinct().values_list('id', flat=True)
+    for org_id in org_ids:
+        refresh_course_daily_metrics(course_key, start_day, end_day, org_id=org_id)
+
+
+def reopen_user_daily_metrics(user_id, course_key=None, org_ids=None):
+    """
+    Reopens rolled up days on which a user started a course or completed modules, once the user is
+    no longer counted the same way, e.g. after the user unenrolls, gets excluded or changes organizations.
+    Limited to a course and to organizations when given
+    """
+    started = Aggregator.objects.filter(user_id=user_id, aggregation_name='course', earned__gt=0.0)
+    completed = BlockCompletion.objects.filter(user_id=user_id, completion__gt=0.0)
+    if course_key:
+        started = started.filter(course_key=course_key)
+        completed = completed.filter(context_key=course_key)
+
+    days_by_course = defaultdict(set)
+    for user_course_key, day in chain(
+            started.values_list('course_key', 'created__date').distinct(),
+            completed.values_list('context_key', 'created__date').distinct(),
+    ):
+        days_by_course[user_course_key].add(day)
+    for user_course_key, days in days_by_course.items():
+        CourseDailyMetric.reopen_days(user_course_key, days, org_ids=org_ids)
+
+
+def reopen_counted_row_daily_metrics(metric, course_key, row_id, created, deleted=False):
+    """
+    Reopens the rolled up day a counted row of a metric was created on and invalidates cached time series
+    of the course, when the row is deleted or is first seen counted after that day is over. Rows are bucketed
+    by creation date but only counted once they have progress, which may be earned days after their creation
+    """
+    day = created.date()
+    if day >= timezone.now().date():
+        return
+    counted_key = 'edx_solutions_api_integration.counted_rows.{}.{}.{}'.format(metric, course_key, row_id)
+    if not deleted and not cache.add(counted_key, True, TIME_SERIES_CACHE_TTL):
+        return
+    CourseDailyMetric.reopen_days(course_key, [day])
+    invalid_user_data_cache('time_series', str(course_key))
+
+
+def get_active_course_keys(since):
+    """
+    Returns keys of courses having progress aggregated since given time
+    """
+    return Aggregator.objects.filter(
+        aggregation_name='course',
+        last_modified__gte=since
+    ).distinct().values_list('course_key', flat=True)
+
+
+def get_progress_leaders(course_keys, leaderboard_size, since):
+    """
+    Returns top `leaderboard_size` progress leaders of given courses, ranked by percent and earliest
+    aggregation, with whether their progress changed since given time
+    data = {
+        "course-v1:edX+DemoX+2014": [(12, True), (4, False), (7, False)],
+    }
+    Leaders of all courses are ranked in a single `ROW_NUMBER() OVER (PARTITION BY course_key ...)`
+    query where the database supports window functions, course by course otherwise
+    """
+    excluded_roles = CourseAccessRole.objects.filter(
+        user_id=OuterRef('user_id'),
+        course_id=OuterRef('course_key'),
+        role__in=PROGRESS_LEADERS_EXCLUDED_ROLES,
+    )
+    queryset = Aggregator.objects.filter(
+        aggregation_name='course', course_key__in=course_keys, percent__gt=0
+    ).annotate(
+        has_excluded_role=Exists(excluded_roles),
+        is_recent=Case(When(modified__gte=since, then=Value(True)), default=Value(False), output_field=BooleanField()),
+    ).filter(has_excluded_role=False)
+
+    leaders = {str(course_key): [] for course_key in course_keys}
+    if not connection.features.supports_over_clause:
+        for course_key in course_keys:
+            leaders[str(course_key)] = list(
+                queryset.filter(course_key=course_key).order_by(
+                    '-percent', 'last_modified'
+                ).values_list('user_id', 'is_recent')[:leaderboard_size]
+            )
+        return leaders
+
+    queryset = queryset.annotate(
+        leader_position=Window(
+            expression=RowNumber(),
+            partition_by=[F('course_key')],
+            order_by=[F('percent').desc(), F('last_modified').asc()],
+        )
+    ).values_list('course_key', 'user_id', 'is_recent', 'leader_position')
+
+    # positions must be numbered over whole leaderboards before picking leaders
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT * FROM ({sql}) progress_leaders WHERE progress_leaders.leader_position <= %s '
+            'ORDER BY progress_leaders.leader_position'.format(sql=sql),
+            list(params) + [leaderboard_size],
+        )
+        for course_key, user_id, is_recent, __ in cursor.fetchall():
+            leaders[str(course_key)].append((user_id, bool(is_recent)))
+    return leaders
+
+
+def warm_course_metrics_cache(course_key, count=None):
+    """
+    Precomputes enrollment count, course averages and grade, progress and social leaderboards of a
+    course and caches them in the categories course metrics APIs read from
+    """
+    course_id = str(course_key)
+    exclude_users = UserExclusion(course_key)
+    generations = get_cache_generations(WARMED_CACHE_CATEGORIES, course_id)
+
+    cache_course_data('course_enrollments', course_id, {
+        'enrollment_count': _compute_course_enrollment_count(course_key)
+    }, generation=generations['course_enrollments'])
+
+    grade_leaderboard = StudentGradebook.generate_leaderboard(
+        course_key, exclude_aggregate_scores=True, count=count, exclude_users=exclude_users
+    )
+    cache_course_data('grade_leaderboard', course_id, {
+        'leader_rows': CourseProficiencyLeadersSerializer.compact_rows(grade_leaderboard['queryset'])
+    }, generation=generations['grade_leaderboard'])
+    cache_course_data('grade', course_id, {
+        'course_avg': StudentGradebook.course_grade_avg(course_key, exclude_users=exclude_users)
+    }, generation=generations['grade'])
+    cache_course_data('passed_count', course_id, StudentGradebook.get_passed_users_gradebook(
+        course_key, exclude_users=exclude_users
+    ).count(), generation=generations['passed_count'])
+    cache_course_data('completed_count', course_id, StudentGradebook.get_num_users_completed(
+        course_key, exclude_users=exclude_users
+    ), generation=generations['completed_count'])
+
+    progress_metrics = get_course_progress_metrics(course_key, exclude_users=exclude_users)
+    cache_course_data('progress_leaderboard', course_id, {
+        'leader_rows': CourseCompletionsLeadersSerializer.compact_rows(
+            generate_leaderboard(course_key, count=count, exclude_users=exclude_users)
+        )
+    }, generation=generations['progress_leaderboard'])
+    cache_course_data('progress', course_id, {
+        'course_avg': progress_metrics['course_avg'],
+        'total_users': progress_metrics['total_users'],
+        'total_possible_completions': progress_metrics['total_possible_completions'],
+    }, generation=generations['progress'])
+
+    social_leaderboard = StudentSocialEngagementScore.generate_leaderboard(
+        course_key, count=count, exclude_users=exclude_users
+    )
+    cache_course_data('social_leaderboard', course_id, {
+        'leader_rows': CourseSocialLeadersSerializer.compact_rows(social_leaderboard['queryset'])
+    }, generation=generations['social_leaderboard'])
+    cache_course_data(
+        'social', course_id, {'course_avg': social_leaderboard['course_avg']}, generation=generations['social']
+    )
+
+
+def _try_warm_course_metrics_cache(course_key, count=None):
+    """
+    Warms cache of a course, logging failures so that other courses are still warmed
+    """
+    try:
+        warm_course_metrics_cache(course_key, count=count)
+    except Exception:  # pylint: disable=broad-except
+        log.exception("Failed to warm course metrics cache of course %s", course_key)
+
+
+def warm_active_courses_metrics_cache(since, concurrency=1, count=None):
+    """
+    Warms course metrics cache of courses having progress aggregated since given time,
+    `concurrency` courses at a time
+    """
+    course_keys = list(get_active_course_keys(since))
+    run_concurrently({
+        str(course_key): (_try_warm_course_metrics_cache, (course_key,), {'count': count})
+        for course_key in course_keys
+    }, max_workers=concurrency)
+    return course_keys
@@ -1,6 +1,8 @@
 """ API implementation for course-oriented interactions. """
 
+import hashlib
 import itertools
+import json
 import logging
 import re
 import sys
@@ -11,29 +13,31 @@ from functools import reduce
 from io import StringIO
 
 from completion.models import BlockCompletion
-from completion_aggregator.models import Aggregator
 from django.conf import settings
 from django.contrib.auth.models import Group, User
 from django.core.cache import cache
 from django.core.exceptions import FieldDoesNotExist, ObjectDoesNotExist
-from django.db.models import Count, F, Max, Min, Prefetch, Q, Sum
+from django.db.models import Count, F, Max, Min, Prefetch, Q
 from django.http import Http404
-from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 from openedx.core.djangoapps.django_comment_common.models import FORUM_ROLE_MODERATOR
 from edx_solutions_api_integration.courses.serializers import (
     BlockCompletionSerializer, CourseCompletionsLeadersSerializer,
     CourseProficiencyLeadersSerializer, CourseSerializer,
-    CourseSocialLeadersSerializer, GradeSerializer, UserGradebookSerializer)
+    CourseSocialLeadersSerializer, GradeSerializer,
+    OrganizationCompletionsLeadersSerializer, UserGradebookSerializer)
 from edx_solutions_api_integration.courses.utils import (
-    generate_leaderboard, get_course_enrollment_count,
-    get_filtered_aggregation_queryset, get_num_users_started,
-    get_total_completions, get_user_position)
+    generate_leaderboard, generate_organization_leaderboard,
+    get_course_engagement_summary, get_course_enrollment_count,
+    get_course_progress_metrics, get_indexed_user_position,
+    get_leaderboard_window, get_num_users_started, get_score_distribution,
+    get_time_series_querysets, get_total_completions, get_users_positions)
 from edx_solutions_api_integration.courseware_access import (
     course_exists, get_course, get_course_child, get_course_child_key,
     get_course_key)
 from edx_solutions_api_integration.models import (
-    CourseContentGroupRelationship, CourseGroupRelationship, GroupProfile)
+    CourseContentGroupRelationship, CourseGroupRelationship,
+    CourseMetricsSnapshot, GroupProfile)
 from edx_solutions_api_integration.permissions import (IsStaffView,
                                                        MobileAPIView,
                                                        MobileListAPIView,
@@ -46,11 +50,18 @@ from edx_solutions_api_integration.tasks import (
 from edx_solutions_api_integration.users.serializers import (
     UserCountByCitySerializer, UserSerializer)
 from edx_solutions_api_integration.utils import (
-    Round, cache_course_data, cache_course_user_data, css_data_to_list,
-    css_param_to_list, generate_base_uri, get_aggregate_exclusion_user_ids,
-    get_cached_data, get_ids_from_list_param, get_non_actual_company_users,
-    get_time_series_data, get_user_from_request_params, is_cohort_available,
-    parse_datetime, str2bool, strip_xblock_wrapper_div)
+    CACHE_STATS, COURSE_METRICS_MAX_WORKERS, COURSE_METRICS_SECTION_TIMEOUT,
+    ENGAGEMENT_SUMMARY_CACHE_TTL, FORUM_SERVICE_ERRORS,
+    ORG_LEADERBOARD_CACHE_TTL, THREAD_STATS_TIMEOUT, TIME_SERIES_MAX_WORKERS,
+    MetricSection, UserExclusion, cache_course_data, cache_course_user_data,
+    compute_metric_sections, css_data_to_list, css_param_to_list,
+    exclude_users_from, generate_base_uri, get_cache_category,
+    get_cache_generation, get_cache_generations, get_cached_data,
+    get_cached_data_many, get_forum_stats, get_ids_from_list_param,
+    get_non_actual_company_users, get_time_series_data,
+    get_user_from_request_params, is_cohort_available, is_int, parse_datetime,
+    recompute_course_data, run_concurrently, str2bool,
+    strip_xblock_wrapper_div)
 from edx_solutions_organizations.models import Organization
 from edx_solutions_projects.models import Project, Workgroup
 from edx_solutions_projects.serializers import (BasicWorkgroupSerializer,
@@ -61,7 +72,6 @@ from lms.djangoapps.course_api.blocks.api import get_blocks
 from lms.djangoapps.courseware.courses import (get_course_about_section,
                                                get_course_info_section,
                                                get_course_info_section_module)
-from lms.djangoapps.courseware.models import StudentModule
 from lms.djangoapps.courseware.views.views import get_static_tab_fragment
 from lxml import etree
 from mobile_api.course_info.views import apply_wrappers_to_content
@@ -72,13 +82,11 @@ from openedx.core.djangoapps.content.course_structures.models import CourseStruc
 from openedx.core.djangoapps.course_groups.cohorts import get_cohort_user_ids
 from openedx.core.djangoapps.course_groups.models import CourseUserGroup
 from openedx.core.djangoapps.django_comment_common.comment_client.thread import get_course_thread_stats
-from openedx.core.djangoapps.django_comment_common.comment_client.utils import (
-    CommentClientMaintenanceError, CommentClientRequestError)
 from openedx.core.lib.courses import course_image_url
 from openedx.core.lib.xblock_utils import get_course_update_items
 from pytz import UTC
-from requests.exceptions import ConnectionError
 from rest_framework import status
+from rest_framework.exceptions import ParseError
 from rest_framework.response import Response
 from social_engagement.models import StudentSocialEngagementScore
 from student.models import CourseEnrollment, CourseEnrollmentAllowed
@@ -91,6 +99,15 @@ from xmodule.modulestore.exceptions import ItemNotFoundError
 from xmodule.modulestore.search import path_to_location
 
 BLOCK_DATA_FIELDS = ['children', 'display_name', 'type', 'due', 'start']
+GRADES_LEADERS_CACHE_CATEGORIES = ('grade', 'grade_leaderboard')
+COMPLETIONS_LEADERS_CACHE_CATEGORIES = ('progress', 'progress_leaderboard')
+SOCIAL_LEADERS_CACHE_CATEGORIES = ('social', 'social_leaderboard')
+# field holding user's score in batch positions of each leaderboard
+LEADERBOARD_POSITION_SCORE_FIELDS = {'progress': 'completions', 'grade': 'grade', 'social': 'score'}
+# leaderboards filtered by any of these params are cached under a scope of the normalized filters
+LEADERBOARD_FILTER_PARAMS = ('org_ids', 'group_ids', 'cohort_user_ids', 'exclude_roles')
+# cache categories whose generation in an organization or group changes along with its members
+LEADERBOARD_MEMBERS_CACHE_CATEGORIES = {'org_ids': 'org_members', 'group_ids': 'group_members'}
 log = logging.getLogger(__name__)
 
 
@@ -282,6 +299,7 @@ def _get_static_tab_contents(request, course, tab, strip_wrapper_div=True):
     """
     cache_key = 'course.{course_id}.static.tab.{url_slug}.contents'.format(course_id=course.id, url_slug=tab.url_slug)
     contents = cache.get(cache_key)
+    CACHE_STATS.record_get('static_tab', contents)
     if contents is None:
         contents = get_static_tab_fragment(request, course, tab).content
         _cache_static_tab_contents(cache_key, contents)
@@ -300,162 +318,311 @@ def _cache_static_tab_contents(cache_key, contents):
 
     if not sys.getsizeof(contents) > contents_max_size_limit:
         cache.set(cache_key, contents, cache_expiration)
+        CACHE_STATS.record_set('static_tab', contents)
 
 
-def _get_course_progress_metrics(course_key, **kwargs):
+def _get_leaders_cache_scope(**kwargs):
     """
-    returns a dict containing these course progress metrics
-    `course_avg`: average progress in course
-    `completions`: given user's progress percentage
-    `position`: given user's position in progress leaderboard
-    `total_users`: total user's enrolled
-    `total_possible_completions`: total possible modules to be completed
+    Returns a digest of normalized leaderboard filters, along with current generations of members of
+    filtered organizations and groups, so that membership changes move filtered leaderboards to new keys.
+    Returns None for unfiltered leaderboards
     """
-    course_avg = 0
-    data = {'course_avg': course_avg}
-    total_actual_completions, total_possible_completions = get_total_completions(course_key, **kwargs)
-    if kwargs.get('user_id'):
-        data.update(get_user_position(course_key, **kwargs))
-    if not any([kwargs.get('org_ids'), kwargs.get('group_ids'), kwargs.get('cohort_user_ids')]):
-        course_id = str(course_key)
-        total_users = get_course_enrollment_count(course_id)
-    else:
-        total_users_qs = CourseEnrollment.objects.users_enrolled_in(course_key).exclude(id__in=kwargs.get('exclude_users'))
-        if kwargs.get('org_ids'):
-            total_users_qs = total_users_qs.filter(organizations__in=kwargs.get('org_ids'))
-        if kwargs.get('group_ids'):
-            total_users_qs = total_users_qs.filter(groups__in=kwargs.get('group_ids')).distinct()
-        if kwargs.get('cohort_user_ids'):
-            total_users_qs = total_users_qs.filter(id__in=kwargs.get('cohort_user_ids'))
-        total_users = total_users_qs.count()
-
-    if total_users and total_actual_completions and total_possible_completions:
-        course_avg = total_actual_completions / float(total_users)
-        course_avg = min(100 * (course_avg / total_possible_completions), 100)  # avg in percentage
-
-    data['course_avg'] = course_avg
-    data['total_users'] = total_users
-    data['total_possible_completions'] = total_possible_completions
+    filters = {
+        param: sorted({str(value) for value in kwargs.get(param) or []}) for param in LEADERBOARD_FILTER_PARAMS
+    }
+    if not any(filters.values()):
+        return None
+
+    for param, members_category in LEADERBOARD_MEMBERS_CACHE_CATEGORIES.items():
+        filters[members_category] = [
+            get_cache_generation(members_category, scope_id) for scope_id in filters[param]
+        ]
+    return hashlib.md5(json.dumps(filters, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def _get_leaders_cache_category(category, cache_scope):
+    """
+    Returns leaderboard cache category limited to a filters scope, if any
+    """
+    return get_cache_category(category, cache_scope) if cache_scope else category
+
+
+def _get_leaders_cached_data_many(categories, course_id, user_id, cache_scope):
+    """
+    Fetches leaderboard categories cached in a filters scope in a single cache round trip. Returns cached data
+    and cache generations of the categories keyed by category, generations are reused to cache recomputed data
+    """
+    scoped_categories = {category: _get_leaders_cache_category(category, cache_scope) for category in categories}
+    scoped_generations = get_cache_generations(list(scoped_categories.values()), course_id)
+    scoped_data = get_cached_data_many(
+        list(scoped_categories.values()), course_id, user_id, generations=scoped_generations
+    )
+    return (
+        {category: scoped_data[scoped_category] for category, scoped_category in scoped_categories.items()},
+        {category: scoped_generations[scoped_category] for category, scoped_category in scoped_categories.items()},
+    )
+
+
+def _get_leaders_cached_data(course_id, user_id, categories, kwargs):
+    """
+    Returns the cached data, cache generations and filters scope prefetched by the caller in `cached_data`,
+    `cache_generations` and `cache_scope` kwargs or fetches the given categories in a single cache round trip
+    """
+    cached_data = kwargs.pop('cached_data', None)
+    cache_generations = kwargs.pop('cache_generations', None)
+    cache_scope = kwargs.pop('cache_scope', None)
+    if cached_data is None:
+        cache_scope = _get_leaders_cache_scope(**kwargs)
+        cached_data, cache_generations = _get_leaders_cached_data_many(categories, course_id, user_id, cache_scope)
+    return cached_data, cache_generations, cache_scope
+
+
+def _compact_leaderboard(leaderboard, serializer_class):
+    """
+    Replaces queryset of a generated leaderboard with compact rows of leaders, which are cached
+    """
+    leaderboard['leader_rows'] = serializer_class.compact_rows(leaderboard.pop('queryset'))
+    return leaderboard
+
+
+def _expand_leaderboard(data, serializer_class):
+    """
+    Replaces compact rows of leaders with serialized leaders at response time
+    """
+    if 'leader_rows' in data:
+        serializer = serializer_class(serializer_class.expand_rows(data.pop('leader_rows')), many=True)
+        data['leaders'] = serializer.data  # pylint: disable=E1101
     return data
 
 
+def _generate_leaderboard_single_flight(category, course_key, generate, **kwargs):
+    """
+    Generates a leaderboard with `generate` callable. A leaderboard shared by all users of the course,
+    or of the same filters scope, is recomputed by one worker at a time, concurrent requests get the
+    previous leaderboard marked `stale`
+    """
+    leaderboard, is_stale = recompute_course_data(
+        get_cache_category(category, kwargs.get('count')), course_key, generate
+    )
+    if is_stale:
+        leaderboard['stale'] = True
+    return leaderboard
+
+
+def _get_users_leaderboard_positions(metric, course_key, user_ids, **kwargs):
+    """
+    Returns positions and scores of given users in a leaderboard, ranked in a single lookup
+    """
+    positions = []
+    for user_id, user_position in get_users_positions(metric, course_key, user_ids, **kwargs).items():
+        score = user_position['score']
+        if metric == 'progress' and score is not None:
+            score *= 100
+        positions.append({
+            'id': user_id,
+            'position': user_position['position'],
+            LEADERBOARD_POSITION_SCORE_FIELDS[metric]: score,
+        })
+    return positions
+
+
+def _get_leaderboard_window(request, metric, serializer_class, course_key, **kwargs):
+    """
+    Returns serialized leaders around the user given in `around` param, `radius` of them above
+    and below the user, each with their position. Returns None if `around` param isn't given
+    """
+    around = request.query_params.get('around', None)
+    if around is None:
+        return None
+    if not is_int(around) or not is_int(request.query_params.get('radius', 5)):
+        raise ParseError("Invalid around or radius parameter value")
+
+    radius = min(int(request.query_params.get('radius', 5)), getattr(settings, 'LEADERBOARD_MAX_RADIUS', 50))
+    rows = get_leaderboard_window(
+        metric, course_key, int(around), max(radius, 0), serializer_class.row_fields(), **kwargs
+    )
+    leaders = serializer_class(rows, many=True).data  # pylint: disable=E1101
+    for row, leader in zip(rows, leaders):
+        leader['position'] = row['position']
+    return leaders
+
+
 def _get_courses_metrics_grades_leaders_list(course_key, **kwargs):
     course_id = str(course_key)
     user_id = kwargs.get('user_id')
     data = {}
+    cached_data, cache_generations, cache_scope = _get_leaders_cached_data(
+        course_id, user_id, GRADES_LEADERS_CACHE_CATEGORIES, kwargs
+    )
+    grade_category = _get_leaders_cache_category('grade', cache_scope)
+    leaderboard_category = _get_leaders_cache_category('grade_leaderboard', cache_scope)
 
     if kwargs.get('skipleaders') and user_id:
-        cached_grade_data = get_cached_data('grade', course_id, user_id)
+        cached_grade_data = cached_data.get('grade')
         if not cached_grade_data:
             data['course_avg'] = StudentGradebook.course_grade_avg(course_key, **kwargs)
             data['user_grade'] = StudentGradebook.get_user_grade(course_key, user_id)
-            cache_course_data('grade', course_id, {'course_avg': data['course_avg']})
-            cache_course_user_data('grade', course_id, user_id, {'user_grade': data['user_grade']})
+            cache_course_data(
+                grade_category, course_id, {'course_avg': data['course_avg']}, generation=cache_generations['grade']
+            )
+            cache_course_user_data(
+                grade_category, course_id, user_id, {'user_grade': data['user_grade']},
+                generation=cache_generations['grade']
+            )
         else:
             data.update(cached_grade_data)
     else:
-        cached_leader_board_data = get_cached_data('grade_leaderboard', course_id)
-        cached_grade_data = get_cached_data('grade', course_id, user_id)
-        if cached_leader_board_data and cached_grade_data and 'user_position' in cached_grade_data and not \
-                (kwargs.get('group_ids') or kwargs.get('exclude_roles')):
+        cached_leader_board_data = cached_data.get('grade_leaderboard')
+        cached_grade_data = cached_data.get('grade')
+        if cached_leader_board_data and cached_grade_data and 'user_position' in cached_grade_data:
             data.update(cached_grade_data)
             data.update(cached_leader_board_data)
         else:
-            data.update(StudentGradebook.generate_leaderboard(course_key, exclude_aggregate_scores=True, **kwargs))
+            def _generate_grades_leaderboard():
+                return _compact_leaderboard(
+                    StudentGradebook.generate_leaderboard(course_key, exclude_aggregate_scores=True, **kwargs),
+                    CourseProficiencyLeadersSerializer,
+                )
+
+            data.update(_generate_leaderboard_single_flight(
+                leaderboard_category, course_key, _generate_grades_leaderboard, **kwargs
+            ))
 
             if kwargs.get('cohort_user_ids'):
                 data['course_avg'] = StudentGradebook.course_grade_avg(course_key, **kwargs)
             else:
                 data['course_avg'] = CoursesMetrics.get_course_avg_grade(course_id=course_id)
 
-            serializer = CourseProficiencyLeadersSerializer(data.pop('queryset'), many=True)
-            data['leaders'] = serializer.data  # pylint: disable=E1101
-
             if kwargs.get('user_id'):
-                data.update(StudentGradebook.get_user_position(course_key, **kwargs))
+                indexed_position = get_indexed_user_position('grade', course_key, **kwargs)
+                if indexed_position is not None:
+                    data['user_grade'], data['user_position'] = indexed_position
+                else:
+                    data.update(StudentGradebook.get_user_position(course_key, **kwargs))
 
-                cache_course_data('grade', course_id, {'course_avg': data['course_avg']})
-                cache_course_data('grade_leaderboard', course_id, {'leaders': data['leaders']})
-                cache_course_user_data('grade', course_id, user_id, {
+                cache_course_data(
+                    grade_category, course_id, {'course_avg': data['course_avg']},
+                    generation=cache_generations['grade']
+                )
+                if not data.get('stale'):
+                    cache_course_data(
+                        leaderboard_category, course_id, {'leader_rows': data['leader_rows']},
+                        generation=cache_generations['grade_leaderboard']
+                    )
+                cache_course_user_data(grade_category, course_id, user_id, {
                     'user_grade': data.get('user_grade', 0), 'user_position': data['user_position']
-                })
+                }, generation=cache_generations['grade'])
             else:
                 data.pop('enrollment_count')
 
-    return data
+    return _expand_leaderboard(data, CourseProficiencyLeadersSerializer)
 
 
 def _get_courses_metrics_completions_leaders_list(course_key, **kwargs):
     course_id = str(course_key)
     user_id = kwargs.get('user_id')
     data = {}
+    cached_data, cache_generations, cache_scope = _get_leaders_cached_data(
+        course_id, user_id, COMPLETIONS_LEADERS_CACHE_CATEGORIES, kwargs
+    )
+    progress_category = _get_leaders_cache_category('progress', cache_scope)
+    leaderboard_category = _get_leaders_cache_category('progress_leaderboard', cache_scope)
 
     if user_id:  # for single user's progress fetch from cache if available
-        cached_progress_data = get_cached_data('progress', course_id, user_id)
+        cached_progress_data = cached_data.get('progress')
         if cached_progress_data:
             data.update(cached_progress_data)
             if kwargs.get('skipleaders'):
                 return data
 
-            cached_leader_board_data = get_cached_data('progress_leaderboard', course_id)
-            if cached_leader_board_data and \
-                    not kwargs.get(('org_ids') or kwargs.get('group_ids') or kwargs.get('exclude_roles')):
+            cached_leader_board_data = cached_data.get('progress_leaderboard')
+            if cached_leader_board_data:
                 data.update(cached_leader_board_data)
-                return data
+                return _expand_leaderboard(data, CourseCompletionsLeadersSerializer)
 
-    data = _get_course_progress_metrics(course_key, **kwargs)
+    data = get_course_progress_metrics(course_key, **kwargs)
     total_users = data['total_users']
 
     if not kwargs.get('skipleaders') and 'leaders' not in data:
-        queryset = generate_leaderboard(course_key, **kwargs)
-        serializer = CourseCompletionsLeadersSerializer(queryset, many=True)
-        data['leaders'] = serializer.data  # pylint: disable=E1101
-        cache_course_data('progress_leaderboard', course_id, {'leaders': data['leaders']})
+        def _generate_completions_leaderboard():
+            return _compact_leaderboard(
+                {'queryset': generate_leaderboard(course_key, **kwargs)},
+                CourseCompletionsLeadersSerializer,
+            )
+
+        data.update(_generate_leaderboard_single_flight(
+            leaderboard_category, course_key, _generate_completions_leaderboard, **kwargs
+        ))
+        if not data.get('stale'):
+            cache_course_data(
+                leaderboard_category, course_id, {'leader_rows': data['leader_rows']},
+                generation=cache_generations['progress_leaderboard']
+            )
     else:
-        cache_course_data('progress', course_id, {
+        cache_course_data(progress_category, course_id, {
             'course_avg': data['course_avg'],
             'total_users': data['total_users'],
             'total_possible_completions': data['total_possible_completions'],
-        })
+        }, generation=cache_generations['progress'])
 
         # set user data in cache only if the user exists
         if user_id:
-            cache_course_user_data('progress', course_id, user_id, {
+            cache_course_user_data(progress_category, course_id, user_id, {
                 'completions': data['completions'], 'position': data['position']
-            })
+            }, generation=cache_generations['progress'])
 
-    return data
+    return _expand_leaderboard(data, CourseCompletionsLeadersSerializer)
 
 
 def _get_courses_metrics_social_leaders_list(course_key, **kwargs):
     course_id = str(course_key)
     user_id = kwargs.get('user_id')
     data = {}
+    cached_data, cache_generations, cache_scope = _get_leaders_cached_data(
+        course_id, user_id, SOCIAL_LEADERS_CACHE_CATEGORIES, kwargs
+    )
+    social_category = _get_leaders_cache_category('social', cache_scope)
+    leaderboard_category = _get_leaders_cache_category('social_leaderboard', cache_scope)
 
-    cached_social_data = get_cached_data('social', course_id, user_id)
-    cached_leader_board_data = get_cached_data('social_leaderboard', course_id)
-    if cached_leader_board_data and cached_social_data and 'position' in cached_social_data and \
-            not (kwargs.get('org_ids') or kwargs.get('exclude_users')):
+    cached_social_data = cached_data.get('social')
+    cached_leader_board_data = cached_data.get('social_leaderboard')
+    if cached_leader_board_data and cached_social_data and 'position' in cached_social_data:
         data.update(cached_social_data)
         data.update(cached_leader_board_data)
-        return data
+        return _expand_leaderboard(data, CourseSocialLeadersSerializer)
 
-    data.update(StudentSocialEngagementScore.generate_leaderboard(course_key, **kwargs))
+    def _generate_social_leaderboard():
+        return _compact_leaderboard(
+            StudentSocialEngagementScore.generate_leaderboard(course_key, **kwargs),
+            CourseSocialLeadersSerializer,
+        )
 
-    serializer = CourseSocialLeadersSerializer(data.pop('queryset'), many=True)
-    data['leaders'] = serializer.data  # pylint: disable=E1101
+    data.update(_generate_leaderboard_single_flight(
+        leaderboard_category, course_key, _generate_social_leaderboard, **kwargs
+    ))
 
     if user_id:
-        user_data = StudentSocialEngagementScore.get_user_leaderboard_position(course_key, **kwargs)
-        data.update(user_data)
-        data.pop('total_user_count')
-        cache_course_user_data('social', course_id, user_id, {"score": data['score'], "position": data['position']})
-        cache_course_data('social', course_id, {'course_avg': data['course_avg']})
-        cache_course_data('social_leaderboard', course_id, {'leaders': data['leaders']})
+        indexed_position = get_indexed_user_position('social', course_key, **kwargs)
+        if indexed_position is not None:
+            data['score'], data['position'] = indexed_position
+        else:
+            data.update(StudentSocialEngagementScore.get_user_leaderboard_position(course_key, **kwargs))
+        data.pop('total_user_count', None)
+        cache_course_user_data(social_category, course_id, user_id, {
+            "score": data['score'], "position": data['position']
+        }, generation=cache_generations['social'])
+        cache_course_data(
+            social_category, course_id, {'course_avg': data['course_avg']}, generation=cache_generations['social']
+        )
+        if not data.get('stale'):
+            cache_course_data(
+                leaderboard_category, course_id, {'leader_rows': data['leader_rows']},
+                generation=cache_generations['social_leaderboard']
+            )
     else:
         data.pop('total_user_count')
 
-    return data
+    return _expand_leaderboard(data, CourseSocialLeadersSerializer)
 
 
 class CourseContentList(SecureAPIView):
@@ -981,6 +1148,9 @@ class CoursesEnrollmentCount(SecureAPIView):
 
         * enrollment_count: Count of users enrolled in course.
 
+        Count is read from course metrics snapshot when available, pass `fresh=true`
+        to compute it live.
+
     """
 
     def get(self, request, course_id):  # pylint: disable=W0613
@@ -990,7 +1160,13 @@ class CoursesEnrollmentCount(SecureAPIView):
         if not course_exists(course_id):
             return Response({}, status=status.HTTP_404_NOT_FOUND)
         response_data = {}
-        enrollment_count = get_course_enrollment_count(course_id)
+        snapshot = None
+        if not str2bool(request.query_params.get('fresh', 'false')):
+            snapshot = CourseMetricsSnapshot.get_snapshot(get_course_key(course_id))
+        if snapshot:
+            enrollment_count = snapshot.users_enrolled
+        else:
+            enrollment_count = get_course_enrollment_count(course_id)
         response_data['enrollment_count'] =  enrollment_count
         return Response(response_data, status=status.HTTP_200_OK)
 
@@ -1398,6 +1574,8 @@ class CoursesEngagementSummary(MobileListAPIView):
         * GET supports filtering of course engagement summary by organizations, groups
         * To get course engagement summary for an organization
         ```/api/courses/{course_id}/engagement-summary?organizations={organization_id}```
+        * Summary is cached for `ENGAGEMENT_SUMMARY_CACHE_TTL` seconds, pass `fresh=true` to compute it live
+        ```/api/courses/{course_id}/engagement-summary?fresh=true```
 
     **GET Response Values**
 
@@ -1431,52 +1609,18 @@ class CoursesEngagementSummary(MobileListAPIView):
             'user_id': user_id,
             'org_ids': get_ids_from_list_param(self.request, 'organizations'),
             'group_ids': get_ids_from_list_param(self.request, 'groups'),
-            'exclude_users': get_aggregate_exclusion_user_ids(self.course_key),
+            'exclude_users': UserExclusion(self.course_key),
             'cohort_user_ids': _get_users_in_cohort(user_id, self.course_key, ignore_groupwork=True),
         }
-        user_qs = CourseEnrollment.objects.users_enrolled_in(self.course_key).exclude(
-            id__in=params.get('exclude_users') or []
-        )
-        if params.get('org_ids'):
-            user_qs = user_qs.filter(organizations__in=params.get('org_ids') or [])
-
-        total_users = user_qs.count()
-
-        active_users = user_qs.filter(is_active=True).count()
-        last_week = timezone.now() - timezone.timedelta(days=7)
-        users_logged_in_last_week = user_qs.filter(last_login__range=(last_week, timezone.now()))
-        users_logged_in_last_week_count = users_logged_in_last_week.count()
-
-        progress_qs = get_filtered_aggregation_queryset(self.course_key, **params)
-        progress_sum = progress_qs.aggregate(percent=Sum(Round(F('percent')*100))).get('percent') or 0
-        last_week_progress = progress_qs.filter(user_id__in=users_logged_in_last_week)
-        last_week_progress_sum = (last_week_progress.aggregate(
-            percent=Sum('percent')
-        ).get('percent') or 0) * 100
-        users_with_progress = progress_qs.count()
-
-        def safe_division(dividend, divisor):
-            return 0 if divisor == 0 else dividend / divisor
-
-        data = {}
-        data['total_users'] = total_users
-        data['total_course_progress'] = safe_division(float(progress_sum), total_users)
-
-        data['active_users'] = active_users
-        data['active_users_percentage'] = safe_division(float(active_users), total_users) * 100
-        data['active_users_progress'] = safe_division(float(progress_sum), active_users)
-
-        data['engaged_users'] = users_with_progress
-        data['engaged_users_percentage'] = safe_division(float(users_with_progress), total_users) * 100
-        data['engaged_users_progress'] = safe_division(float(progress_sum), users_with_progress)
-
-        data['last_week_login_users'] = users_logged_in_last_week_count
-        data['last_week_login_users_percentage'] = safe_division(
-            float(users_logged_in_last_week_count), total_users
-        ) * 100
-        data['last_week_login_users_progress'] = safe_division(
-            float(last_week_progress_sum), users_logged_in_last_week_count
-        )
+        cache_ttl = getattr(settings, 'ENGAGEMENT_SUMMARY_CACHE_TTL', ENGAGEMENT_SUMMARY_CACHE_TTL)
+        use_cache = cache_ttl and not str2bool(self.request.query_params.get('fresh', 'false'))
+        cache_category = _get_leaders_cache_category('engagement_summary', _get_leaders_cache_scope(**params))
+        generation = get_cache_generation(cache_category, course_id) if use_cache else None
+        data = get_cached_data(cache_category, course_id, generation=generation) if use_cache else None
+        if data is None:
+            data = get_course_engagement_summary(self.course_key, **params)
+            if use_cache:
+                cache_course_data(cache_category, course_id, data, timeout=cache_ttl, generation=generation)
 
         return Response(data, status=status.HTTP_200_OK)
 
@@ -1516,7 +1660,7 @@ class CoursesUsersPassedList(SecureListAPIView):
         group_ids = get_ids_from_list_param(self.request, 'groups')
 
         course_key = get_course_key(course_id)
-        exclude_users = get_aggregate_exclusion_user_ids(course_key)
+        exclude_users = UserExclusion(course_key)
 
         queryset = StudentGradebook.get_passed_users_gradebook(
             course_key, exclude_users=exclude_users, org_ids=org_ids, group_ids=group_ids
@@ -1759,6 +1903,55 @@ class CourseContentUsersList(SecureAPIView):
         return Response(serializer.data)  # pylint: disable=E1101
 
 
+class CoursesMetricsDistribution(SecureAPIView):
+    """
+    ### The CoursesMetricsDistribution view allows clients to retrieve histogram and percentiles of
+    progress or grades of users in the specified Course
+    - URI: ```/api/courses/{course_id}/metrics/distribution/?metric={progress|grade}```
+    - GET: Returns a JSON representation of the distribution, scores range from 0 to 1
+    Number of histogram buckets can be given by buckets parameter, 10 by default
+    ```/api/courses/{course_id}/metrics/distribution/?metric=grade&buckets=5```
+    Percentiles can be given by percentiles parameter
+    ```/api/courses/{course_id}/metrics/distribution/?metric=progress&percentiles=25,50,75```
+    Distribution can be filtered by organizations, groups and cohort (with `user_id` param),
+    and users with certain roles can be excluded the same way as in leaderboards
+    ```/api/courses/{course_id}/metrics/distribution/?organizations={org_id}&exclude_roles=observer```
+    ### Use Cases/Notes:
+    * Example: Draw a chart of progress distribution in a given course
+    """
+    supported_metrics = ('progress', 'grade')
+
+    def get(self, request, course_id):  # pylint: disable=W0613
+        """
+        GET /api/courses/{course_id}/metrics/distribution/
+        """
+        if not course_exists(course_id):
+            return Response({}, status=status.HTTP_404_NOT_FOUND)
+
+        metric = request.query_params.get('metric', 'progress')
+        buckets = request.query_params.get('buckets', 10)
+        percentiles = css_param_to_list(request, 'percentiles')
+        if metric not in self.supported_metrics or not is_int(buckets) or not 0 < int(buckets) <= 100 or \
+                not all(is_int(percentile) and 0 < int(percentile) <= 100 for percentile in percentiles):
+            return Response({}, status=status.HTTP_400_BAD_REQUEST)
+
+        course_key = get_course_key(course_id)
+        exclude_roles = css_param_to_list(request, 'exclude_roles')
+        user_id = request.query_params.get('user_id', None)
+        data = get_score_distribution(
+            metric,
+            course_key,
+            buckets=int(buckets),
+            percentiles=[int(percentile) for percentile in percentiles],
+            org_ids=get_ids_from_list_param(request, 'organizations'),
+            group_ids=get_ids_from_list_param(request, 'groups'),
+            exclude_users=UserExclusion(course_key, roles=exclude_roles),
+            cohort_user_ids=_get_users_in_cohort(user_id, course_key, ignore_groupwork=True),
+        )
+        data['metric'] = metric
+        return Response(data, status=status.HTTP_200_OK)
+
+
 class CoursesMetricsGradesList(SecureListAPIView):
     """
     ### The CoursesMetricsGradesList view allows clients to retrieve a list of grades for the specified Course
@@ -1775,12 +1968,13 @@ class CoursesMetricsGradesList(SecureListAPIView):
         if not course_exists(course_id):
             return Response({}, status=status.HTTP_404_NOT_FOUND)
         course_key = get_course_key(course_id)
-        exclude_users = get_aggregate_exclusion_user_ids(course_key)
-        queryset = StudentGradebook.objects.filter(course_id__exact=course_key,
-                                                   user__is_active=True,
-                                                   user__courseenrollment__is_active=True,
-                                                   user__courseenrollment__course_id__exact=course_key)\
-            .exclude(user__in=exclude_users)
+        exclude_users = UserExclusion(course_key)
+        queryset = exclude_users.exclude_from(StudentGradebook.objects.filter(
+            course_id__exact=course_key,
+            user__is_active=True,
+            user__courseenrollment__is_active=True,
+            user__courseenrollment__course_id__exact=course_key,
+        ))
         user_ids = get_ids_from_list_param(self.request, 'user_id')
         if user_ids:
             queryset = queryset.filter(user__in=user_ids)
@@ -1845,6 +2039,141 @@ def _get_users_in_cohort(user_id, course_key, ignore_groupwork):
     return get_cohort_user_ids(user_id, course_key)
 
 
+def _get_users_enrolled_section(context, dependencies_data):  # pylint: disable=unused-argument
+    """
+    Counts users enrolled in a course, from cache unless enrollments are filtered by groups or cohort
+    """
+    if not context['is_filtered']:
+        enrollment_count = get_course_enrollment_count(
+            course_id=context['course_id'],
+            org_id=context['organization'],
+            exclude_org_admins=bool(context['exclude_type']),
+        )
+    else:
+        filters = context['filters']
+        users_enrolled_qs = exclude_users_from(
+            CourseEnrollment.objects.users_enrolled_in(context['course_key']), filters['exclude_users'],
+            user_field='id'
+        )
+
+        if context['organization']:
+            users_enrolled_qs = users_enrolled_qs.filter(organizations=context['organization']).distinct()
+
+        if filters['group_ids']:
+            users_enrolled_qs = users_enrolled_qs.filter(groups__in=filters['group_ids']).distinct()
+
+        if filters['cohort_user_ids']:
+            users_enrolled_qs = users_enrolled_qs.filter(id__in=filters['cohort_user_ids'])
+
+        enrollment_count = users_enrolled_qs.count()
+    return {'users_enrolled': enrollment_count}
+
+
+def _get_users_started_section(context, dependencies_data):
+    """
+    Counts users who started a course and users enrolled who did not
+    """
+    users_started = get_num_users_started(context['course_key'], **context['filters'])
+    return {
+        'users_started': users_started,
+        'users_not_started': dependencies_data['users_enrolled']['users_enrolled'] - users_started,
+    }
+
+
+def _get_modules_completed_section(context, dependencies_data):  # pylint: disable=unused-argument
+    """
+    Counts modules completed in a course
+    """
+    modules_completed, _ = get_total_completions(context['course_key'], **context['filters'])
+    return {'modules_completed': modules_completed}
+
+
+def _get_users_completed_section(context, dependencies_data):  # pylint: disable=unused-argument
+    """
+    Counts users who completed a course, from cache unless users are filtered by groups or cohort
+    """
+    if not context['is_filtered']:
+        users_completed = CoursesMetrics.get_course_completed_users_count(
+            course_id=context['course_id'],
+            org_id=context['organization']
+        )
+    else:
+        users_completed = StudentGradebook.get_num_users_completed(context['course_key'], **context['filters'])
+    return {'users_completed': users_completed}
+
+
+def _get_users_passed_section(context, dependencies_data):  # pylint: disable=unused-argument
+    """
+    Counts users who passed a course, from cache unless users are filtered by groups or cohort
+    """
+    if not context['is_filtered']:
+        users_passed = CoursesMetrics.get_course_passed_users_count(
+            course_id=context['course_id'],
+            org_id=context['organization']
+        )
+    else:
+        users_passed = StudentGradebook.get_passed_users_gradebook(context['course_key'], **context['filters']).count()
+    return {'users_passed': users_passed}
+
+
+def _get_avg_progress_section(context, dependencies_data):  # pylint: disable=unused-argument
+    """
+    Computes average progress in a course, from cache unless users are filtered by groups or cohort
+    """
+    if not context['is_filtered']:
+        avg_progress = CoursesMetrics.get_course_avg_progress(
+            course_id=context['course_id'],
+            org_id=context['organization']
+        )
+    else:
+        avg_progress = get_course_progress_metrics(context['course_key'], **context['filters']).get('course_avg')
+    return {'avg_progress': avg_progress}
+
+
+def _get_avg_grade_section(context, dependencies_data):  # pylint: disable=unused-argument
+    """
+    Computes average grade in a course, from cache unless users are filtered by groups or cohort
+    """
+    if not context['is_filtered']:
+        avg_grade = CoursesMetrics.get_course_avg_grade(
+            course_id=context['course_id'],
+            org_id=context['organization']
+        )
+    else:
+        avg_grade = StudentGradebook.course_grade_avg(context['course_key'], **context['filters'])
+    return {'avg_grade': avg_grade}
+
+
+def _get_thread_stats_section(context, dependencies_data):  # pylint: disable=unused-argument
+    """
+    Fetches discussion threads stats of a course from the forum service, last fetched stats are
+    marked `stale` when the forum service is unavailable
+    """
+    thread_stats, is_stale = get_forum_stats(
+        'thread_stats', context['course_id'], get_course_thread_stats, context['slash_course_id']
+    )
+    if is_stale:
+        thread_stats = dict(thread_stats, stale=True)
+    return {'thread_stats': thread_stats}
+
+
+# sections of course metrics by `metrics_required` name, `users_enrolled` is always computed
+COURSE_METRICS_SECTIONS = OrderedDict([
+    ('users_enrolled', MetricSection(_get_users_enrolled_section, timeout=COURSE_METRICS_SECTION_TIMEOUT)),
+    ('users_started', MetricSection(
+        _get_users_started_section, dependencies=('users_enrolled',), timeout=COURSE_METRICS_SECTION_TIMEOUT
+    )),
+    ('modules_completed', MetricSection(_get_modules_completed_section, timeout=COURSE_METRICS_SECTION_TIMEOUT)),
+    ('users_completed', MetricSection(_get_users_completed_section, timeout=COURSE_METRICS_SECTION_TIMEOUT)),
+    ('users_passed', MetricSection(_get_users_passed_section, timeout=COURSE_METRICS_SECTION_TIMEOUT)),
+    ('avg_progress', MetricSection(_get_avg_progress_section, timeout=COURSE_METRICS_SECTION_TIMEOUT)),
+    ('avg_grade', MetricSection(_get_avg_grade_section, timeout=COURSE_METRICS_SECTION_TIMEOUT)),
+    ('thread_stats', MetricSection(
+        _get_thread_stats_section, timeout=THREAD_STATS_TIMEOUT, expected_errors=FORUM_SERVICE_ERRORS
+    )),
+])
+
+
 class CoursesMetrics(SecureAPIView):
     """
     ### The CoursesMetrics view allows clients to retrieve a list of Metrics for the specified Course
@@ -1855,6 +2184,11 @@ class CoursesMetrics(SecureAPIView):
     - metrics_required param should be comma separated list of metrics required
     - possible values for metrics_required param are
     - ``` users_started,modules_completed,users_completed,thread_stats,users_passed,avg_grade,avg_progress ```
+    - metrics are read from course metrics snapshot when available, pass `fresh=true` to compute them live
+    - metrics are computed concurrently, metrics which timed out or whose service is unavailable are left out
+      and reported in `metrics_errors`, forum errors are also reported in `err_msg`
+    - thread stats are cached for `FORUM_STATS_CACHE_TTL` seconds, last fetched stats are returned marked `stale`
+      while the forum service fails or doesn't respond in `FORUM_STATS_DEADLINE` seconds
     ### Use Cases/Notes:
     * Example: Display number of users enrolled in a given course
     """
@@ -1866,21 +2200,22 @@ class CoursesMetrics(SecureAPIView):
         """
         cache_category = 'grade'
         if org_id:
-            cache_category = '{}_{}'.format(cache_category, org_id)
+            cache_category = get_cache_category(cache_category, org_id)
 
-        data = get_cached_data(cache_category, course_id)
+        generation = get_cache_generation(cache_category, course_id)
+        data = get_cached_data(cache_category, course_id, generation=generation)
         if data is not None:
             return data.get('course_avg')
 
         course_key = get_course_key(course_id)
-        exclude_user_ids = get_aggregate_exclusion_user_ids(course_key)
+        exclude_users = UserExclusion(course_key)
 
         avg_grade = StudentGradebook.course_grade_avg(
             course_key,
-            exclude_users=exclude_user_ids,
+            exclude_users=exclude_users,
             org_ids=[org_id] if org_id else None
         )
-        cache_course_data(cache_category, course_id, {'course_avg': avg_grade})
+        cache_course_data(cache_category, course_id, {'course_avg': avg_grade}, generation=generation)
 
         return avg_grade
 
@@ -1892,21 +2227,22 @@ class CoursesMetrics(SecureAPIView):
         """
         cache_category = 'progress'
         if org_id:
-            cache_category = '{}_{}'.format(cache_category, org_id)
+            cache_category = get_cache_category(cache_category, org_id)
 
-        data = get_cached_data(cache_category, course_id)
+        generation = get_cache_generation(cache_category, course_id)
+        data = get_cached_data(cache_category, course_id, generation=generation)
         if data is not None:
             return data.get('course_avg')
 
         course_key = get_course_key(course_id)
-        exclude_user_ids = get_aggregate_exclusion_user_ids(course_key)
+        exclude_users = UserExclusion(course_key)
 
-        data = _get_course_progress_metrics(
+        data = get_course_progress_metrics(
             course_key,
-            exclude_users=exclude_user_ids,
+            exclude_users=exclude_users,
             org_ids=[org_id] if org_id else None,
         )
-        cache_course_data(cache_category, course_id, data)
+        cache_course_data(cache_category, course_id, data, generation=generation)
 
         return data.get('course_avg')
 
@@ -1918,21 +2254,22 @@ class CoursesMetrics(SecureAPIView):
         """
         cache_category = 'passed_count'
         if org_id:
-            cache_category = '{}_{}'.format(cache_category, org_id)
+            cache_category = get_cache_category(cache_category, org_id)
 
-        passed_count = get_cached_data(cache_category, course_id)
+        generation = get_cache_generation(cache_category, course_id)
+        passed_count = get_cached_data(cache_category, course_id, generation=generation)
         if passed_count is not None:
             return passed_count
 
         course_key = get_course_key(course_id)
-        exclude_user_ids = get_aggregate_exclusion_user_ids(course_key)
+        exclude_users = UserExclusion(course_key)
 
         passed_count = StudentGradebook.get_passed_users_gradebook(
             course_key,
-            exclude_users=exclude_user_ids,
+            exclude_users=exclude_users,
             org_ids=[org_id] if org_id else None
         ).count()
-        cache_course_data(cache_category, course_id, passed_count)
+        cache_course_data(cache_category, course_id, passed_count, generation=generation)
 
         return passed_count
 
@@ -1944,21 +2281,22 @@ class CoursesMetrics(SecureAPIView):
         """
         cache_category = 'completed_count'
         if org_id:
-            cache_category = '{}_{}'.format(cache_category, org_id)
+            cache_category = get_cache_category(cache_category, org_id)
 
-        completed_count = get_cached_data(cache_category, course_id)
+        generation = get_cache_generation(cache_category, course_id)
+        completed_count = get_cached_data(cache_category, course_id, generation=generation)
         if completed_count is not None:
             return completed_count
 
         course_key = get_course_key(course_id)
-        exclude_user_ids = get_aggregate_exclusion_user_ids(course_key)
+        exclude_users = UserExclusion(course_key)
 
         completed_count = StudentGradebook.get_num_users_completed(
             course_key,
-            exclude_users=exclude_user_ids,
+            exclude_users=exclude_users,
             org_ids=[org_id] if org_id else None
         )
-        cache_course_data(cache_category, course_id, completed_count)
+        cache_course_data(cache_category, course_id, completed_count, generation=generation)
 
         return completed_count
 
@@ -1969,143 +2307,53 @@ class CoursesMetrics(SecureAPIView):
         if not course_exists(course_id):
             return Response({}, status=status.HTTP_404_NOT_FOUND)
         course_descriptor, course_key, course_content = get_course(request, request.user, course_id)  # pylint: disable=W0612
-        slash_course_id = get_course_key(course_id, slashseparated=True)
         exclude_type = request.query_params.get('exclude_type', None)
         organization = request.query_params.get('organization', None)
-        org_ids = [organization] if organization else None
         group_ids = get_ids_from_list_param(self.request, 'groups')
         metrics_required = css_param_to_list(request, 'metrics_required')
-        exclude_users = get_aggregate_exclusion_user_ids(course_key)
+        fresh = str2bool(request.query_params.get('fresh', 'false'))
         user_id = request.query_params.get('user_id', None)
         cohort_user_ids = _get_users_in_cohort(user_id, course_key, ignore_groupwork=True)
 
-        if not any([group_ids, cohort_user_ids]):
-            enrollment_count = get_course_enrollment_count(
-                course_id=course_id,
-                org_id=organization,
-                exclude_org_admins=bool(exclude_type),
-            )
+        snapshot = None
+        if not any([fresh, exclude_type, group_ids, cohort_user_ids]):
+            snapshot = CourseMetricsSnapshot.get_snapshot(course_key, organization)
+
+        data = {'grade_cutoffs': course_descriptor.grading_policy['GRADE_CUTOFFS']}
+        if snapshot:
+            data['users_enrolled'] = snapshot.users_enrolled
+            data.update(snapshot.get_metrics(metrics_required))
+            sections = [
+                name for name in metrics_required
+                if name in COURSE_METRICS_SECTIONS and name not in CourseMetricsSnapshot.SNAPSHOT_METRICS
+            ]
         else:
-            users_enrolled_qs = CourseEnrollment.objects.users_enrolled_in(course_key).exclude(id__in=exclude_users)
-
-            if organization:
-                users_enrolled_qs = users_enrolled_qs.filter(organizations=organization).distinct()
-                if exclude_type:
-                    non_company_users = get_non_actual_company_users(exclude_type, organization)
-                    users_enrolled_qs.exclude(id__in=non_company_users)
-
-            if group_ids:
-                users_enrolled_qs = users_enrolled_qs.filter(groups__in=group_ids).distinct()
-
-            if cohort_user_ids:
-                users_enrolled_qs = users_enrolled_qs.filter(id__in=cohort_user_ids)
-
-            enrollment_count = users_enrolled_qs.count()
+            sections = ['users_enrolled'] + [name for name in metrics_required if name in COURSE_METRICS_SECTIONS]
 
-        data = {
-            'grade_cutoffs': course_descriptor.grading_policy['GRADE_CUTOFFS'],
-            'users_enrolled': enrollment_count
+        context = {
+            'course_id': course_id,
+            'course_key': course_key,
+            'slash_course_id': get_course_key(course_id, slashseparated=True),
+            'organization': organization,
+            'exclude_type': exclude_type,
+            'is_filtered': any([group_ids, cohort_user_ids]),
+            'filters': {
+                'exclude_users': UserExclusion(course_key),
+                'org_ids': [organization] if organization else None,
+                'group_ids': group_ids,
+                'cohort_user_ids': cohort_user_ids,
+            },
         }
-
-        if 'users_started' in metrics_required:
-            users_started = get_num_users_started(
-                course_key,
-                exclude_users=exclude_users,
-                org_ids=org_ids,
-                group_ids=group_ids,
-                cohort_user_ids=cohort_user_ids,
-            )
-            data['users_started'] = users_started
-            data['users_not_started'] = data['users_enrolled'] - users_started
-
-        if 'modules_completed' in metrics_required:
-            modules_completed, _ = get_total_completions(
-                course_key,
-                exclude_users=exclude_users,
-                org_ids=org_ids,
-                group_ids=group_ids,
-                cohort_user_ids=cohort_user_ids,
-            )
-            data['modules_completed'] = modules_completed
-
-        if 'users_completed' in metrics_required:
-            if not any([group_ids, cohort_user_ids]):
-                users_completed = CoursesMetrics.get_course_completed_users_count(
-                    course_id=course_id,
-                    org_id=organization
-                )
-            else:
-                users_completed = StudentGradebook.get_num_users_completed(
-                    course_key,
-                    exclude_users=exclude_users,
-                    org_ids=org_ids,
-                    group_ids=group_ids,
-                    cohort_user_ids=cohort_user_ids,
-                )
-            data['users_completed'] = users_completed
-
-        if 'users_passed' in metrics_required:
-            if not any([group_ids, cohort_user_ids]):
-                users_passed = CoursesMetrics.get_course_passed_users_count(
-                    course_id=course_id,
-                    org_id=organization
-                )
-            else:
-                users_passed = StudentGradebook.get_passed_users_gradebook(
-                    course_key,
-                    exclude_users=exclude_users,
-                    org_ids=org_ids,
-                    group_ids=group_ids,
-                    cohort_user_ids=cohort_user_ids,
-                ).count()
-
-            data['users_passed'] = users_passed
-
-        if 'avg_progress' in metrics_required:
-            if not any([group_ids, cohort_user_ids]):
-                avg_progress = CoursesMetrics.get_course_avg_progress(
-                    course_id=course_id,
-                    org_id=organization
-                )
-            else:
-                progress_metrics = _get_course_progress_metrics(
-                    course_key,
-                    exclude_users=exclude_users,
-                    org_ids=org_ids,
-                    group_ids=group_ids,
-                    cohort_user_ids=cohort_user_ids
-                )
-                avg_progress = progress_metrics.get('course_avg')
-
-            data['avg_progress'] = avg_progress
-
-        if 'avg_grade' in metrics_required:
-            if not any([group_ids, cohort_user_ids]):
-                avg_grade = CoursesMetrics.get_course_avg_grade(
-                    course_id=course_id,
-                    org_id=organization
-                )
-            else:
-                avg_grade = StudentGradebook.course_grade_avg(
-                    course_key,
-                    exclude_users=exclude_users,
-                    org_ids=org_ids,
-                    group_ids=group_ids,
-                    cohort_user_ids=cohort_user_ids,
-                )
-
-            data['avg_grade'] = avg_grade
-
-        if 'thread_stats' in metrics_required:
-            try:
-                data['thread_stats'] = get_course_thread_stats(slash_course_id)
-            except (CommentClientMaintenanceError, CommentClientRequestError, ConnectionError) as e:
-                logging.error("Forum service returned an error: %s", str(e))
-
-                data = {
-                    "err_msg": str(e)
-                }
-                return Response(data, status=status.HTTP_200_OK)
+        sections_data, errors = compute_metric_sections(
+            COURSE_METRICS_SECTIONS, sections, context,
+            max_workers=getattr(settings, 'COURSE_METRICS_MAX_WORKERS', COURSE_METRICS_MAX_WORKERS),
+            timeouts=getattr(settings, 'COURSE_METRICS_SECTION_TIMEOUTS', None),
+        )
+        data.update(sections_data)
+        if errors:
+            data['metrics_errors'] = errors
+            if 'thread_stats' in errors:
+                data['err_msg'] = _("Forum service is unavailable")
         return Response(data, status=status.HTTP_200_OK)
 
 
@@ -2126,6 +2374,8 @@ class CoursesTimeSeriesMetrics(SecureAPIView):
         "active_users": [[datetime-1, count-1], [datetime-2, count-2], ........ [datetime-n, count-n]]
     }
     - metrics can be filtered by organization by adding organization parameter to GET request
+    - values of intervals ending before today of series bucketed by creation date are cached until enrollments
+      or excluded users of the course change
     ### Use Cases/Notes:
     * Example: Display number of users completed, started or not started in a given course for a given time period
     """
@@ -2153,87 +2403,51 @@ class CoursesTimeSeriesMetrics(SecureAPIView):
             return Response({'message': _('date format is invalid')}, status=status.HTTP_400_BAD_REQUEST)
 
         course_key = get_course_key(course_id)
-        exclude_users = get_aggregate_exclusion_user_ids(course_key)
-        grade_complete_match_range = getattr(settings, 'GRADEBOOK_GRADE_COMPLETE_PROFORMA_MATCH_RANGE', 0.01)
-        grades_qs = StudentGradebook.objects.filter(
-            course_id__exact=course_key,
-            user__is_active=True,
-            user__courseenrollment__is_active=True,
-            user__courseenrollment__course_id__exact=course_key
-        ).exclude(user_id__in=exclude_users)
-        grades_complete_qs = grades_qs.filter(proforma_grade__lte=F('grade') + grade_complete_match_range,
-                                              proforma_grade__gt=0)
-        enrolled_qs = CourseEnrollment.objects.filter(course_id__exact=course_key, user__is_active=True,
-                                                      is_active=True).exclude(user_id__in=exclude_users)
-        users_started_qs = Aggregator.objects.filter(
-            course_key__exact=course_key,
-            user__is_active=True,
-            user__courseenrollment__is_active=True,
-            user__courseenrollment__course_id__exact=course_key,
-            aggregation_name='course',
-            earned__gt=0.0,
-        ).exclude(user_id__in=exclude_users)
-        modules_completed_qs = BlockCompletion.objects.filter(
-            context_key__exact=course_key,
-            user__courseenrollment__is_active=True,
-            user__courseenrollment__course_id__exact=course_key,
-            user__is_active=True,
-            completion__gt=0.0,
-        ).exclude(user_id__in=exclude_users)
-        active_users_qs = StudentModule.objects\
-            .filter(course_id__exact=course_key, student__is_active=True,
-                    student__courseenrollment__is_active=True,
-                    student__courseenrollment__course_id__exact=course_key)\
-            .exclude(student_id__in=exclude_users)
-
         organization = request.query_params.get('organization', None)
-        if organization:
-            enrolled_qs = enrolled_qs.filter(user__organizations=organization)
-            grades_complete_qs = grades_complete_qs.filter(user__organizations=organization)
-            users_started_qs = users_started_qs.filter(user__organizations=organization)
-            modules_completed_qs = modules_completed_qs.filter(user__organizations=organization)
-            active_users_qs = active_users_qs.filter(student__organizations=organization)
-
         group_ids = get_ids_from_list_param(self.request, 'groups')
-        if group_ids:
-            enrolled_qs = enrolled_qs.filter(user__groups__in=group_ids).distinct()
-            grades_complete_qs = grades_complete_qs.filter(user__groups__in=group_ids).distinct()
-            users_started_qs = users_started_qs.filter(user__groups__in=group_ids).distinct()
-            modules_completed_qs = modules_completed_qs.filter(user__groups__in=group_ids).distinct()
-            active_users_qs = active_users_qs.filter(student__groups__in=group_ids).distinct()
-
-        total_enrolled = enrolled_qs.filter(created__lt=start_dt).count()
-        total_started_count = users_started_qs.filter(created__lt=start_dt).aggregate(Count('user', distinct=True))
-        total_started = total_started_count['user__count'] or 0
-        enrolled_series = get_time_series_data(
-            enrolled_qs, start_dt, end_dt, interval=interval,
-            date_field='created', date_field_model=CourseEnrollment,
-            aggregate=Count('id', distinct=True)
-        )
-        started_series = get_time_series_data(
-            users_started_qs, start_dt, end_dt, interval=interval,
-            date_field='created', date_field_model=Aggregator,
-            aggregate=Count('user', distinct=True)
-        )
-        completed_series = get_time_series_data(
-            grades_complete_qs, start_dt, end_dt, interval=interval,
-            date_field='modified', date_field_model=StudentGradebook,
-            aggregate=Count('id', distinct=True)
-        )
-        modules_completed_series = get_time_series_data(
-            modules_completed_qs, start_dt, end_dt, interval=interval,
-            date_field='created', date_field_model=BlockCompletion,
-            aggregate=Count('id', distinct=True)
-        )
+        querysets = get_time_series_querysets(course_key, org_id=organization, group_ids=group_ids)
+        enrolled_qs = querysets['users_enrolled'][0]
+        users_started_qs = querysets['users_started'][0]
+        # closed intervals are cached by series and filters, the same way as filtered leaderboards
+        cache_scope = _get_leaders_cache_scope(org_ids=[organization] if organization else None, group_ids=group_ids)
+
+        def _get_series_call(metric, series_start_dt, series_end_dt):
+            queryset, date_field, date_field_model, aggregate = querysets[metric]
+            # daily rollups are only kept for all users of a course or of an organization
+            rollup = None if group_ids or (organization and not is_int(organization)) else (
+                course_key, metric, int(organization) if organization else None
+            )
+            # rows bucketed by modified date move to later intervals, so only series by created date are cached
+            cache_category = None if date_field != 'created' else _get_leaders_cache_category(
+                get_cache_category('time_series', metric), cache_scope
+            )
+            return (get_time_series_data, (queryset, series_start_dt, series_end_dt), {
+                'interval': interval, 'date_field': date_field, 'date_field_model': date_field_model,
+                'aggregate': aggregate, 'rollup': rollup, 'course_id': course_id, 'cache_category': cache_category,
+            })
 
         # active users are those who accessed course in last 24 hours
-        start_dt = start_dt - timedelta(hours=24)
-        end_dt = end_dt - timedelta(hours=24)
-        active_users_series = get_time_series_data(
-            active_users_qs, start_dt, end_dt, interval=interval,
-            date_field='modified', date_field_model=StudentModule,
-            aggregate=Count('student', distinct=True)
-        )
+        active_start_dt = start_dt - timedelta(hours=24)
+        active_end_dt = end_dt - timedelta(hours=24)
+        # series are independent of each other so are queried concurrently
+        results = run_concurrently({
+            'total_enrolled': (enrolled_qs.filter(created__lt=start_dt).count, (), {}),
+            'total_started': (
+                users_started_qs.filter(created__lt=start_dt).aggregate, (Count('user', distinct=True),), {}
+            ),
+            'enrolled': _get_series_call('users_enrolled', start_dt, end_dt),
+            'started': _get_series_call('users_started', start_dt, end_dt),
+            'completed': _get_series_call('users_completed', start_dt, end_dt),
+            'modules_completed': _get_series_call('modules_completed', start_dt, end_dt),
+            'active_users': _get_series_call('active_users', active_start_dt, active_end_dt),
+        }, max_workers=getattr(settings, 'TIME_SERIES_MAX_WORKERS', TIME_SERIES_MAX_WORKERS))
+        total_enrolled = results['total_enrolled']
+        total_started = results['total_started']['user__count'] or 0
+        enrolled_series = results['enrolled']
+        started_series = results['started']
+        completed_series = results['completed']
+        modules_completed_series = results['modules_completed']
+        active_users_series = results['active_users']
 
         not_started_series = []
         for enrolled, started in zip(enrolled_series, started_series):
@@ -2266,6 +2480,10 @@ class CoursesMetricsGradesLeadersList(SecureListAPIView):
     ```/api/courses/{course_id}/metrics/grades/leaders/?exclude_roles=observer,assistant```
     To get only grade of a user and course average skipleaders parameter can be used
     ```/api/courses/{course_id}/metrics/grades/leaders/?user_id={user_id}&skipleaders=true```
+    To get positions of several users at once, returned in `positions`
+    ```/api/courses/{course_id}/metrics/grades/leaders/?user_ids={user_id1},{user_id2}```
+    To get `radius` users above and below a user, returned in `around` with their positions
+    ```/api/courses/{course_id}/metrics/grades/leaders/?around={user_id}&radius=5```
     ### Use Cases/Notes:
     * Example: Display grades leaderboard of a given course
     * Example: Display position of a users in a course in terms of grade and course avg
@@ -2284,7 +2502,8 @@ class CoursesMetricsGradesLeadersList(SecureListAPIView):
             'count': self.request.query_params.get('count', 3),
             'skipleaders': str2bool(self.request.query_params.get('skipleaders', 'false')),
             # Users having certain roles (such as an Observer) are excluded from aggregations
-            'exclude_users': get_aggregate_exclusion_user_ids(course_key, roles=exclude_roles),
+            'exclude_roles': exclude_roles,
+            'exclude_users': UserExclusion(course_key, roles=exclude_roles),
             'cohort_user_ids': _get_users_in_cohort(user_id, course_key, ignore_groupwork=True),
         }
 
@@ -2292,6 +2511,12 @@ class CoursesMetricsGradesLeadersList(SecureListAPIView):
             return Response({}, status=status.HTTP_404_NOT_FOUND)
 
         data = _get_courses_metrics_grades_leaders_list(course_key, **params)
+        user_ids = get_ids_from_list_param(self.request, 'user_ids')
+        if user_ids:
+            data['positions'] = _get_users_leaderboard_positions('grade', course_key, user_ids, **params)
+        around_leaders = _get_leaderboard_window(self.request, 'grade', CourseProficiencyLeadersSerializer, course_key, **params)
+        if around_leaders is not None:
+            data['around'] = around_leaders
 
         return Response(data, status=status.HTTP_200_OK)
 
@@ -2427,6 +2652,10 @@ class CoursesMetricsCompletionsLeadersList(SecureAPIView):
     ```/api/courses/{course_id}/metrics/completions/leaders/?organizations={organization_id1},{organization_id2}```
     To exclude users with certain roles from progress/completions calculations
     ```/api/courses/{course_id}/metrics/completions/leaders/?exclude_roles=observer,assistant```
+    To get positions of several users at once, returned in `positions`
+    ```/api/courses/{course_id}/metrics/completions/leaders/?user_ids={user_id1},{user_id2}```
+    To get `radius` users above and below a user, returned in `around` with their positions
+    ```/api/courses/{course_id}/metrics/completions/leaders/?around={user_id}&radius=5```
 
     ### Use Cases/Notes:
     * Example: Display leaders in terms of completions in a given course
@@ -2447,7 +2676,8 @@ class CoursesMetricsCompletionsLeadersList(SecureAPIView):
             'group_ids': get_ids_from_list_param(self.request, 'groups'),
             'skipleaders': str2bool(self.request.query_params.get('skipleaders', 'false')),
             # Users having certain roles (such as an Observer) are excluded from aggregations
-            'exclude_users': get_aggregate_exclusion_user_ids(course_key, roles=exclude_roles),
+            'exclude_roles': exclude_roles,
+            'exclude_users': UserExclusion(course_key, roles=exclude_roles),
             'cohort_user_ids': _get_users_in_cohort(user_id, course_key, ignore_groupwork=True),
         }
 
@@ -2455,13 +2685,98 @@ class CoursesMetricsCompletionsLeadersList(SecureAPIView):
             return Response({}, status=status.HTTP_404_NOT_FOUND)
 
         data = _get_courses_metrics_completions_leaders_list(course_key, **params)
+        user_ids = get_ids_from_list_param(self.request, 'user_ids')
+        if user_ids:
+            data['positions'] = _get_users_leaderboard_positions('progress', course_key, user_ids, **params)
+        around_leaders = _get_leaderboard_window(self.request, 'progress', CourseCompletionsLeadersSerializer, course_key, **params)
+        if around_leaders is not None:
+            data['around'] = around_leaders
+
+        return Response(data, status=status.HTTP_200_OK)
+
+
+def _get_organization_leaders_cache_category(**kwargs):
+    """
+    Returns `org_progress_leaderboard` cache category scoped by a digest of normalized leaderboard filters
+    """
+    filters = {
+        'count': kwargs.get('count'),
+        'course_ids': sorted(str(course_key) for course_key in kwargs.get('course_keys') or []),
+        'exclude_type': kwargs.get('exclude_type'),
+        'exclude_roles': sorted(kwargs.get('exclude_roles') or []),
+    }
+    digest = hashlib.md5(json.dumps(filters).encode('utf-8')).hexdigest()
+    return get_cache_category('org_progress_leaderboard', digest)
+
+
+def _get_organization_completions_leaders_list(org_id, **kwargs):
+    """
+    Returns leaders by completions across courses of an organization, cached under the organization
+    for `ORG_LEADERBOARD_CACHE_TTL` seconds as progress in any of its courses changes the leaderboard
+    """
+    cache_category = _get_organization_leaders_cache_category(**kwargs)
+    generation = get_cache_generation(cache_category, org_id)
+    data = get_cached_data(cache_category, org_id, generation=generation)
+    if data is None:
+        if kwargs.get('exclude_type'):
+            kwargs['exclude_users'] = UserExclusion(organization_id=org_id, exclude_type=kwargs['exclude_type'])
+        data = _compact_leaderboard(
+            {'queryset': generate_organization_leaderboard(org_id, **kwargs)},
+            OrganizationCompletionsLeadersSerializer,
+        )
+        cache_course_data(cache_category, org_id, data, timeout=ORG_LEADERBOARD_CACHE_TTL, generation=generation)
+
+    return _expand_leaderboard(dict(data), OrganizationCompletionsLeadersSerializer)
+
+
+class OrganizationsMetricsCompletionsLeadersList(SecureAPIView):
+    """
+    ### The OrganizationsMetricsCompletionsLeadersList view allows clients to retrieve top 3 users of an
+    organization leading in terms of completions earned across all courses of the organization
+    - URI: ```/api/organizations/{organization_id}/metrics/completions/leaders/```
+    - GET: Returns a JSON representation (array) of the users with completions earned, possible completions
+    and number of courses they progressed in
+    To get more than 3 users use count parameter
+    ```/api/organizations/{organization_id}/metrics/completions/leaders/?count=10```
+    To rank users on some courses of the organization only
+    ```/api/organizations/{organization_id}/metrics/completions/leaders/?courses={course_id1},{course_id2}```
+    To exclude users who are not part of the actual company e.g. company admins of other organizations
+    ```/api/organizations/{organization_id}/metrics/completions/leaders/?exclude_type={group_type}```
+    To exclude users with certain roles in a course from that course's completions
+    ```/api/organizations/{organization_id}/metrics/completions/leaders/?exclude_roles=observer,assistant```
+
+    ### Use Cases/Notes:
+    * Example: Display a single leaderboard for a program made of several courses of an organization
+    """
+
+    def get(self, request, organization_id):  # pylint: disable=W0613
+        """
+        GET /api/organizations/{organization_id}/metrics/completions/leaders/
+        """
+        if not Organization.objects.filter(id=organization_id).exists():
+            return Response({}, status=status.HTTP_404_NOT_FOUND)
 
+        count = self.request.query_params.get('count', 3)
+        if not is_int(count):
+            raise ParseError("Invalid count parameter value")
+        course_keys = [get_course_key(course_id) for course_id in css_param_to_list(self.request, 'courses')]
+        if None in course_keys:
+            raise ParseError("Invalid courses parameter value")
+
+        data = _get_organization_completions_leaders_list(
+            int(organization_id),
+            count=int(count),
+            course_keys=course_keys,
+            exclude_type=self.request.query_params.get('exclude_type'),
+            exclude_roles=css_param_to_list(self.request, 'exclude_roles'),
+        )
         return Response(data, status=status.HTTP_200_OK)
 
 
 class CourseAverageScores(SecureAPIView):
     """
     Returns average scores of users in a course
+    Scores are read from course metrics snapshot when available, pass `fresh=true` to compute them live
     """
     def get(self, request, course_id, score_type):  # pylint: disable=W0613
         """
@@ -2476,10 +2791,19 @@ class CourseAverageScores(SecureAPIView):
             return Response({}, status=status.HTTP_400_BAD_REQUEST)
 
         response_data = {}
+        snapshot = None
+        if not str2bool(request.query_params.get('fresh', 'false')):
+            snapshot = CourseMetricsSnapshot.get_snapshot(get_course_key(course_id))
         if score_type == 'progress':
-            response_data[score_type] = CoursesMetrics.get_course_avg_progress(course_id=course_id)
+            if snapshot:
+                response_data[score_type] = snapshot.avg_progress
+            else:
+                response_data[score_type] = CoursesMetrics.get_course_avg_progress(course_id=course_id)
         if score_type == 'proficiency':
-            response_data[score_type] = CoursesMetrics.get_course_avg_grade(course_id=course_id)
+            if snapshot:
+                response_data[score_type] = snapshot.avg_grade
+            else:
+                response_data[score_type] = CoursesMetrics.get_course_avg_grade(course_id=course_id)
 
         return Response(response_data, status=status.HTTP_200_OK)
 
@@ -2494,6 +2818,10 @@ class CoursesMetricsSocialLeadersList(SecureListAPIView):
     ``` /api/courses/{course_id}/metrics/social/leaders/?count=10```
     To exclude users with certain roles from leaderboard
     ```/api/courses/{course_id}/metrics/social/leaders/?exclude_roles=observer,assistant```
+    To get positions of several users at once, returned in `positions`
+    ```/api/courses/{course_id}/metrics/social/leaders/?user_ids={user_id1},{user_id2}```
+    To get `radius` users above and below a user, returned in `around` with their positions
+    ```/api/courses/{course_id}/metrics/social/leaders/?around={user_id}&radius=5```
     ### Use Cases/Notes:
     * Example: Display social engagement leaderboard of a given course
     * Example: Display position of a users in a course in terms of social engagement and course avg
@@ -2510,7 +2838,8 @@ class CoursesMetricsSocialLeadersList(SecureListAPIView):
             'user_id': user_id,
             'org_ids': get_ids_from_list_param(self.request, 'organizations'),
             'count': self.request.query_params.get('count', 3),
-            'exclude_users': get_aggregate_exclusion_user_ids(course_key, roles=exclude_roles),
+            'exclude_roles': exclude_roles,
+            'exclude_users': UserExclusion(course_key, roles=exclude_roles),
             'cohort_user_ids': _get_users_in_cohort(user_id, course_key, ignore_groupwork=True),
         }
 
@@ -2518,6 +2847,12 @@ class CoursesMetricsSocialLeadersList(SecureListAPIView):
             return Response({}, status=status.HTTP_404_NOT_FOUND)
 
         data = _get_courses_metrics_social_leaders_list(course_key, **params)
+        user_ids = get_ids_from_list_param(self.request, 'user_ids')
+        if user_ids:
+            data['positions'] = _get_users_leaderboard_positions('social', course_key, user_ids, **params)
+        around_leaders = _get_leaderboard_window(self.request, 'social', CourseSocialLeadersSerializer, course_key, **params)
+        if around_leaders is not None:
+            data['around'] = around_leaders
 
         return Response(data, status=status.HTTP_200_OK)
 
@@ -2539,6 +2874,9 @@ class CourseMetricsLeaders(SecureAPIView):
             'social': data from `CoursesMetricsCompletionsLeadersList`
         }
         ```
+        While a leaderboard is being recomputed by another request, previous leaders are returned
+        and the category data has `stale` flag set.
+        With `user_ids` param each category data has `positions` of given users.
         Usage: `GET /api/courses/{course_id}/metrics/leaders/`
         """
         course_key = get_course_key(course_id)
@@ -2550,7 +2888,7 @@ class CourseMetricsLeaders(SecureAPIView):
             'org_ids': get_ids_from_list_param(self.request, 'organizations'),
             'count': self.request.query_params.get('count', 3),
             'exclude_roles': css_param_to_list(self.request, 'exclude_roles'),
-            'exclude_users': get_aggregate_exclusion_user_ids(course_key, roles=exclude_roles),
+            'exclude_users': UserExclusion(course_key, roles=exclude_roles),
             'skipleaders': str2bool(self.request.query_params.get('skipleaders', 'false')),
             'cohort_user_ids': _get_users_in_cohort(user_id, course_key, ignore_groupwork=True),
         }
@@ -2558,11 +2896,26 @@ class CourseMetricsLeaders(SecureAPIView):
         if not course_exists(course_id):
             return Response({}, status=status.HTTP_404_NOT_FOUND)
 
+        # fetch cached data of all leaderboards in a single cache round trip
+        cache_scope = _get_leaders_cache_scope(**params)
+        cached_data, cache_generations = _get_leaders_cached_data_many(
+            GRADES_LEADERS_CACHE_CATEGORIES + COMPLETIONS_LEADERS_CACHE_CATEGORIES + SOCIAL_LEADERS_CACHE_CATEGORIES,
+            str(course_key),
+            user_id,
+            cache_scope,
+        )
+        cached_params = dict(
+            params, cached_data=cached_data, cache_generations=cache_generations, cache_scope=cache_scope
+        )
         data = {
-            'grades': _get_courses_metrics_grades_leaders_list(course_key, **params),
-            'completions': _get_courses_metrics_completions_leaders_list(course_key, **params),
-            'social': _get_courses_metrics_social_leaders_list(course_key, **params),
+            'grades': _get_courses_metrics_grades_leaders_list(course_key, **cached_params),
+            'completions': _get_courses_metrics_completions_leaders_list(course_key, **cached_params),
+            'social': _get_courses_metrics_social_leaders_list(course_key, **cached_params),
         }
+        user_ids = get_ids_from_list_param(self.request, 'user_ids')
+        if user_ids:
+            for category, metric in (('grades', 'grade'), ('completions', 'progress'), ('social', 'social')):
+                data[category]['positions'] = _get_users_leaderboard_positions(metric, course_key, user_ids, **params)
 
         return Response(data, status=status.HTTP_200_OK)
 
@@ -2607,7 +2960,7 @@ class CoursesMetricsSocial(MobileListAPIView):
         scores = request.query_params.get('scores', False)
         course_key = get_course_key(course_id)
         # remove any excluded users from the aggregate
-        exclude_users = get_aggregate_exclusion_user_ids(course_key)
+        exclude_users = UserExclusion(course_key)
 
         if scores:
             data = StudentSocialEngagementScore.get_course_engagement_scores(course_key, organization, exclude_users)
@@ -2615,9 +2968,9 @@ class CoursesMetricsSocial(MobileListAPIView):
         else:
             data = StudentSocialEngagementScore.get_course_engagement_stats(course_key, organization, exclude_users)
 
-            enrollment_qs = CourseEnrollment.objects.users_enrolled_in(course_key) \
-                .filter(is_active=True) \
-                .exclude(id__in=exclude_users)
+            enrollment_qs = exclude_users.exclude_from(
+                CourseEnrollment.objects.users_enrolled_in(course_key).filter(is_active=True), user_field='id'
+            )
 
             if organization:
                 enrollment_qs = enrollment_qs.filter(organizations=organization)
@@ -2630,6 +2983,21 @@ class CoursesMetricsSocial(MobileListAPIView):
         return Response(data, status.HTTP_200_OK)
 
 
+def _get_cities_cache_category(cities, cohort_user_ids):
+    """
+    Returns `cities_count` cache category scoped by a digest of normalized city and cohort filters,
+    so requests with same effective filters share cached rows whatever the order or case of cities
+    """
+    if not cities and not cohort_user_ids:
+        return 'cities_count'
+    filters = {
+        'cities': sorted({city.strip().lower() for city in cities or []}),
+        'cohort_user_ids': sorted(cohort_user_ids or []),
+    }
+    digest = hashlib.md5(json.dumps(filters).encode('utf-8')).hexdigest()
+    return get_cache_category('cities_count', digest)
+
+
 class CoursesMetricsCities(SecureListAPIView):
     """
     ### The CoursesMetricsCities view allows clients to retrieve ordered list of user
@@ -2642,6 +3010,8 @@ class CoursesMetricsCities(SecureListAPIView):
 
     serializer_class = UserCountByCitySerializer
     pagination_class = None
+    # cities are materialized rows rather than a filterable queryset
+    filter_backends = ()
 
     def get_queryset(self):
         course_id = self.kwargs['course_id']
@@ -2650,27 +3020,28 @@ class CoursesMetricsCities(SecureListAPIView):
         if not course_exists(course_id):
             raise Http404
         course_key = get_course_key(course_id)
-        exclude_users = get_aggregate_exclusion_user_ids(course_key)
         cohort_user_ids = _get_users_in_cohort(user_id, course_key, ignore_groupwork=True)
-        cached_cities_data = get_cached_data('cities_count', course_id)
-        if cached_cities_data and not len(self.request.query_params):
-            queryset = cached_cities_data
-        else:
-            queryset = CourseEnrollment.objects.users_enrolled_in(course_key)\
-                .exclude(id__in=exclude_users).exclude(profile__city__isnull=True).exclude(profile__city__iexact='')
-
-            if cohort_user_ids:
-                queryset = queryset.filter(id__in=cohort_user_ids)
-
-            if city:
-                q_list = [Q(profile__city__iexact=item.strip()) for item in city]
-                q_list = reduce(lambda a, b: a | b, q_list)
-                queryset = queryset.filter(q_list)
-
-            queryset = queryset.values('profile__city').annotate(count=Count('profile__city')).order_by('-count')
-            if not len(self.request.query_params):
-                cache_course_data('cities_count', course_id, queryset)
-        return queryset
+        cache_category = _get_cities_cache_category(city, cohort_user_ids)
+        generation = get_cache_generation(cache_category, course_id)
+        cached_cities_data = get_cached_data(cache_category, course_id, generation=generation)
+        if cached_cities_data is not None:
+            return cached_cities_data
+
+        queryset = UserExclusion(course_key).exclude_from(CourseEnrollment.objects.users_enrolled_in(course_key), 'id')\
+            .exclude(profile__city__isnull=True).exclude(profile__city__iexact='')
+
+        if cohort_user_ids:
+            queryset = queryset.filter(id__in=cohort_user_ids)
+
+        if city:
+            q_list = [Q(profile__city__iexact=item.strip()) for item in city]
+            q_list = reduce(lambda a, b: a | b, q_list)
+            queryset = queryset.filter(q_list)
+
+        queryset = queryset.values('profile__city').annotate(count=Count('profile__city')).order_by('-count')
+        cities_data = list(queryset)
+        cache_course_data(cache_category, course_id, cities_data, generation=generation)
+        return cities_data
 
 
 class CoursesRolesList(SecureAPIView):
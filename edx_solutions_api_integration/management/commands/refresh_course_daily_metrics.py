@@ -0,0 +1,49 @@
+"""
+Management command to roll up daily values of course time series metrics
+./manage.py lms refresh_course_daily_metrics --settings=production --days 30
+"""
+
+import logging
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from opaque_keys.edx.keys import CourseKey
+from openedx.core.djangoapps.content.course_overviews.models import CourseOverview
+
+from ...courses.utils import refresh_course_daily_metrics_of_orgs
+
+log = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Command to roll up daily metrics of past days and of today for all or given courses
+    """
+    help = "Roll up daily time series metrics of all courses or of given courses"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--course-ids",
+            dest="course_ids",
+            nargs="+",
+            default=None,
+            help="Course ids to roll up daily metrics for, defaults to all courses",
+        )
+        parser.add_argument(
+            "--days",
+            dest="days",
+            type=int,
+            default=1,
+            help="Number of past days to roll up in addition to today, to backfill rollups",
+        )
+
+    def handle(self, *args, **options):
+        if options['course_ids']:
+            course_keys = [CourseKey.from_string(course_id) for course_id in options['course_ids']]
+        else:
+            course_keys = CourseOverview.objects.values_list('id', flat=True)
+
+        today = timezone.now().date()
+        for course_key in course_keys:
+            log.info("Refreshing daily metrics of course %s", course_key)
+            refresh_course_daily_metrics_of_orgs(course_key, today - timezone.timedelta(days=options['days']), today)
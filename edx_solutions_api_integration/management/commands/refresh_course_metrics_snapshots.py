@@ -0,0 +1,40 @@
+"""
+Management command to refresh precomputed course metrics snapshots
+./manage.py lms refresh_course_metrics_snapshots --settings=production --course-ids course-v1:edX+DemoX+Demo_Course
+"""
+
+import logging
+
+from django.core.management.base import BaseCommand
+from opaque_keys.edx.keys import CourseKey
+from openedx.core.djangoapps.content.course_overviews.models import CourseOverview
+
+from ...courses.utils import refresh_course_metrics_snapshots
+
+log = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Command to refresh course metrics snapshots of all or given courses
+    """
+    help = "Refresh course metrics snapshots of all courses or of given courses"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--course-ids",
+            dest="course_ids",
+            nargs="+",
+            default=None,
+            help="Course ids to refresh metrics snapshots for, defaults to all courses",
+        )
+
+    def handle(self, *args, **options):
+        if options['course_ids']:
+            course_keys = [CourseKey.from_string(course_id) for course_id in options['course_ids']]
+        else:
+            course_keys = CourseOverview.objects.values_list('id', flat=True)
+
+        for course_key in course_keys:
+            log.info("Refreshing course metrics snapshots of course %s", course_key)
+            refresh_course_metrics_snapshots(course_key)
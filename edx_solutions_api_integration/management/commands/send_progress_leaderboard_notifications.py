@@ -5,16 +5,17 @@ Management command to check users progress and sends notifications
 
 import logging
 import sys
+from collections import defaultdict
 
-from completion_aggregator.models import Aggregator
 from django.conf import settings
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from django.utils import timezone
 from edx_notifications.data import NotificationMessage
-from edx_notifications.lib.publisher import (get_notification_type,
-                                             publish_notification_to_user)
-from edx_solutions_api_integration.models import APIUser as User
+from edx_notifications.lib.publisher import (
+    bulk_publish_notification_to_users, get_notification_type)
 
+from ...courses.utils import get_active_course_keys, get_progress_leaders
 from ...models import LeaderBoard
 
 log = logging.getLogger(__name__)
@@ -34,6 +35,13 @@ class Command(BaseCommand):
             default=60,
             help="Time range in minute for which we need to check progress updates in past",
         )
+        parser.add_argument(
+            "--batch-size",
+            dest="batch_size",
+            type=int,
+            default=500,
+            help="Number of courses whose leaderboards are computed, updated and notified together",
+        )
 
     def handle(self, *args, **options):
         if not settings.FEATURES['ENABLE_NOTIFICATIONS']:
@@ -42,60 +50,84 @@ class Command(BaseCommand):
         # Increase time range so that users don't miss notification in case cron job is skipped or delayed.
         time_range = timezone.now() - timezone.timedelta(minutes=options['time_range'] * 2)
         leaderboard_size = getattr(settings, 'LEADERBOARD_SIZE', 3)
-        courses = Aggregator.objects.filter(
-            aggregation_name='course',
-            last_modified__gte=time_range
-        ).distinct().values_list('course_key', flat=True)
-        for course_key in courses:
-            all_progress = Aggregator.objects.filter(
-                aggregation_name='course', course_key=course_key, percent__gt=0
-            ).exclude(user__in=User.objects.filter(courseaccessrole__course_id=course_key,
-                      courseaccessrole__role__in=['staff', 'observer', 'assistant', 'instructor'])
-            ).order_by('-percent', 'last_modified')[:leaderboard_size]
-
-            all_leaders = LeaderBoard.objects.filter(course_key=course_key).all()
-            leaders = {l.position: l for l in all_leaders}
-            positions = {l.user_id: l.position for l in all_leaders}
-            for idx, progress in enumerate(all_progress):
-                position = idx + 1
-                leader = leaders.get(position)
-                if not leader:
-                    leader = LeaderBoard(course_key=course_key, position=position)
-
-                old_leader = leader.user_id
-                old_position = positions.get(progress.user_id, sys.maxsize)
-                leader.user_id = progress.user_id
-                leader.save()
-                is_new = progress.modified >= time_range
-
-                if old_leader != progress.user_id and position < old_position and is_new:
-                    try:
-                        notification_msg = NotificationMessage(
-                            msg_type=get_notification_type('open-edx.lms.leaderboard.progress.rank-changed'),
-                            namespace=str(course_key),
-                            payload={
-                                '_schema_version': '1',
-                                'rank': position,
-                                'leaderboard_name': 'Progress',
-                            }
-                        )
-
-                        #
-                        # add in all the context parameters we'll need to
-                        # generate a URL back to the website that will
-                        # present the new course announcement
-                        #
-                        # IMPORTANT: This can be changed to msg.add_click_link() if we
-                        # have a particular URL that we wish to use. In the initial use case,
-                        # we need to make the link point to a different front end website
-                        # so we need to resolve these links at dispatch time
-                        #
-                        notification_msg.add_click_link_params({
-                            'course_id': str(course_key),
-                        })
-
-                        publish_notification_to_user(int(leader.user_id), notification_msg)
-                    except Exception as ex:  # pylint: disable=broad-except
-                        # Notifications are never critical, so we don't want to disrupt any
-                        # other logic processing. So log and continue.
-                        log.exception(ex)
+        batch_size = max(options['batch_size'], 1)
+        course_keys = list(get_active_course_keys(time_range))
+
+        for start in range(0, len(course_keys), batch_size):
+            batch = course_keys[start:start + batch_size]
+            with transaction.atomic():
+                rank_changes = update_progress_leaderboards(batch, leaderboard_size, time_range)
+            send_rank_changed_notifications(rank_changes)
+
+
+def update_progress_leaderboards(course_keys, leaderboard_size, since):
+    """
+    Replaces stored leaderboards of given courses with their current progress leaders and returns
+    (course key, position, user id) of users who climbed up to a position
+    """
+    progress_leaders = get_progress_leaders(course_keys, leaderboard_size, since)
+    previous_leaders = LeaderBoard.replace_leaders({
+        course_id: [user_id for user_id, __ in leaders] for course_id, leaders in progress_leaders.items()
+    })
+
+    rank_changes = []
+    for course_key in course_keys:
+        old_leaders = previous_leaders[str(course_key)]
+        positions = {user_id: position for position, user_id in old_leaders.items()}
+        for idx, (user_id, is_recent) in enumerate(progress_leaders[str(course_key)]):
+            position = idx + 1
+            if old_leaders.get(position) != user_id and position < positions.get(user_id, sys.maxsize) and is_recent:
+                rank_changes.append((course_key, position, user_id))
+    return rank_changes
+
+
+def send_rank_changed_notifications(rank_changes):
+    """
+    Publishes rank changed notifications of a batch of leaderboard changes, one bulk
+    publish for all users who climbed up to the same position of a course
+    """
+    if not rank_changes:
+        return
+
+    try:
+        msg_type = get_notification_type('open-edx.lms.leaderboard.progress.rank-changed')
+    except Exception as ex:  # pylint: disable=broad-except
+        # Leaderboards are already updated, a missing notification type only skips publishing
+        log.exception(ex)
+        return
+
+    recipients = defaultdict(list)
+    for course_key, position, user_id in rank_changes:
+        recipients[(course_key, position)].append(int(user_id))
+
+    for (course_key, position), user_ids in recipients.items():
+        try:
+            notification_msg = NotificationMessage(
+                msg_type=msg_type,
+                namespace=str(course_key),
+                payload={
+                    '_schema_version': '1',
+                    'rank': position,
+                    'leaderboard_name': 'Progress',
+                }
+            )
+
+            #
+            # add in all the context parameters we'll need to
+            # generate a URL back to the website that will
+            # present the new course announcement
+            #
+            # IMPORTANT: This can be changed to msg.add_click_link() if we
+            # have a particular URL that we wish to use. In the initial use case,
+            # we need to make the link point to a different front end website
+            # so we need to resolve these links at dispatch time
+            #
+            notification_msg.add_click_link_params({
+                'course_id': str(course_key),
+            })
+
+            bulk_publish_notification_to_users(user_ids, notification_msg)
+        except Exception as ex:  # pylint: disable=broad-except
+            # Notifications are never critical, so we don't want to disrupt any
+            # other logic processing. So log and continue.
+            log.exception(ex)
@@ -0,0 +1,130 @@
+"""
+Tests to support refresh_course_daily_metrics django management command
+"""
+from datetime import timedelta
+
+import mock
+from completion_aggregator.models import Aggregator
+from django.core.management import call_command
+from django.db.models import Count
+from django.utils import timezone
+from edx_solutions_api_integration.courses.utils import get_time_series_querysets
+from edx_solutions_api_integration.models import CourseDailyMetric
+from edx_solutions_api_integration.utils import get_time_series_data, strip_time
+from edx_solutions_organizations.models import Organization
+from freezegun import freeze_time
+from student.models import CourseEnrollment
+from student.tests.factories import CourseEnrollmentFactory, UserFactory
+from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
+from xmodule.modulestore.tests.factories import CourseFactory
+
+
+class RefreshCourseDailyMetricsTests(ModuleStoreTestCase):
+    """
+    Test suite for course daily metrics rollup management command
+    """
+    def setUp(self):
+        super().setUp()
+        self.course = CourseFactory.create()
+        self.organization = Organization.objects.create(name='Test Organization', display_name='Test Org')
+        self.today = strip_time(timezone.now())
+        # one user started the course each day of the past three days and one today
+        self.users = [UserFactory() for __ in range(4)]
+        for days_ago, user in enumerate(self.users):
+            with freeze_time(self.today - timedelta(days=days_ago) + timedelta(minutes=1)):
+                CourseEnrollmentFactory(user=user, course_id=self.course.id)
+                self._submit_progress(user, 1)
+            if days_ago % 2 == 0:
+                self.organization.users.add(user)
+
+    def _submit_progress(self, user, earned):
+        Aggregator.objects.submit_completion(
+            user=user,
+            course_key=self.course.id,
+            block_key=self.course.location,
+            aggregation_name='course',
+            possible=10,
+            earned=earned,
+            last_modified=timezone.now(),
+        )
+
+    def _get_course_metrics(self, **kwargs):
+        return CourseDailyMetric.objects.filter(
+            course_key=self.course.id, org_id=CourseDailyMetric.ALL_ORGANIZATIONS, metric='users_started', **kwargs
+        )
+
+    def _get_started_series(self, rollup):
+        queryset = get_time_series_querysets(self.course.id)['users_started'][0]
+        return [value for _, value in get_time_series_data(
+            queryset, self.today - timedelta(days=3), self.today, interval='days', date_field='created',
+            date_field_model=Aggregator, aggregate=Count('user', distinct=True), rollup=rollup
+        )]
+
+    def test_refresh_course_daily_metrics(self):
+        """
+        Test daily values are rolled up for the course and organizations having users enrolled in it
+        """
+        call_command('refresh_course_daily_metrics', course_ids=[str(self.course.id)], days=3)
+
+        daily_values = CourseDailyMetric.get_daily_values(
+            self.course.id, 'users_started', (self.today - timedelta(days=3)).date(), self.today.date()
+        )
+        self.assertEqual(list(daily_values.values()), [1, 1, 1])
+        org_daily_values = CourseDailyMetric.get_daily_values(
+            self.course.id, 'users_started', (self.today - timedelta(days=3)).date(), self.today.date(),
+            org_id=self.organization.id
+        )
+        self.assertEqual(sum(org_daily_values.values()), 1)
+
+        # today isn't final yet
+        today_metric = self._get_course_metrics().get(day=self.today.date())
+        self.assertFalse(today_metric.is_final)
+        self.assertEqual(today_metric.value, 1)
+
+        # refreshing again updates existing values
+        call_command('refresh_course_daily_metrics', course_ids=[str(self.course.id)], days=3)
+        self.assertEqual(self._get_course_metrics().count(), 4)
+        # metrics whose rows move between days aren't rolled up
+        self.assertFalse(CourseDailyMetric.objects.filter(metric__in=['users_enrolled', 'active_users']).exists())
+
+    def test_time_series_from_rollup_match_raw_data(self):
+        """
+        Test time series read from rollups for past days match time series aggregated from raw data
+        """
+        rollup = (self.course.id, 'users_started', None)
+        call_command('refresh_course_daily_metrics', course_ids=[str(self.course.id)], days=3)
+        self.assertEqual(self._get_started_series(rollup), [1, 1, 1, 1])
+        self.assertEqual(self._get_started_series(rollup), self._get_started_series(None))
+
+        # unenrolling reopens days on which the user started the course
+        CourseEnrollment.unenroll(self.users[2], self.course.id)
+        reopened_day = (self.today - timedelta(days=2)).date()
+        self.assertFalse(self._get_course_metrics().get(day=reopened_day).is_final)
+        self.assertEqual(self._get_started_series(rollup), [1, 0, 1, 1])
+        self.assertEqual(self._get_started_series(rollup), self._get_started_series(None))
+
+        # nightly rollup of the last day finalizes reopened days again
+        call_command('refresh_course_daily_metrics', course_ids=[str(self.course.id)], days=1)
+        daily_values = CourseDailyMetric.get_daily_values(
+            self.course.id, 'users_started', (self.today - timedelta(days=3)).date(), self.today.date()
+        )
+        self.assertEqual([daily_values[day] for day in sorted(daily_values)], [1, 0, 1])
+
+    def test_progress_earned_after_creation_day_reopens_it(self):
+        """
+        Test a course aggregate counted after the day it was created on reopens that day
+        """
+        rollup = (self.course.id, 'users_started', None)
+        user = UserFactory()
+        with freeze_time(self.today - timedelta(days=1) + timedelta(minutes=1)):
+            CourseEnrollmentFactory(user=user, course_id=self.course.id)
+            self._submit_progress(user, 0)
+        call_command('refresh_course_daily_metrics', course_ids=[str(self.course.id)], days=3)
+        self.assertEqual(self._get_started_series(rollup), [1, 1, 1, 1])
+
+        with mock.patch('edx_solutions_api_integration.receivers.transaction.on_commit', lambda func: func()):
+            self._submit_progress(user, 1)
+        reopened_day = (self.today - timedelta(days=1)).date()
+        self.assertFalse(self._get_course_metrics().get(day=reopened_day).is_final)
+        self.assertEqual(self._get_started_series(rollup), [1, 1, 2, 1])
+        self.assertEqual(self._get_started_series(rollup), self._get_started_series(None))
@@ -0,0 +1,64 @@
+"""
+Tests to support refresh_course_metrics_snapshots django management command
+"""
+from completion_aggregator.models import Aggregator
+from django.core.management import call_command
+from django.utils import timezone
+from edx_solutions_api_integration.models import CourseMetricsSnapshot
+from edx_solutions_organizations.models import Organization
+from gradebook.models import StudentGradebook
+from student.tests.factories import CourseEnrollmentFactory, UserFactory
+from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
+from xmodule.modulestore.tests.factories import CourseFactory
+
+
+class RefreshCourseMetricsSnapshotsTests(ModuleStoreTestCase):
+    """
+    Test suite for course metrics snapshots refresh management command
+    """
+    def setUp(self):
+        super().setUp()
+        self.course = CourseFactory.create()
+        self.organization = Organization.objects.create(name='Test Organization', display_name='Test Org')
+        for idx in range(4):
+            user = UserFactory()
+            CourseEnrollmentFactory(user=user, course_id=self.course.id)
+            StudentGradebook.objects.update_or_create(
+                user=user,
+                course_id=self.course.id,
+                defaults={'grade': 0.6, 'proforma_grade': 0.6, 'is_passed': idx % 2 == 0}
+            )
+            Aggregator.objects.submit_completion(
+                user=user,
+                course_key=self.course.id,
+                block_key=self.course.location,
+                aggregation_name='course',
+                possible=20,
+                earned=10,
+                last_modified=timezone.now(),
+            )
+            if idx == 0:
+                self.organization.users.add(user)
+
+    def test_refresh_course_metrics_snapshots(self):
+        """
+        Test snapshots are created for the course and for organizations having users enrolled in it
+        """
+        call_command('refresh_course_metrics_snapshots', course_ids=[str(self.course.id)])
+
+        snapshot = CourseMetricsSnapshot.get_snapshot(self.course.id)
+        self.assertEqual(snapshot.users_enrolled, 4)
+        self.assertEqual(snapshot.users_started, 4)
+        self.assertEqual(snapshot.modules_completed, 40)
+        self.assertEqual(snapshot.users_passed, 2)
+        self.assertEqual(round(snapshot.avg_progress), 50)
+        self.assertEqual(snapshot.avg_grade, 0.6)
+
+        org_snapshot = CourseMetricsSnapshot.get_snapshot(self.course.id, self.organization.id)
+        self.assertEqual(org_snapshot.users_enrolled, 1)
+        self.assertEqual(org_snapshot.users_started, 1)
+        self.assertEqual(org_snapshot.modules_completed, 10)
+
+        # refreshing again updates existing snapshots
+        call_command('refresh_course_metrics_snapshots', course_ids=[str(self.course.id)])
+        self.assertEqual(CourseMetricsSnapshot.objects.filter(course_key=self.course.id).count(), 2)
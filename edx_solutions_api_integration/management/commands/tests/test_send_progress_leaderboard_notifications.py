@@ -0,0 +1,100 @@
+"""
+Tests to support send_progress_leaderboard_notifications django management command
+"""
+import mock
+from completion_aggregator.models import Aggregator
+from django.conf import settings
+from django.core.management import call_command
+from django.utils import timezone
+from edx_solutions_api_integration.models import LeaderBoard
+from student.models import CourseAccessRole
+from student.tests.factories import CourseEnrollmentFactory, UserFactory
+from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
+from xmodule.modulestore.tests.factories import CourseFactory
+
+
+@mock.patch.dict(settings.FEATURES, {'ENABLE_NOTIFICATIONS': True})
+@mock.patch('edx_solutions_api_integration.management.commands.send_progress_leaderboard_notifications.'
+            'get_notification_type', mock.Mock())
+class SendProgressLeaderboardNotificationsTests(ModuleStoreTestCase):
+    """
+    Test suite for progress leaderboard notifications management command
+    """
+    def setUp(self):
+        super().setUp()
+        self.courses = [CourseFactory.create(), CourseFactory.create()]
+        self.users = [UserFactory() for __ in range(4)]
+        for course in self.courses:
+            for idx, user in enumerate(self.users):
+                CourseEnrollmentFactory(user=user, course_id=course.id)
+                self._submit_progress(course, user, idx + 1)
+
+        # staff users are left out of leaderboards
+        staff_user = UserFactory()
+        CourseAccessRole.objects.create(user=staff_user, course_id=self.courses[0].id, role='staff')
+        self._submit_progress(self.courses[0], staff_user, 20)
+
+        LeaderBoard.objects.create(course_key=self.courses[0].id, position=1, user=self.users[0])
+        LeaderBoard.objects.create(course_key=self.courses[0].id, position=2, user=self.users[2])
+
+    def _submit_progress(self, course, user, earned):
+        Aggregator.objects.submit_completion(
+            user=user,
+            course_key=course.id,
+            block_key=course.location,
+            aggregation_name='course',
+            possible=20,
+            earned=earned,
+            last_modified=timezone.now(),
+        )
+
+    @mock.patch('edx_solutions_api_integration.management.commands.send_progress_leaderboard_notifications.'
+                'bulk_publish_notification_to_users')
+    def test_send_progress_leaderboard_notifications(self, mock_publish):
+        """
+        Test leaderboards of all active courses are updated and users moving up are notified
+        """
+        call_command('send_progress_leaderboard_notifications', time_range=60, batch_size=1)
+
+        for course in self.courses:
+            leaders = LeaderBoard.objects.filter(course_key=course.id).order_by('position')
+            self.assertEqual(
+                [(leader.position, leader.user_id) for leader in leaders],
+                [(1, self.users[3].id), (2, self.users[2].id), (3, self.users[1].id)],
+            )
+
+        notified = sorted(
+            (call[0][1].namespace, call[0][1].payload['rank'], user_id)
+            for call in mock_publish.call_args_list for user_id in call[0][0]
+        )
+        # a single bulk publish per course and position
+        self.assertEqual(mock_publish.call_count, 5)
+        self.assertEqual(notified, sorted([
+            (str(self.courses[0].id), 1, self.users[3].id),
+            (str(self.courses[0].id), 3, self.users[1].id),
+            (str(self.courses[1].id), 1, self.users[3].id),
+            (str(self.courses[1].id), 2, self.users[2].id),
+            (str(self.courses[1].id), 3, self.users[1].id),
+        ]))
+
+        # unchanged leaderboards send no notifications
+        mock_publish.reset_mock()
+        call_command('send_progress_leaderboard_notifications', time_range=60)
+        self.assertFalse(mock_publish.called)
+
+    @mock.patch('edx_solutions_api_integration.management.commands.send_progress_leaderboard_notifications.'
+                'bulk_publish_notification_to_users')
+    def test_leaderboards_are_updated_without_notification_type(self, mock_publish):
+        """
+        Test leaderboards are updated even if the rank changed notification type isn't registered
+        """
+        with mock.patch(
+            'edx_solutions_api_integration.management.commands.send_progress_leaderboard_notifications.'
+            'get_notification_type', mock.Mock(side_effect=Exception('Notification type is not registered'))
+        ):
+            call_command('send_progress_leaderboard_notifications', time_range=60)
+
+        for course in self.courses:
+            leaders = LeaderBoard.objects.filter(course_key=course.id).order_by('position')
+            self.assertEqual([leader.user_id for leader in leaders], [user.id for user in self.users[:0:-1]])
+        self.assertFalse(mock_publish.called)
@@ -0,0 +1,52 @@
+"""
+Tests to support warm_course_metrics_cache django management command
+"""
+from completion_aggregator.models import Aggregator
+from django.core.management import call_command
+from django.test.utils import override_settings
+from django.utils import timezone
+from edx_solutions_api_integration.utils import get_cached_data
+from student.tests.factories import CourseEnrollmentFactory, UserFactory
+from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
+from xmodule.modulestore.tests.factories import CourseFactory
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class WarmCourseMetricsCacheTests(ModuleStoreTestCase):
+    """
+    Test suite for course metrics cache warming management command
+    """
+    def setUp(self):
+        super().setUp()
+        self.active_course = CourseFactory.create()
+        self.inactive_course = CourseFactory.create()
+        for idx in range(4):
+            user = UserFactory()
+            CourseEnrollmentFactory(user=user, course_id=self.active_course.id)
+            CourseEnrollmentFactory(user=user, course_id=self.inactive_course.id)
+            Aggregator.objects.submit_completion(
+                user=user,
+                course_key=self.active_course.id,
+                block_key=self.active_course.location,
+                aggregation_name='course',
+                possible=20,
+                earned=idx + 1,
+                last_modified=timezone.now(),
+            )
+
+    def test_warm_course_metrics_cache(self):
+        """
+        Test leaderboards and metrics of recently active courses are cached
+        """
+        call_command('warm_course_metrics_cache', time_range=60, count=3)
+
+        course_id = str(self.active_course.id)
+        self.assertEqual(get_cached_data('course_enrollments', course_id), {'enrollment_count': 4})
+        self.assertEqual(get_cached_data('progress', course_id)['total_users'], 4)
+        self.assertEqual(len(get_cached_data('progress_leaderboard', course_id)['leader_rows']), 3)
+        self.assertIsNotNone(get_cached_data('grade', course_id))
+        self.assertIsNotNone(get_cached_data('grade_leaderboard', course_id))
+        self.assertIsNotNone(get_cached_data('social', course_id))
+        self.assertIsNotNone(get_cached_data('social_leaderboard', course_id))
+
+        self.assertIsNone(get_cached_data('progress', str(self.inactive_course.id)))
@@ -0,0 +1,51 @@
+"""
+Management command to precompute leaderboards and metrics of recently active courses into cache
+./manage.py lms warm_course_metrics_cache --settings=production --time-range=60 --concurrency=4
+"""
+
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from ...courses.utils import warm_active_courses_metrics_cache
+
+log = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Command to warm course metrics cache of courses with recent progress updates
+    """
+    help = "Precompute leaderboards, course averages and enrollment counts of recently active courses into cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--time-range",
+            dest="time_range",
+            type=int,
+            default=60,
+            help="Time range in minute for which we need to check progress updates in past",
+        )
+        parser.add_argument(
+            "--concurrency",
+            dest="concurrency",
+            type=int,
+            default=1,
+            help="Number of courses to warm at a time",
+        )
+        parser.add_argument(
+            "--count",
+            dest="count",
+            type=int,
+            default=getattr(settings, 'LEADERBOARD_SIZE', 3),
+            help="Number of leaders to cache in each leaderboard",
+        )
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timezone.timedelta(minutes=options['time_range'])
+        course_keys = warm_active_courses_metrics_cache(
+            since, concurrency=options['concurrency'], count=options['count']
+        )
+        log.info("Warmed course metrics cache of %d courses", len(course_keys))
@@ -0,0 +1,36 @@
+# Generated by Django 2.2.24 on 2026-10-17 10:00
+
+import django.utils.timezone
+import model_utils.fields
+import opaque_keys.edx.django.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('edx_solutions_api_integration', '0002_leaderboard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseMetricsSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('course_key', opaque_keys.edx.django.models.CourseKeyField(db_index=True, max_length=255)),
+                ('org_id', models.IntegerField(default=0)),
+                ('users_enrolled', models.IntegerField(default=0)),
+                ('users_started', models.IntegerField(default=0)),
+                ('modules_completed', models.FloatField(default=0)),
+                ('users_completed', models.IntegerField(default=0)),
+                ('users_passed', models.IntegerField(default=0)),
+                ('avg_progress', models.FloatField(default=0)),
+                ('avg_grade', models.FloatField(default=0)),
+            ],
+            options={
+                'unique_together': {('course_key', 'org_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 2.2.24 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('edx_solutions_api_integration', '0003_coursemetricssnapshot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='leaderboard',
+            index=models.Index(fields=['course_key', 'position'], name='api_leader_course_position_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaderboard',
+            index=models.Index(fields=['course_key', 'user'], name='api_leader_course_user_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.24 on 2026-10-17 14:00
+
+import django.utils.timezone
+import model_utils.fields
+import opaque_keys.edx.django.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('edx_solutions_api_integration', '0004_leaderboard_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseDailyMetric',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('course_key', opaque_keys.edx.django.models.CourseKeyField(max_length=255)),
+                ('org_id', models.IntegerField(default=0)),
+                ('metric', models.CharField(max_length=32)),
+                ('day', models.DateField()),
+                ('value', models.IntegerField(default=0)),
+                ('is_final', models.BooleanField(default=False)),
+            ],
+            options={
+                'unique_together': {('course_key', 'org_id', 'metric', 'day')},
+            },
+        ),
+    ]
@@ -17,7 +17,7 @@ from edx_solutions_api_integration.users.views import (UsersCourseProgressList,
                                                        UsersSocialMetrics)
 from edx_solutions_api_integration.utils import (
     cache_course_data, cache_course_user_data,
-    get_aggregate_exclusion_user_ids, get_cached_data)
+    get_aggregate_exclusion_user_ids, get_cache_generation, get_cached_data)
 from gradebook.models import StudentGradebook
 from openedx.core.lib.api.permissions import IsStaffOrOwner
 from rest_framework import status
@@ -146,7 +146,8 @@ class MobileUsersCoursesGrades(MobileListAPIView):
         Once persistent grades are enabled on the solutions fork, we'll use CourseGradeFactory instead.
         """
         course_key = get_course_key(course_id)
-        data = get_cached_data('grade', course_id, user.id)
+        generation = get_cache_generation('grade', course_id)
+        data = get_cached_data('grade', course_id, user.id, generation=generation)
         params = {'exclude_users': get_aggregate_exclusion_user_ids(course_key, roles=None)}
 
         if not data:
@@ -154,8 +155,8 @@ class MobileUsersCoursesGrades(MobileListAPIView):
             user_grade = StudentGradebook.get_user_grade(course_key, user.id)
 
             data = {'user_grade': user_grade, 'course_avg': course_avg}
-            cache_course_data('grade', course_id, {'course_avg': course_avg})
-            cache_course_user_data('grade', course_id, user.id, {'user_grade': user_grade})
+            cache_course_data('grade', course_id, {'course_avg': course_avg}, generation=generation)
+            cache_course_user_data('grade', course_id, user.id, {'user_grade': user_grade}, generation=generation)
 
         return {
             'course_grade': data.get('user_grade'),
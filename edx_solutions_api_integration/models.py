@@ -172,6 +172,188 @@ class LeaderBoard(TimeStampedModel):
     course_key = CourseKeyField(max_length=255)
     position = models.IntegerField()
 
+    class Meta:
+        """
+        Meta class for defining indexes of leaderboard lookups
+        """
+        indexes = [
+            models.Index(fields=['course_key', 'position'], name='api_leader_course_position_idx'),
+            models.Index(fields=['course_key', 'user'], name='api_leader_course_user_idx'),
+        ]
+
+    @classmethod
+    def replace_leaders(cls, course_leaders, batch_size=500):
+        """
+        Replaces stored leaderboards of given courses with given user ids, ordered by position,
+        creating, updating and deleting rows by (course_key, position) in bulk.
+        Returns previous leaderboards of the courses as {course id: {position: user id}}
+        """
+        course_leaders = {str(course_key): user_ids for course_key, user_ids in course_leaders.items()}
+        stored_leaders = {course_id: {} for course_id in course_leaders}
+        for leader in cls.objects.filter(course_key__in=list(course_leaders)):
+            stored_leaders[str(leader.course_key)][leader.position] = leader
+
+        now = timezone.now()
+        new_leaders, changed_leaders, removed_leaders = [], [], []
+        for course_id, user_ids in course_leaders.items():
+            leaders = stored_leaders[course_id]
+            for idx, user_id in enumerate(user_ids):
+                leader = leaders.get(idx + 1)
+                if not leader:
+                    new_leaders.append(cls(course_key=course_id, position=idx + 1, user_id=user_id))
+                elif leader.user_id != user_id:
+                    changed_leaders.append(leader)
+            removed_leaders.extend(leader.id for position, leader in leaders.items() if position > len(user_ids))
+
+        previous_leaders = {
+            course_id: {position: leader.user_id for position, leader in leaders.items()}
+            for course_id, leaders in stored_leaders.items()
+        }
+        for leader in changed_leaders:
+            leader.user_id = course_leaders[str(leader.course_key)][leader.position - 1]
+            leader.modified = now
+
+        cls.objects.bulk_create(new_leaders, batch_size=batch_size)
+        cls.objects.bulk_update(changed_leaders, ['user', 'modified'], batch_size=batch_size)
+        if removed_leaders:
+            cls.objects.filter(id__in=removed_leaders).delete()
+        return previous_leaders
+
+
+class CourseMetricsSnapshot(TimeStampedModel):
+    """
+    Model to store precomputed metrics of a course, for all users of the course
+    or limited to users of an organization when org_id is set
+    """
+    SNAPSHOT_METRICS = (
+        'users_started', 'modules_completed', 'users_completed', 'users_passed', 'avg_progress', 'avg_grade',
+    )
+
+    # org_id of snapshots of all users of a course, not null so the unique constraint applies to them
+    ALL_ORGANIZATIONS = 0
+
+    course_key = CourseKeyField(max_length=255, db_index=True)
+    org_id = models.IntegerField(default=ALL_ORGANIZATIONS)
+    users_enrolled = models.IntegerField(default=0)
+    users_started = models.IntegerField(default=0)
+    modules_completed = models.FloatField(default=0)
+    users_completed = models.IntegerField(default=0)
+    users_passed = models.IntegerField(default=0)
+    avg_progress = models.FloatField(default=0)
+    avg_grade = models.FloatField(default=0)
+
+    class Meta:
+        """
+        Meta class for defining unique constraints
+        """
+        unique_together = ('course_key', 'org_id')
+
+    @classmethod
+    def get_snapshot(cls, course_key, org_id=None):
+        """
+        Returns snapshot of a course for all users or users of given organization, None if it isn't computed yet
+        """
+        if org_id and not is_int(org_id):
+            return None
+        return cls.objects.filter(course_key=course_key, org_id=org_id or cls.ALL_ORGANIZATIONS).first()
+
+    def get_metrics(self, metrics_required):
+        """
+        Returns a dict of required metrics in the format of course metrics API
+        """
+        data = {metric: getattr(self, metric) for metric in self.SNAPSHOT_METRICS if metric in metrics_required}
+        if 'users_started' in data:
+            data['users_not_started'] = self.users_enrolled - self.users_started
+        return data
+
+
+class CourseDailyMetric(TimeStampedModel):
+    """
+    Model to store daily values of a time series metric of a course, for all users of the course
+    or limited to users of an organization when org_id is set. Values of a day are final once
+    they are rolled up after the day is over, until a change of users counted on that day reopens it.
+    """
+    # metrics bucketed by creation date of their rows, which doesn't move once a day is over, and whose
+    # daily values add up to values of weeks and months. Rows counted after their creation day, once they
+    # have progress, reopen that day
+    ROLLUP_METRICS = ('users_started', 'modules_completed')
+    # org_id of values for all users of a course, not null so the unique constraint applies to them
+    ALL_ORGANIZATIONS = 0
+
+    course_key = CourseKeyField(max_length=255)
+    org_id = models.IntegerField(default=ALL_ORGANIZATIONS)
+    metric = models.CharField(max_length=32)
+    day = models.DateField()
+    value = models.IntegerField(default=0)
+    is_final = models.BooleanField(default=False)
+
+    class Meta:
+        """
+        Meta class for defining unique constraints
+        """
+        unique_together = ('course_key', 'org_id', 'metric', 'day')
+
+    @classmethod
+    def get_daily_values(cls, course_key, metric, start_day, end_day, org_id=None):
+        """
+        Returns final values of a metric of a course by day from start_day up to end_day excluded,
+        None if any of these days isn't rolled up yet
+        """
+        values = dict(cls.objects.filter(
+            course_key=course_key,
+            org_id=org_id or cls.ALL_ORGANIZATIONS,
+            metric=metric,
+            day__gte=start_day,
+            day__lt=end_day,
+            is_final=True,
+        ).values_list('day', 'value'))
+        if len(values) < (end_day - start_day).days:
+            return None
+        return values
+
+    @classmethod
+    def store_daily_values(cls, course_key, metric, daily_values, org_id=None, batch_size=500):
+        """
+        Creates or updates values of a metric of a course from a list of (day, value),
+        values of days before today are stored as final. Values created meanwhile by an overlapping
+        rollup are left to it
+        """
+        org_id = org_id or cls.ALL_ORGANIZATIONS
+        today = timezone.now().date()
+        days = [day for day, _ in daily_values]
+        stored = {
+            daily_metric.day: daily_metric
+            for daily_metric in cls.objects.filter(course_key=course_key, org_id=org_id, metric=metric, day__in=days)
+        }
+
+        now = timezone.now()
+        new_metrics, changed_metrics = [], []
+        for day, value in daily_values:
+            daily_metric = stored.get(day)
+            if not daily_metric:
+                new_metrics.append(cls(
+                    course_key=course_key, org_id=org_id, metric=metric, day=day, value=value, is_final=day < today
+                ))
+            else:
+                daily_metric.value = value
+                daily_metric.is_final = day < today
+                daily_metric.modified = now
+                changed_metrics.append(daily_metric)
+
+        cls.objects.bulk_create(new_metrics, batch_size=batch_size, ignore_conflicts=True)
+        cls.objects.bulk_update(changed_metrics, ['value', 'is_final', 'modified'], batch_size=batch_size)
+
+    @classmethod
+    def reopen_days(cls, course_key, days, org_ids=None):
+        """
+        Marks final values of given days of a course as not final, for all users and every organization
+        or only for given organizations, so they are read from raw data until rolled up again
+        """
+        reopened = cls.objects.filter(course_key=course_key, day__in=days, is_final=True)
+        if org_ids is not None:
+            reopened = reopened.filter(org_id__in=org_ids)
+        reopened.update(is_final=False, modified=timezone.now())
+
 
 class PasswordHistory(models.Model):
     """
@@ -1,11 +1,24 @@
 """
 Signal handlers supporting various course metadata use cases
 """
+from completion.models import BlockCompletion
+from completion_aggregator.models import Aggregator
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
+from edx_solutions_api_integration.courses.utils import (
+    record_user_rank_index_changes, reopen_counted_row_daily_metrics,
+    reopen_user_daily_metrics)
 from edx_solutions_api_integration.models import (
     CourseContentGroupRelationship, CourseGroupRelationship)
-from edx_solutions_api_integration.utils import invalid_user_data_cache
-from student.models import ENROLL_STATUS_CHANGE
+from edx_solutions_api_integration.utils import (
+    invalid_user_data_cache, refresh_course_role_user_ids)
+from edx_solutions_organizations.models import Organization
+from gradebook.models import StudentGradebook
+from social_engagement.models import StudentSocialEngagementScore
+from student.models import (ENROLL_STATUS_CHANGE, CourseAccessRole,
+                            CourseEnrollment, UserProfile)
 from xmodule.modulestore.django import SignalHandler
 
 
@@ -23,9 +36,168 @@ def on_course_deleted(sender, **kwargs):  # pylint: disable=W0613
 @receiver(ENROLL_STATUS_CHANGE)
 def on_course_enrollment_change(sender, event=None, user=None, **kwargs):  # pylint: disable=unused-argument
     """
-    Updates course enrollment count cache.
+    Invalidates course enrollment count cache, including organization scoped counts, metrics,
+    leaderboards and time series of enrolled users and cities cache, and reopens rolled up
+    daily metrics counting the user. Rank indexes of the course add or remove the user's scores
+    once the change is committed.
     """
     course_id = kwargs.get('course_id', None)
     if course_id:
         invalid_user_data_cache("course_enrollments", course_id)
         invalid_user_data_cache("cities_count", course_id)
+        if user is not None:
+            user_id = user.id
+            reopen_user_daily_metrics(user_id, course_key=course_id)
+            transaction.on_commit(lambda: record_user_rank_index_changes(user_id, course_id))
+
+
+@receiver(post_save, sender=CourseAccessRole)
+@receiver(post_delete, sender=CourseAccessRole)
+def on_course_access_role_change(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Refreshes user ids by role of the course when a user's course role changes and
+    invalidates excluded users cache of the course, along with metrics and leaderboards
+    computed without excluded users, once the change is committed. Rolled up daily metrics
+    counting the user are reopened.
+    """
+    course_key = instance.course_id
+    if not course_key:
+        return
+
+    reopen_user_daily_metrics(instance.user_id, course_key=course_key)
+
+    def _refresh_course_roles_cache():
+        refresh_course_role_user_ids(course_key)
+        invalid_user_data_cache("exclude_users", course_key)
+
+    transaction.on_commit(_refresh_course_roles_cache)
+
+
+@receiver(post_save, sender=UserProfile)
+def on_user_profile_change(sender, instance, update_fields=None, **kwargs):  # pylint: disable=unused-argument
+    """
+    Invalidates cities cache of courses the user is enrolled in once a change of the user's
+    profile, which may have moved the user to another city, is committed.
+    """
+    if update_fields is not None and 'city' not in update_fields:
+        return
+
+    user_id = instance.user_id
+
+    def _invalidate_cities_cache():
+        enrollments = CourseEnrollment.objects.filter(user_id=user_id, is_active=True)
+        for course_id in enrollments.values_list('course_id', flat=True):
+            invalid_user_data_cache("cities_count", course_id)
+
+    transaction.on_commit(_invalidate_cities_cache)
+
+
+@receiver(m2m_changed, sender=Organization.users.through)
+def on_organization_users_change(sender, instance, action, reverse, pk_set, **kwargs):  # pylint: disable=unused-argument
+    """
+    Invalidates non company users, leaderboard and members cache of organizations whose members change,
+    and reopens rolled up daily metrics of these organizations counting the users.
+    """
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    if reverse:
+        organization_ids = pk_set if pk_set is not None else instance.organizations.values_list('id', flat=True)
+        user_ids = [instance.id]
+    else:
+        organization_ids = [instance.id]
+        user_ids = pk_set if pk_set is not None else instance.users.values_list('id', flat=True)
+
+    organization_ids = list(organization_ids)
+    for user_id in user_ids:
+        reopen_user_daily_metrics(user_id, org_ids=organization_ids)
+
+    for organization_id in organization_ids:
+        invalid_user_data_cache("non_company_users", organization_id)
+        invalid_user_data_cache("org_progress_leaderboard", organization_id)
+        invalid_user_data_cache("org_members", organization_id)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def on_user_groups_change(sender, instance, action, reverse, pk_set, **kwargs):  # pylint: disable=unused-argument
+    """
+    Invalidates non company users cache of user's organizations when user's groups (e.g. company admin) change
+    and members cache of the groups.
+    """
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    if reverse:
+        users = User.objects.filter(id__in=pk_set) if pk_set is not None else instance.user_set.all()
+        group_ids = [instance.id]
+    else:
+        users = [instance]
+        group_ids = pk_set if pk_set is not None else instance.groups.values_list('id', flat=True)
+
+    for group_id in group_ids:
+        invalid_user_data_cache("group_members", group_id)
+
+    organization_ids = Organization.objects.filter(users__in=users).values_list('id', flat=True).distinct()
+    for organization_id in organization_ids:
+        invalid_user_data_cache("non_company_users", organization_id)
+
+
+def _on_leaderboard_score_change(metric, course_key, instance):
+    """
+    Shares a change of a user's leaderboard score with rank indexes once the change is committed
+    """
+    user_id = instance.user_id
+    transaction.on_commit(lambda: record_user_rank_index_changes(user_id, course_key, metrics=[metric]))
+
+
+def _on_counted_row_change(metric, course_key, instance, signal):
+    """
+    Reopens rolled up metrics of the day a row counted by a daily metric was created on, and
+    invalidates cached time series of the course, once the change is committed
+    """
+    row_id, created, deleted = instance.id, instance.created, signal is post_delete
+    transaction.on_commit(
+        lambda: reopen_counted_row_daily_metrics(metric, course_key, row_id, created, deleted=deleted)
+    )
+
+
+@receiver(post_save, sender=Aggregator)
+@receiver(post_delete, sender=Aggregator)
+def on_course_aggregator_change(sender, instance, signal, **kwargs):  # pylint: disable=unused-argument
+    """
+    Updates progress rank index of the course when a user's course completion aggregate changes,
+    and reopens the day the user started the course on once the aggregate counts progress.
+    """
+    if instance.aggregation_name != 'course':
+        return
+    _on_leaderboard_score_change('progress', instance.course_key, instance)
+    if instance.earned > 0:
+        _on_counted_row_change('users_started', instance.course_key, instance, signal)
+
+
+@receiver(post_save, sender=BlockCompletion)
+@receiver(post_delete, sender=BlockCompletion)
+def on_block_completion_change(sender, instance, signal, **kwargs):  # pylint: disable=unused-argument
+    """
+    Reopens the day a completed module was first submitted on once its completion is counted.
+    """
+    if instance.completion > 0:
+        _on_counted_row_change('modules_completed', instance.context_key, instance, signal)
+
+
+@receiver(post_save, sender=StudentGradebook)
+@receiver(post_delete, sender=StudentGradebook)
+def on_student_gradebook_change(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Updates grade rank index of the course when a user's grade changes.
+    """
+    _on_leaderboard_score_change('grade', instance.course_id, instance)
+
+
+@receiver(post_save, sender=StudentSocialEngagementScore)
+@receiver(post_delete, sender=StudentSocialEngagementScore)
+def on_social_engagement_score_change(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Updates social rank index of the course when a user's social engagement score changes.
+    """
+    _on_leaderboard_score_change('social', instance.course_id, instance)
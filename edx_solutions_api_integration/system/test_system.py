@@ -8,6 +8,8 @@ import uuid
 from django.core.cache import cache
 from django.test import TestCase
 from edx_solutions_api_integration.test_utils import APIClientMixin
+from edx_solutions_api_integration.utils import (CACHE_STATS,
+                                                 reset_cache_stats)
 
 
 class SystemApiTests(TestCase, APIClientMixin):
@@ -49,3 +51,23 @@ class SystemApiTests(TestCase, APIClientMixin):
         self.assertIsNotNone(response.data['description'])
         self.assertGreater(len(response.data['description']), 0)
         self.assertIsNotNone(response.data['resources'])
+
+    def test_system_cache_stats_get(self):
+        """ Ensure cache stats are only exposed to API key holders """
+        reset_cache_stats()
+        CACHE_STATS.record_get('grade:1', None)
+        CACHE_STATS.record_set('grade', {'course_avg': 0.5})
+        CACHE_STATS.record_get('grade', {'course_avg': 0.5})
+        test_uri = '{}/cache_stats'.format(self.base_system_uri)
+
+        response = self.client.get(test_uri)
+        self.assertEqual(response.status_code, 403)
+
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        grade_stats = response.data['cache_stats']['grade']
+        self.assertEqual(grade_stats['hits'], 1)
+        self.assertEqual(grade_stats['misses'], 1)
+        self.assertEqual(grade_stats['sets'], 1)
+        self.assertGreater(grade_stats['set_bytes'], 0)
+        self.assertEqual(grade_stats['hit_ratio'], 0.5)
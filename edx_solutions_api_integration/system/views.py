@@ -1,7 +1,8 @@
 """ BASE API VIEWS """
 from django.middleware.csrf import get_token
 from edx_solutions_api_integration.permissions import SecureAPIView
-from edx_solutions_api_integration.utils import generate_base_uri
+from edx_solutions_api_integration.utils import (generate_base_uri,
+                                                 get_cache_stats)
 from rest_framework import status
 from rest_framework.response import Response
 
@@ -22,6 +23,19 @@ class SystemDetail(SecureAPIView):
         return Response(response_data, status=status.HTTP_200_OK)
 
 
+class SystemCacheStats(SecureAPIView):
+    """Exposes cache effectiveness counters of all workers"""
+
+    def get(self, request):
+        """
+        GET /api/system/cache_stats
+        """
+        response_data = {}
+        response_data['uri'] = generate_base_uri(request)
+        response_data['cache_stats'] = get_cache_stats()
+        return Response(response_data, status=status.HTTP_200_OK)
+
+
 class ApiDetail(SecureAPIView):
     """Manages top-level information about the Open edX API"""
 
@@ -1,3 +1,6 @@
 from .convert_ooyala_to_bcove import *
 from .get_assets_with_incorrect_urls import *
 from .update_http_to_https import *
+from .refresh_course_metrics_snapshots import *
+from .warm_course_metrics_cache import *
+from .refresh_course_daily_metrics import *
@@ -0,0 +1,28 @@
+import logging
+
+from celery.task import task
+from django.utils import timezone
+from opaque_keys.edx.keys import CourseKey
+from openedx.core.djangoapps.content.course_overviews.models import CourseOverview
+
+from ..courses.utils import refresh_course_daily_metrics_of_orgs
+
+log = logging.getLogger(__name__)
+
+
+@task(name='lms.djangoapps.api_integration.tasks.refresh_course_daily_metrics')
+def refresh_course_daily_metrics_task(course_ids=None, days=1):
+    """
+    Rolls up daily metrics of the past `days` days and of today so far, for given courses or all courses
+    if no course id is given. Scheduled nightly to finalize the previous day, with `days=0` during the day
+    to keep today's values up to date
+    """
+    if course_ids:
+        course_keys = [CourseKey.from_string(course_id) for course_id in course_ids]
+    else:
+        course_keys = CourseOverview.objects.values_list('id', flat=True)
+
+    today = timezone.now().date()
+    for course_key in course_keys:
+        log.info("Refreshing daily metrics of course %s", course_key)
+        refresh_course_daily_metrics_of_orgs(course_key, today - timezone.timedelta(days=days), today)
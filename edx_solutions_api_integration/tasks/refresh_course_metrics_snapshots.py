@@ -0,0 +1,24 @@
+import logging
+
+from celery.task import task
+from opaque_keys.edx.keys import CourseKey
+from openedx.core.djangoapps.content.course_overviews.models import CourseOverview
+
+from ..courses.utils import refresh_course_metrics_snapshots
+
+log = logging.getLogger(__name__)
+
+
+@task(name='lms.djangoapps.api_integration.tasks.refresh_course_metrics_snapshots')
+def refresh_course_metrics_snapshots_task(course_ids=None):
+    """
+    Refreshes course metrics snapshots of given courses, or of all courses if no course id is given
+    """
+    if course_ids:
+        course_keys = [CourseKey.from_string(course_id) for course_id in course_ids]
+    else:
+        course_keys = CourseOverview.objects.values_list('id', flat=True)
+
+    for course_key in course_keys:
+        log.info("Refreshing course metrics snapshots of course %s", course_key)
+        refresh_course_metrics_snapshots(course_key)
@@ -0,0 +1,21 @@
+import logging
+
+from celery.task import task
+from django.conf import settings
+from django.utils import timezone
+
+from ..courses.utils import warm_active_courses_metrics_cache
+
+log = logging.getLogger(__name__)
+
+
+@task(name='lms.djangoapps.api_integration.tasks.warm_course_metrics_cache')
+def warm_course_metrics_cache_task(time_range=60, concurrency=1, count=None):
+    """
+    Warms course metrics cache of courses with progress updates in past `time_range` minutes
+    """
+    since = timezone.now() - timezone.timedelta(minutes=time_range)
+    course_keys = warm_active_courses_metrics_cache(
+        since, concurrency=concurrency, count=count or getattr(settings, 'LEADERBOARD_SIZE', 3)
+    )
+    log.info("Warmed course metrics cache of %d courses", len(course_keys))
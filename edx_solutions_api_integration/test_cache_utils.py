@@ -0,0 +1,398 @@
+"""
+Tests for caching helpers of metrics in utils module
+"""
+import threading
+import unittest
+from datetime import datetime, timedelta
+
+import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+from edx_solutions_api_integration.utils import (COURSE_METRICS_CACHE_TTL,
+                                                 INVALIDATED_METRICS_CACHE_TTL,
+                                                 RANK_INDEX_LOCAL_CACHE,
+                                                 TIME_SERIES_CACHE_TTL,
+                                                 USER_METRICS_CACHE_TTL,
+                                                 CacheStats, LocalLRUCache,
+                                                 RankIndex,
+                                                 cache_course_data,
+                                                 cache_course_user_data,
+                                                 get_cache_generation,
+                                                 get_cache_stats,
+                                                 get_cache_ttl, get_cached_data,
+                                                 get_cached_data_many,
+                                                 get_rank_index,
+                                                 get_time_series_data,
+                                                 invalidate_cache_generation,
+                                                 record_rank_index_change,
+                                                 recompute_course_data,
+                                                 reset_cache_stats, strip_time)
+from freezegun import freeze_time
+from openedx.core.djangolib.testing.utils import CacheIsolationTestCase
+
+
+class RecomputeCourseDataTests(CacheIsolationTestCase):
+    """ Test suite for single flight recomputation of course data """
+    ENABLED_CACHES = ['default']
+
+    def setUp(self):
+        super().setUp()
+        self.course_id = 'course-v1:edX+CacheX+2014'
+
+    def test_recompute_course_data(self):
+        """
+        Test data is recomputed by the worker holding the lock and is served stale to concurrent callers
+        """
+        compute = mock.Mock(return_value={'leaders': [1, 2]})
+        data, is_stale = recompute_course_data('grade_leaderboard', self.course_id, compute)
+        self.assertEqual(data, {'leaders': [1, 2]})
+        self.assertFalse(is_stale)
+
+        concurrent_compute = mock.Mock(return_value={'leaders': [4]})
+        concurrent_results = []
+
+        def _compute():
+            # another request recomputing the same data while the lock is held
+            concurrent_results.append(recompute_course_data('grade_leaderboard', self.course_id, concurrent_compute))
+            return {'leaders': [2, 3]}
+
+        data, is_stale = recompute_course_data('grade_leaderboard', self.course_id, _compute)
+        self.assertEqual(data, {'leaders': [2, 3]})
+        self.assertFalse(is_stale)
+        self.assertEqual(concurrent_results, [({'leaders': [1, 2]}, True)])
+        self.assertFalse(concurrent_compute.called)
+
+        # lock is released once data is recomputed
+        data, is_stale = recompute_course_data('grade_leaderboard', self.course_id, concurrent_compute)
+        self.assertEqual(data, {'leaders': [4]})
+        self.assertFalse(is_stale)
+
+    def test_recompute_course_data_waits_for_holder(self):
+        """
+        Test concurrent callers wait for the value of the lock holder when there is no previous value to serve
+        """
+        computing, release = threading.Event(), threading.Event()
+        self.addCleanup(release.set)
+
+        def _compute():
+            computing.set()
+            release.wait(5)
+            return {'leaders': [2, 3]}
+
+        holder = threading.Thread(target=recompute_course_data, args=('social_leaderboard', self.course_id, _compute))
+        holder.start()
+        self.addCleanup(holder.join)
+        computing.wait(5)
+        threading.Timer(0.2, release.set).start()
+
+        concurrent_compute = mock.Mock(return_value={'leaders': [4]})
+        data, is_stale = recompute_course_data('social_leaderboard', self.course_id, concurrent_compute)
+        self.assertEqual(data, {'leaders': [2, 3]})
+        self.assertFalse(is_stale)
+        self.assertFalse(concurrent_compute.called)
+
+    @mock.patch('edx_solutions_api_integration.utils.RECOMPUTE_WAIT_TIMEOUT', 0.3)
+    def test_recompute_course_data_without_stale_copy(self):
+        """
+        Test concurrent callers compute data themselves when the holder's value doesn't come in time
+        """
+        concurrent_compute = mock.Mock(return_value={'leaders': [4]})
+        concurrent_results = []
+
+        def _compute():
+            concurrent_results.append(recompute_course_data('social_leaderboard', self.course_id, concurrent_compute))
+            return {'leaders': [2, 3]}
+
+        recompute_course_data('social_leaderboard', self.course_id, _compute)
+        self.assertEqual(concurrent_results, [({'leaders': [4]}, False)])
+
+
+class LocalLRUCacheTests(unittest.TestCase):
+    """ Test suite for worker local LRU cache """
+
+    def test_least_recently_used_entries_are_evicted(self):
+        local_cache = LocalLRUCache(max_size=2, timeout=60)
+        local_cache.set('a', {1})
+        local_cache.set('b', {2})
+        self.assertEqual(local_cache.get('a'), {1})
+
+        local_cache.set('c', {3})
+        self.assertIsNone(local_cache.get('b'))
+        self.assertEqual(local_cache.get('a'), {1})
+        self.assertEqual(local_cache.get('c'), {3})
+
+    def test_entries_expire(self):
+        local_cache = LocalLRUCache(max_size=2, timeout=60)
+        with freeze_time('2020-01-01 10:00:00'):
+            local_cache.set('a', {1})
+        with freeze_time('2020-01-01 10:00:59'):
+            self.assertEqual(local_cache.get('a'), {1})
+        with freeze_time('2020-01-01 10:01:01'):
+            self.assertIsNone(local_cache.get('a'))
+
+    def test_delete_and_clear(self):
+        local_cache = LocalLRUCache(max_size=2, timeout=60)
+        local_cache.set('a', {1})
+        local_cache.set('b', {2})
+        local_cache.delete('a')
+        self.assertIsNone(local_cache.get('a'))
+        local_cache.clear()
+        self.assertIsNone(local_cache.get('b'))
+
+
+class CachedDataGenerationTests(CacheIsolationTestCase):
+    """ Test suite for reusing cache generation between reading and caching data """
+    ENABLED_CACHES = ['default']
+
+    def setUp(self):
+        super().setUp()
+        self.course_id = 'course-v1:edX+CacheX+2014'
+
+    def test_generation_is_looked_up_once(self):
+        """
+        Test given generation is used instead of looking it up on every read and write
+        """
+        generation = get_cache_generation('grade', self.course_id)
+        with mock.patch('edx_solutions_api_integration.utils.get_cache_generations') as mock_generations:
+            self.assertIsNone(get_cached_data('grade', self.course_id, 1, generation=generation))
+            cache_course_data('grade', self.course_id, {'course_avg': 0.5}, generation=generation)
+            cache_course_user_data('grade', self.course_id, 1, {'user_grade': 0.7}, generation=generation)
+        self.assertFalse(mock_generations.called)
+        self.assertEqual(get_cached_data('grade', self.course_id, 1), {'course_avg': 0.5, 'user_grade': 0.7})
+
+    def test_cache_ttl_by_category(self):
+        """
+        Test only categories invalidated on every change are cached longer than score derived ones
+        """
+        self.assertEqual(get_cache_ttl('grade', COURSE_METRICS_CACHE_TTL), COURSE_METRICS_CACHE_TTL)
+        self.assertEqual(get_cache_ttl('progress_leaderboard:1', COURSE_METRICS_CACHE_TTL), COURSE_METRICS_CACHE_TTL)
+        self.assertEqual(get_cache_ttl('course_enrollments:1', COURSE_METRICS_CACHE_TTL), INVALIDATED_METRICS_CACHE_TTL)
+        self.assertEqual(get_cache_ttl('cities_count', USER_METRICS_CACHE_TTL), INVALIDATED_METRICS_CACHE_TTL)
+
+    def test_data_of_invalidated_generation_is_not_served(self):
+        """
+        Test data computed while its category is invalidated is cached under the generation it was computed for
+        """
+        generation = get_cache_generation('grade', self.course_id)
+        self.assertIsNone(get_cached_data('grade', self.course_id, generation=generation))
+        invalidate_cache_generation('grade', self.course_id)
+        cache_course_data('grade', self.course_id, {'course_avg': 0.5}, generation=generation)
+        self.assertIsNone(get_cached_data('grade', self.course_id))
+
+
+class CacheStatsTests(CacheIsolationTestCase):
+    """ Test suite for cache effectiveness counters """
+    ENABLED_CACHES = ['default']
+
+    def setUp(self):
+        super().setUp()
+        self.course_id = 'course-v1:edX+CacheX+2014'
+        reset_cache_stats()
+        self.addCleanup(reset_cache_stats)
+
+    def test_cache_stats(self):
+        """
+        Test hits, misses and sets of cached data are counted by base category
+        """
+        self.assertIsNone(get_cached_data('grade', self.course_id))
+        cache_course_data('grade', self.course_id, {'course_avg': 0.5})
+        self.assertIsNotNone(get_cached_data('grade', self.course_id))
+        get_cached_data_many(['grade', 'progress'], self.course_id)
+        get_cached_data('progress:1', self.course_id)
+
+        stats = get_cache_stats()
+        self.assertEqual(stats['grade']['hits'], 2)
+        self.assertEqual(stats['grade']['misses'], 1)
+        self.assertEqual(stats['grade']['sets'], 1)
+        self.assertGreater(stats['grade']['set_bytes'], 0)
+        self.assertEqual(stats['grade']['avg_set_bytes'], stats['grade']['set_bytes'])
+        self.assertEqual(stats['progress']['misses'], 2)
+        self.assertEqual(stats['progress']['hit_ratio'], 0)
+        self.assertIsNone(stats['progress']['avg_set_bytes'])
+
+        reset_cache_stats()
+        self.assertEqual(get_cache_stats(), {})
+
+    def test_cache_stats_are_shared_by_workers(self):
+        """
+        Test counts of each worker are added up in shared counters and payload sizes are sampled
+        """
+        workers = [CacheStats(flush_interval=60, size_sample_rate=2), CacheStats(flush_interval=60, size_sample_rate=2)]
+        for worker in workers:
+            worker.record_get('grade', None)
+            for _ in range(2):
+                worker.record_set('grade', {'course_avg': 0.5})
+
+        # counts are kept in process until flushed
+        self.assertEqual(get_cache_stats(), {})
+        workers[0].flush()
+        stats = workers[1].get_stats()
+        self.assertEqual(stats['grade']['misses'], 2)
+        self.assertEqual(stats['grade']['sets'], 4)
+        self.assertEqual(stats['grade']['set_bytes'], stats['grade']['avg_set_bytes'] * 4)
+
+    def test_cache_stats_categories_registered_by_workers(self):
+        """
+        Test categories first flushed by different workers are all registered once
+        """
+        workers = [CacheStats(), CacheStats()]
+        workers[0].record_get('grade', None)
+        workers[1].record_get('progress', None)
+        workers[1].record_get('grade', None)
+        for worker in workers:
+            worker.flush()
+        workers[0].record_get('grade', None)
+        workers[0].flush()
+
+        stats = get_cache_stats()
+        self.assertEqual(set(stats), {'grade', 'progress'})
+        self.assertEqual(stats['grade']['misses'], 3)
+        self.assertEqual(cache.get(CacheStats.KEY_PREFIX + '.categories.count'), 2)
+
+
+class RankIndexTests(unittest.TestCase):
+    """ Test suite for leaderboard rank index """
+
+    def setUp(self):
+        self.modified = datetime(2020, 1, 1)
+        self.rank_index = RankIndex([
+            (1, 0.5, self.modified),
+            (2, 0.9, self.modified),
+            (3, 0.5, self.modified - timedelta(minutes=1)),
+            (4, 0.1, self.modified),
+        ])
+
+    def test_get_position(self):
+        self.assertEqual(self.rank_index.get_position(2), 1)
+        # equal scores are ranked by earlier modified first
+        self.assertEqual(self.rank_index.get_position(3), 2)
+        self.assertEqual(self.rank_index.get_position(1), 3)
+        self.assertEqual(self.rank_index.get_position(4), 4)
+        self.assertIsNone(self.rank_index.get_position(10))
+        self.assertEqual(self.rank_index.get_score(3), 0.5)
+
+    def test_excluded_users(self):
+        rank_index = RankIndex([(1, 0.5, self.modified), (2, 0.9, self.modified)], excluded_user_ids={2, 10})
+        self.assertEqual(rank_index.get_position(1), 1)
+        self.assertIsNone(rank_index.get_position(2))
+        rank_index.update(10, 1.0, self.modified)
+        self.assertEqual(rank_index.get_position(1), 1)
+        self.assertEqual(len(rank_index), 1)
+
+    def test_update_and_remove(self):
+        self.rank_index.update(4, 1.0, self.modified)
+        self.assertEqual(self.rank_index.get_position(4), 1)
+        self.assertEqual(self.rank_index.get_position(2), 2)
+        self.rank_index.remove(2)
+        self.assertEqual(self.rank_index.get_position(3), 2)
+        self.assertEqual(len(self.rank_index), 3)
+
+
+class SharedRankIndexTests(CacheIsolationTestCase):
+    """ Test suite for rank indexes kept up to date with changes shared between workers """
+    ENABLED_CACHES = ['default']
+
+    def setUp(self):
+        super().setUp()
+        self.course_id = 'course-v1:edX+CacheX+2014'
+        self.modified = datetime(2020, 1, 1)
+        RANK_INDEX_LOCAL_CACHE.clear()
+        self.addCleanup(RANK_INDEX_LOCAL_CACHE.clear)
+
+    def test_get_rank_index_replays_changes(self):
+        build = mock.Mock(return_value=[(1, 0.5, self.modified), (2, 0.9, self.modified)])
+        rank_index = get_rank_index('progress', self.course_id, build)
+        self.assertEqual(rank_index.get_position(1), 2)
+
+        record_rank_index_change('progress', self.course_id, 1, 1.0, self.modified)
+        record_rank_index_change('progress', self.course_id, 3, 0.7, self.modified)
+        record_rank_index_change('progress', self.course_id, 2)
+
+        rank_index = get_rank_index('progress', self.course_id, build)
+        self.assertEqual(build.call_count, 1)
+        self.assertEqual(rank_index.get_position(1), 1)
+        self.assertEqual(rank_index.get_position(3), 2)
+        self.assertIsNone(rank_index.get_position(2))
+
+    def test_get_rank_index_rebuilds_when_changes_are_lost(self):
+        build = mock.Mock(return_value=[(1, 0.5, self.modified)])
+        get_rank_index('grade', self.course_id, build)
+        record_rank_index_change('grade', self.course_id, 2, 0.7, self.modified)
+        # change expired before this worker could replay it
+        cache.delete('edx_solutions_api_integration.rank_index_changes.grade.{}.1'.format(self.course_id))
+
+        get_rank_index('grade', self.course_id, build)
+        self.assertEqual(build.call_count, 2)
+
+    def test_get_rank_index_leaves_out_excluded_users(self):
+        build = mock.Mock(return_value=[(1, 0.5, self.modified), (2, 0.9, self.modified)])
+        exclude_users = mock.MagicMock()
+        exclude_users.get_cache_scope.return_value = 'exclusion:1'
+        exclude_users.__iter__.side_effect = lambda: iter([2])
+        rank_index = get_rank_index('social', self.course_id, build, exclude_users=exclude_users)
+        self.assertEqual(rank_index.get_position(1), 1)
+
+        # replayed changes of excluded users are left out too
+        record_rank_index_change('social', self.course_id, 2, 1.0, self.modified)
+        rank_index = get_rank_index('social', self.course_id, build, exclude_users=exclude_users)
+        self.assertEqual(build.call_count, 1)
+        self.assertEqual(rank_index.get_position(1), 1)
+        self.assertIsNone(rank_index.get_position(2))
+
+        # index is rebuilt once excluded users change
+        exclude_users.get_cache_scope.return_value = 'exclusion:2'
+        get_rank_index('social', self.course_id, build, exclude_users=exclude_users)
+        self.assertEqual(build.call_count, 2)
+
+
+class TimeSeriesCacheTests(CacheIsolationTestCase):
+    """ Test suite for caching closed intervals of time series """
+    ENABLED_CACHES = ['default']
+
+    def setUp(self):
+        super().setUp()
+        self.course_id = 'course-v1:edX+CacheX+2014'
+        self.today = strip_time(now())
+        for days_ago in (3, 2, 0):
+            self._create_user(days_ago)
+
+    def _create_user(self, days_ago):
+        User.objects.create(
+            username='user{}'.format(User.objects.count()),
+            date_joined=self.today - timedelta(days=days_ago) + timedelta(minutes=1),
+        )
+
+    def _get_series_values(self):
+        series = get_time_series_data(
+            User.objects.all(), self.today - timedelta(days=3), self.today, interval='days',
+            date_field='date_joined', date_field_model=User, aggregate=Count('id', distinct=True),
+            cache_category='time_series:users_joined', course_id=self.course_id,
+        )
+        return [value for _, value in series]
+
+    def test_closed_intervals_are_cached(self):
+        """
+        Test intervals ending before today are served from cache and only today is computed
+        """
+        self.assertEqual(self._get_series_values(), [1, 1, 0, 1])
+
+        self._create_user(3)
+        self._create_user(0)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self._get_series_values(), [1, 1, 0, 2])
+        self.assertEqual(len(queries), 1)
+
+        invalidate_cache_generation('time_series', self.course_id)
+        self.assertEqual(self._get_series_values(), [2, 1, 0, 2])
+
+    def test_closed_intervals_expire(self):
+        """
+        Test closed intervals are cached with a finite timeout, so keys of old generations expire
+        """
+        with mock.patch('edx_solutions_api_integration.utils.cache_course_data_many') as mock_cache_many:
+            self._get_series_values()
+        self.assertEqual(mock_cache_many.call_args[1]['timeout'], TIME_SERIES_CACHE_TTL)
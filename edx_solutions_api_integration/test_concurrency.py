@@ -0,0 +1,115 @@
+"""
+Tests for concurrent execution helpers of metrics in utils module
+"""
+import threading
+import time
+import unittest
+
+import mock
+from edx_solutions_api_integration.utils import (MetricSection,
+                                                 compute_metric_sections,
+                                                 run_concurrently)
+
+
+class RunConcurrentlyTests(unittest.TestCase):
+    """ Test suite for running independent metric queries concurrently """
+
+    def setUp(self):
+        self.threads = {}
+
+    def _record_thread(self, name, value=None):
+        self.threads[name] = threading.current_thread()
+        return value
+
+    def _get_calls(self):
+        return {
+            'first': (self._record_thread, ('first', 1), {}),
+            'second': (self._record_thread, ('second',), {'value': 2}),
+        }
+
+    @mock.patch('edx_solutions_api_integration.utils.detect_db_engine', mock.Mock(return_value='mysql'))
+    def test_calls_run_in_worker_threads(self):
+        results = run_concurrently(self._get_calls(), max_workers=2)
+        self.assertEqual(results, {'first': 1, 'second': 2})
+        self.assertNotIn(threading.current_thread(), self.threads.values())
+
+    @mock.patch('edx_solutions_api_integration.utils.detect_db_engine', mock.Mock(return_value='sqlite'))
+    def test_calls_run_sequentially_on_sqlite(self):
+        results = run_concurrently(self._get_calls(), max_workers=2)
+        self.assertEqual(results, {'first': 1, 'second': 2})
+        self.assertEqual(set(self.threads.values()), {threading.current_thread()})
+
+    @mock.patch('edx_solutions_api_integration.utils.detect_db_engine', mock.Mock(return_value='mysql'))
+    def test_calls_run_sequentially_with_single_worker(self):
+        run_concurrently(self._get_calls(), max_workers=1)
+        self.assertEqual(set(self.threads.values()), {threading.current_thread()})
+
+    @mock.patch('edx_solutions_api_integration.utils.detect_db_engine', mock.Mock(return_value='mysql'))
+    def test_errors_are_raised(self):
+        calls = self._get_calls()
+        calls['failing'] = (int, ('not a number',), {})
+        with self.assertRaises(ValueError):
+            run_concurrently(calls, max_workers=2)
+
+
+class ComputeMetricSectionsTests(unittest.TestCase):
+    """ Test suite for computing sections of a metrics response concurrently """
+
+    def setUp(self):
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+        self.sections = {
+            'enrolled': MetricSection(lambda context, data: {'enrolled': context['enrolled']}),
+            'started': MetricSection(
+                lambda context, data: {'started': 2, 'not_started': data['enrolled']['enrolled'] - 2},
+                dependencies=('enrolled',),
+            ),
+            'failing': MetricSection(lambda context, data: int('not a number'), expected_errors=(ValueError,)),
+            'broken': MetricSection(lambda context, data: {}['missing']),
+            'after_failing': MetricSection(lambda context, data: {'after_failing': 1}, dependencies=('failing',)),
+            'slow': MetricSection(lambda context, data: {'slow': self.release.wait(5)}, timeout=0.1),
+            'other_slow': MetricSection(lambda context, data: {'other_slow': self.release.wait(5)}, timeout=0.1),
+            'quick': MetricSection(lambda context, data: {'quick': time.sleep(0.05)}, timeout=0.5),
+        }
+
+    def _compute(self, names, max_workers=4):
+        return compute_metric_sections(self.sections, names, {'enrolled': 5}, max_workers=max_workers)
+
+    @mock.patch('edx_solutions_api_integration.utils.detect_db_engine', mock.Mock(return_value='mysql'))
+    def test_sections_with_dependencies(self):
+        data, errors = self._compute(['started'])
+        self.assertEqual(data, {'enrolled': 5, 'started': 2, 'not_started': 3})
+        self.assertEqual(errors, {})
+
+    @mock.patch('edx_solutions_api_integration.utils.detect_db_engine', mock.Mock(return_value='mysql'))
+    def test_partial_results(self):
+        data, errors = self._compute(['enrolled', 'after_failing', 'slow'])
+        self.assertEqual(data, {'enrolled': 5})
+        self.assertEqual(set(errors), {'failing', 'after_failing', 'slow'})
+        self.assertEqual(errors['failing'], 'unavailable')
+        self.assertEqual(errors['after_failing'], 'failing is not available')
+        self.assertEqual(errors['slow'], 'timed out')
+
+    @mock.patch('edx_solutions_api_integration.utils.detect_db_engine', mock.Mock(return_value='mysql'))
+    def test_timed_out_sections_dont_hold_up_others(self):
+        started = time.time()
+        data, errors = self._compute(['slow', 'other_slow', 'quick'], max_workers=2)
+        # quick section starts once slow ones time out, and its deadline counts from then
+        self.assertEqual(data, {'quick': None})
+        self.assertEqual(errors, {'slow': 'timed out', 'other_slow': 'timed out'})
+        # threads of timed out sections are left to finish in background
+        self.assertLess(time.time() - started, 1)
+
+    @mock.patch('edx_solutions_api_integration.utils.detect_db_engine', mock.Mock(return_value='mysql'))
+    def test_unexpected_errors_are_raised(self):
+        with self.assertRaises(KeyError):
+            self._compute(['enrolled', 'broken'])
+        with self.assertRaises(KeyError):
+            self._compute(['enrolled', 'broken'], max_workers=1)
+
+    @mock.patch('edx_solutions_api_integration.utils.detect_db_engine', mock.Mock(return_value='sqlite'))
+    def test_sections_run_sequentially_on_sqlite(self):
+        self.release.set()
+        data, errors = self._compute(['started', 'after_failing', 'slow'])
+        self.assertEqual(data, {'enrolled': 5, 'started': 2, 'not_started': 3, 'slow': True})
+        self.assertEqual(set(errors), {'failing', 'after_failing'})
@@ -0,0 +1,112 @@
+"""
+Tests for exclusion of users from aggregate queries
+"""
+import logging
+import time
+
+from django.contrib.auth.models import Group, User
+from django.db import DatabaseError
+from edx_solutions_api_integration.models import GroupProfile
+from edx_solutions_api_integration.utils import (
+    UserExclusion, exclude_users_from, get_aggregate_exclusion_user_ids,
+    get_non_actual_company_users)
+from edx_solutions_organizations.models import Organization
+from opaque_keys.edx.keys import CourseKey
+from openedx.core.djangolib.testing.utils import CacheIsolationTestCase
+from student.models import CourseAccessRole
+from student.tests.factories import UserFactory
+
+log = logging.getLogger(__name__)
+
+
+class UserExclusionTests(CacheIsolationTestCase):
+    """ Test suite for excluding users with NOT EXISTS subqueries """
+    ENABLED_CACHES = ['default']
+
+    def setUp(self):
+        super().setUp()
+        self.course_key = CourseKey.from_string('course-v1:edX+ExcludeX+2014')
+        self.users = UserFactory.create_batch(4)
+        self.user_ids = [user.id for user in self.users]
+        for user, role in zip(self.users, ['observer', 'staff']):
+            CourseAccessRole.objects.create(user=user, course_id=self.course_key, org='edX', role=role)
+
+    def _get_user_ids(self, exclude_users):
+        queryset = exclude_users_from(User.objects.filter(id__in=self.user_ids), exclude_users, 'id')
+        return set(queryset.values_list('id', flat=True))
+
+    def test_exclude_course_roles(self):
+        exclusion = UserExclusion(self.course_key)
+        self.assertEqual(self._get_user_ids(exclusion), set(self.user_ids[1:]))
+        self.assertEqual(
+            self._get_user_ids(exclusion), self._get_user_ids(get_aggregate_exclusion_user_ids(self.course_key))
+        )
+        self.assertIn(self.user_ids[0], exclusion)
+        self.assertEqual(set(exclusion), {self.user_ids[0]})
+
+        exclusion = UserExclusion(self.course_key, roles=['observer', 'staff'])
+        self.assertEqual(self._get_user_ids(exclusion), set(self.user_ids[2:]))
+        self.assertEqual(len(exclusion), 2)
+
+    def test_course_roles_of_other_orgs_are_ignored(self):
+        CourseAccessRole.objects.create(user=self.users[3], course_id=self.course_key, org='OtherX', role='observer')
+        exclusion = UserExclusion(self.course_key)
+        self.assertEqual(self._get_user_ids(exclusion), set(self.user_ids[1:]))
+        self.assertEqual(set(exclusion), {self.user_ids[0]})
+
+    def test_exclude_non_company_users(self):
+        other_organization = Organization.objects.create(name='Other', display_name='Other')
+        organization = Organization.objects.create(name='Company', display_name='Company')
+        organization.users.add(*self.users)
+        other_organization.users.add(self.users[2])
+        admin_group = Group.objects.create(name='company_admins')
+        GroupProfile.objects.create(group=admin_group, name='company_admin')
+        admin_group.user_set.add(self.users[2], self.users[3])
+
+        exclusion = UserExclusion(organization_id=organization.id, exclude_type='company_admin')
+        self.assertEqual(self._get_user_ids(exclusion), set(self.user_ids) - {self.user_ids[2]})
+        self.assertEqual(set(exclusion), set(get_non_actual_company_users('company_admin', organization.id)))
+
+        # first organization of a user is the one with the lowest id, whatever order the user joined them
+        later_organization = Organization.objects.create(name='Later', display_name='Later')
+        later_organization.users.add(self.users[3])
+        exclusion = UserExclusion(organization_id=later_organization.id, exclude_type='company_admin')
+        self.assertEqual(set(exclusion), {self.user_ids[3]})
+        self.assertEqual(self._get_user_ids(exclusion), set(self.user_ids) - {self.user_ids[3]})
+
+    def test_benchmark_excluded_users(self):
+        """
+        Compares NOT IN list of 10k excluded user ids with NOT EXISTS subquery over course roles
+        """
+        User.objects.bulk_create([User(username='excluded{}'.format(idx)) for idx in range(10000)])
+        CourseAccessRole.objects.bulk_create([
+            CourseAccessRole(user_id=user_id, course_id=self.course_key, org='edX', role='observer')
+            for user_id in User.objects.filter(username__startswith='excluded').values_list('id', flat=True)
+        ])
+        excluded_user_ids = get_aggregate_exclusion_user_ids(self.course_key)
+        exclusion = UserExclusion(self.course_key)
+        self.assertEqual(len(excluded_user_ids), 10001)
+
+        not_exists_queryset = exclude_users_from(User.objects.all(), exclusion, 'id')
+        __, not_exists_params = not_exists_queryset.query.sql_with_params()
+        started = time.perf_counter()
+        not_exists_count = not_exists_queryset.count()
+        not_exists_time = time.perf_counter() - started
+
+        not_in_queryset = exclude_users_from(User.objects.all(), excluded_user_ids, 'id')
+        __, not_in_params = not_in_queryset.query.sql_with_params()
+        started = time.perf_counter()
+        try:
+            not_in_count = not_in_queryset.count()
+        except DatabaseError:
+            # e.g. SQLite builds limited to 999 query parameters
+            log.info("NOT IN list of %s user ids failed on this database", len(excluded_user_ids))
+        else:
+            log.info(
+                "excluding 10k users: NOT IN %.4fs with %s params, NOT EXISTS %.4fs with %s params",
+                time.perf_counter() - started, len(not_in_params), not_exists_time, len(not_exists_params),
+            )
+            self.assertEqual(not_in_count, not_exists_count)
+
+        self.assertGreaterEqual(len(not_in_params), 10001)
+        self.assertLess(len(not_exists_params), 10)
@@ -0,0 +1,142 @@
+"""
+Tests for circuit breaker and cached fallback of forum stats in utils module
+"""
+import threading
+import unittest
+
+import mock
+from django.test.utils import override_settings
+from edx_solutions_api_integration.utils import (FORUM_CIRCUIT_FAILURE_THRESHOLD,
+                                                 FORUM_STATS_CIRCUIT_BREAKER,
+                                                 CircuitBreaker,
+                                                 ForumStatsUnavailable,
+                                                 get_forum_stats)
+from freezegun import freeze_time
+from openedx.core.djangoapps.django_comment_common.comment_client.utils import CommentClientRequestError
+from openedx.core.djangolib.testing.utils import CacheIsolationTestCase
+from requests.exceptions import ConnectionError
+
+
+class FakeForumService:
+    """
+    In-process fake of the comments service which answers, fails or hangs on demand
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.error = None
+        self.hang = threading.Event()
+        self.release = threading.Event()
+        self.stats = {'num_threads': 5, 'num_active_threads': 3}
+
+    def get_course_thread_stats(self, course_id):  # pylint: disable=unused-argument
+        self.calls += 1
+        if self.hang.is_set():
+            self.release.wait(5)
+        if self.error:
+            raise self.error
+        return dict(self.stats)
+
+
+@mock.patch('edx_solutions_api_integration.utils.detect_db_engine', mock.Mock(return_value='mysql'))
+@override_settings(FORUM_STATS_CACHE_TTL=0, FORUM_STATS_DEADLINE=0.2)
+class ForumStatsTests(CacheIsolationTestCase):
+    """ Test suite for fetching forum stats through the forum circuit breaker """
+    ENABLED_CACHES = ['default']
+
+    def setUp(self):
+        super().setUp()
+        self.course_id = 'course-v1:edX+ForumX+2014'
+        self.forum = FakeForumService()
+        self.addCleanup(self.forum.release.set)
+        FORUM_STATS_CIRCUIT_BREAKER.reset()
+        self.addCleanup(FORUM_STATS_CIRCUIT_BREAKER.reset)
+
+    def _get_stats(self):
+        return get_forum_stats('thread_stats', self.course_id, self.forum.get_course_thread_stats, self.course_id)
+
+    @override_settings(FORUM_STATS_CACHE_TTL=60)
+    def test_stats_are_memoized(self):
+        self.assertEqual(self._get_stats(), ({'num_threads': 5, 'num_active_threads': 3}, False))
+        self.assertEqual(self._get_stats(), ({'num_threads': 5, 'num_active_threads': 3}, False))
+        self.assertEqual(self.forum.calls, 1)
+
+    def test_last_good_stats_are_served_on_errors(self):
+        self._get_stats()
+        self.forum.error = ConnectionError('Forum service is down')
+        self.assertEqual(self._get_stats(), ({'num_threads': 5, 'num_active_threads': 3}, True))
+
+    def test_errors_are_raised_without_previous_stats(self):
+        self.forum.error = ConnectionError('Forum service is down')
+        with self.assertRaises(ConnectionError):
+            self._get_stats()
+
+    def test_slow_forum_service_times_out(self):
+        self._get_stats()
+        self.forum.hang.set()
+        self.assertEqual(self._get_stats(), ({'num_threads': 5, 'num_active_threads': 3}, True))
+
+        with self.assertRaises(ForumStatsUnavailable):
+            get_forum_stats('thread_stats', 'course-v1:edX+OtherX+2014', self.forum.get_course_thread_stats, '')
+
+    def test_circuit_opens_after_repeated_failures(self):
+        self._get_stats()
+        self.forum.error = ConnectionError('Forum service is down')
+        for _ in range(FORUM_CIRCUIT_FAILURE_THRESHOLD):
+            self._get_stats()
+        self.assertEqual(FORUM_STATS_CIRCUIT_BREAKER.state, CircuitBreaker.OPEN)
+
+        # forum service isn't called while the circuit is open
+        calls = self.forum.calls
+        self.assertEqual(self._get_stats(), ({'num_threads': 5, 'num_active_threads': 3}, True))
+        self.assertEqual(self.forum.calls, calls)
+
+    def test_request_errors_do_not_open_circuit(self):
+        self.forum.error = CommentClientRequestError('User is unknown to forum service', 404)
+        for _ in range(FORUM_CIRCUIT_FAILURE_THRESHOLD):
+            with self.assertRaises(CommentClientRequestError):
+                self._get_stats()
+        self.assertEqual(FORUM_STATS_CIRCUIT_BREAKER.state, CircuitBreaker.CLOSED)
+
+        self.forum.error = CommentClientRequestError('Forum service is overloaded', 503)
+        for _ in range(FORUM_CIRCUIT_FAILURE_THRESHOLD):
+            with self.assertRaises(CommentClientRequestError):
+                self._get_stats()
+        self.assertEqual(FORUM_STATS_CIRCUIT_BREAKER.state, CircuitBreaker.OPEN)
+
+    def test_unexpected_errors_are_raised(self):
+        self._get_stats()
+        self.forum.error = TypeError('get_course_thread_stats() got an unexpected keyword argument')
+        for _ in range(FORUM_CIRCUIT_FAILURE_THRESHOLD):
+            with self.assertRaises(TypeError):
+                self._get_stats()
+        self.assertEqual(FORUM_STATS_CIRCUIT_BREAKER.state, CircuitBreaker.CLOSED)
+
+
+class CircuitBreakerTests(unittest.TestCase):
+    """ Test suite for circuit breaker states """
+
+    def test_trial_call_closes_circuit(self):
+        circuit_breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+        with freeze_time('2020-01-01 10:00:00'):
+            circuit_breaker.record_failure()
+            self.assertTrue(circuit_breaker.allow_request())
+            circuit_breaker.record_failure()
+            self.assertFalse(circuit_breaker.allow_request())
+
+        with freeze_time('2020-01-01 10:00:31'):
+            self.assertEqual(circuit_breaker.state, CircuitBreaker.HALF_OPEN)
+            # a single trial call is let through
+            self.assertTrue(circuit_breaker.allow_request())
+            self.assertFalse(circuit_breaker.allow_request())
+            circuit_breaker.record_success()
+            self.assertEqual(circuit_breaker.state, CircuitBreaker.CLOSED)
+
+    def test_failed_trial_call_opens_circuit(self):
+        circuit_breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        with freeze_time('2020-01-01 10:00:00'):
+            circuit_breaker.record_failure()
+        with freeze_time('2020-01-01 10:00:31'):
+            self.assertTrue(circuit_breaker.allow_request())
+            circuit_breaker.record_failure()
+            self.assertEqual(circuit_breaker.state, CircuitBreaker.OPEN)
@@ -0,0 +1,64 @@
+"""
+Tests for database models of api integration app
+"""
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from edx_solutions_api_integration.models import LeaderBoard
+from student.tests.factories import UserFactory
+
+
+class LeaderBoardTests(TestCase):
+    """ Test suite for bulk replacement of stored leaderboards """
+
+    def setUp(self):
+        super().setUp()
+        self.course_id = 'course-v1:edX+LeaderX+2014'
+        self.other_course_id = 'course-v1:edX+OtherX+2014'
+        self.users = [UserFactory() for __ in range(4)]
+        self.user_ids = [user.id for user in self.users]
+
+    def _get_leaders(self, course_id):
+        return list(
+            LeaderBoard.objects.filter(course_key=course_id).order_by('position').values_list('position', 'user_id')
+        )
+
+    def test_replace_leaders(self):
+        previous = LeaderBoard.replace_leaders({self.course_id: self.user_ids[:3]})
+        self.assertEqual(previous, {self.course_id: {}})
+        self.assertEqual(
+            self._get_leaders(self.course_id),
+            [(1, self.user_ids[0]), (2, self.user_ids[1]), (3, self.user_ids[2])],
+        )
+
+        previous = LeaderBoard.replace_leaders({
+            self.course_id: [self.user_ids[3], self.user_ids[1]],
+            self.other_course_id: [self.user_ids[0]],
+        })
+        self.assertEqual(previous, {
+            self.course_id: {1: self.user_ids[0], 2: self.user_ids[1], 3: self.user_ids[2]},
+            self.other_course_id: {},
+        })
+        # positions past the new leaderboard are removed
+        self.assertEqual(self._get_leaders(self.course_id), [(1, self.user_ids[3]), (2, self.user_ids[1])])
+        self.assertEqual(self._get_leaders(self.other_course_id), [(1, self.user_ids[0])])
+
+    def test_replace_leaders_query_count(self):
+        """
+        Test replacing 1000 leaderboard rows takes a bounded number of queries rather than one per row
+        """
+        users = [UserFactory() for __ in range(10)]
+        course_leaders = {
+            'course-v1:edX+LeaderX+{}'.format(idx): [users[(idx + position) % 10].id for position in range(10)]
+            for idx in range(100)
+        }
+        with CaptureQueriesContext(connection) as queries:
+            LeaderBoard.replace_leaders(course_leaders)
+        self.assertEqual(LeaderBoard.objects.count(), 1000)
+        self.assertLessEqual(len(queries), 10)
+
+        shifted_leaders = {course_id: user_ids[1:] + user_ids[:1] for course_id, user_ids in course_leaders.items()}
+        with CaptureQueriesContext(connection) as queries:
+            LeaderBoard.replace_leaders(shifted_leaders)
+        self.assertLessEqual(len(queries), 10)
+        self.assertEqual(self._get_leaders('course-v1:edX+LeaderX+0')[0], (1, users[1].id))
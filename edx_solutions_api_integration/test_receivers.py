@@ -6,11 +6,20 @@ Run these tests @ Devstack:
 import uuid
 from datetime import datetime
 
+import mock
 from django.conf import settings
 from django.contrib.auth.models import Group, User
 from django.test.utils import override_settings
 from edx_solutions_api_integration.models import (
     CourseContentGroupRelationship, CourseGroupRelationship, GroupProfile)
+from edx_solutions_api_integration.utils import (
+    cache_course_data, cache_course_user_data,
+    get_aggregate_exclusion_user_ids, get_cache_category, get_cached_data)
+from opaque_keys.edx.keys import CourseKey
+from openedx.core.djangolib.testing.utils import CacheIsolationTestCase
+from student.models import (ENROLL_STATUS_CHANGE, CourseAccessRole,
+                            EnrollStatusChange)
+from student.tests.factories import UserFactory
 from xmodule.modulestore.django import SignalHandler
 from xmodule.modulestore.tests.django_utils import (ModuleStoreTestCase,
                                                     mixed_store_config)
@@ -75,3 +84,65 @@ class ApiManagerReceiversTests(ModuleStoreTestCase):
         # Validate that the course references were removed
         self.assertEqual(CourseGroupRelationship.objects.filter(course_id=str(self.course.id)).count(), 0)
         self.assertEqual(CourseContentGroupRelationship.objects.filter(course_id=self.course.id, content_id=str(self.chapter.location)).count(), 0)  # pylint: disable=C0301
+
+
+class ApiManagerCacheReceiversTests(CacheIsolationTestCase):
+    """ Test suite for signal receivers invalidating metrics cache """
+    ENABLED_CACHES = ['default']
+
+    def setUp(self):
+        super().setUp()
+        self.course_id = 'course-v1:edX+CacheX+2014'
+
+    def test_receiver_on_course_enrollment_change(self):
+        """
+        Test enrollment change invalidates organization scoped enrollment counts and dependent categories
+        """
+        org_category = get_cache_category('course_enrollments', 1, 'exclude_admins')
+        cache_course_data('course_enrollments', self.course_id, {'enrollment_count': 5})
+        cache_course_data(org_category, self.course_id, {'enrollment_count': 2})
+        cache_course_data('progress', self.course_id, {'course_avg': 50})
+        cache_course_user_data('progress', self.course_id, 1, {'completions': 20, 'position': 2})
+        cache_course_data('grade', self.course_id, {'course_avg': 0.5})
+        cache_course_data(get_cache_category('grade_leaderboard', 'digest'), self.course_id, {'leader_rows': []})
+
+        self.assertIsNotNone(get_cached_data(org_category, self.course_id))
+        self.assertIsNotNone(get_cached_data('progress', self.course_id, 1))
+
+        ENROLL_STATUS_CHANGE.send(sender=None, event=EnrollStatusChange.enroll, user=None, course_id=self.course_id)
+
+        self.assertIsNone(get_cached_data('course_enrollments', self.course_id))
+        self.assertIsNone(get_cached_data(org_category, self.course_id))
+        self.assertIsNone(get_cached_data('progress', self.course_id))
+        self.assertIsNone(get_cached_data('progress', self.course_id, 1))
+        self.assertEqual(get_cached_data('grade', self.course_id), {'course_avg': 0.5})
+        self.assertIsNone(get_cached_data(get_cache_category('grade_leaderboard', 'digest'), self.course_id))
+
+    @override_settings(AGGREGATION_EXCLUDE_ROLES=['observer'])
+    def test_receiver_on_course_access_role_change(self):
+        """
+        Test excluded users of a course are refreshed when a course role is granted or revoked
+        """
+        course_key = CourseKey.from_string(self.course_id)
+        user = UserFactory.create()
+        staff_user = UserFactory.create()
+        self.assertEqual(get_aggregate_exclusion_user_ids(course_key), set())
+
+        # course roles cache is refreshed once the role change is committed
+        with mock.patch('edx_solutions_api_integration.receivers.transaction.on_commit', lambda func: func()):
+            role = CourseAccessRole.objects.create(
+                user=user, course_id=course_key, org=course_key.org, role='observer'
+            )
+            CourseAccessRole.objects.create(user=staff_user, course_id=course_key, org=course_key.org, role='staff')
+            self.assertEqual(get_aggregate_exclusion_user_ids(course_key), {user.id})
+            self.assertEqual(
+                get_aggregate_exclusion_user_ids(course_key, roles=['staff', 'observer']), {user.id, staff_user.id}
+            )
+
+            # excluded users are served from cache without querying course roles
+            with self.assertNumQueries(0):
+                self.assertEqual(get_aggregate_exclusion_user_ids(course_key), {user.id})
+
+            role.delete()
+            self.assertEqual(get_aggregate_exclusion_user_ids(course_key), set())
+            self.assertEqual(get_aggregate_exclusion_user_ids(course_key, roles=['staff', 'observer']), {staff_user.id})
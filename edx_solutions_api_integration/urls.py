@@ -11,6 +11,7 @@
 
 from django.conf.urls import include, url
 from django.db import transaction
+from edx_solutions_api_integration.courses import views as courses_views
 from edx_solutions_api_integration.system import views as system_views
 from edx_solutions_organizations import views as organization_views
 from edx_solutions_projects import views as project_views
@@ -19,11 +20,15 @@ from rest_framework.routers import DefaultRouter
 urlpatterns = [
     url(r'^$', system_views.ApiDetail.as_view()),
     url(r'^system$', system_views.SystemDetail.as_view()),
+    url(r'^system/cache_stats$', system_views.SystemCacheStats.as_view()),
     url(r'^mobileapps/*', include('mobileapps.urls')),
     url(r'^users/*', include('edx_solutions_api_integration.users.urls')),
     url(r'^groups/*', include('edx_solutions_api_integration.groups.urls')),
     url(r'^sessions/*', include('edx_solutions_api_integration.sessions.urls')),
     url(r'^courses/', include('edx_solutions_api_integration.courses.urls')),
+    url(r'^organizations/(?P<organization_id>[0-9]+)/metrics/completions/leaders/*$',
+        courses_views.OrganizationsMetricsCompletionsLeadersList.as_view(),
+        name='organization-metrics-completions-leaders'),
     url(r'^organizations/*', include('edx_solutions_organizations.urls')),
     url(r'^mobile/v1/', include('edx_solutions_api_integration.mobile_api.urls')),
     url(r'^imports/*', include('edx_solutions_api_integration.imports.urls')),
@@ -41,11 +41,12 @@ from edx_solutions_api_integration.users.serializers import (
     CourseProgressSerializer, MassUsersDetailsSerializer,
     UserCountByCitySerializer, UserRolesSerializer, UserSerializer)
 from edx_solutions_api_integration.utils import (
-    cache_course_data, cache_course_user_data, css_data_to_list,
-    css_param_to_list, dict_has_items, extract_data_params, generate_base_uri,
-    get_aggregate_exclusion_user_ids, get_cached_data,
-    get_non_actual_company_users, get_profile_image_urls_by_username,
-    get_user_from_request_params, str2bool)
+    FORUM_SERVICE_ERRORS, cache_course_data, cache_course_user_data,
+    css_data_to_list, css_param_to_list, dict_has_items, extract_data_params,
+    generate_base_uri, get_aggregate_exclusion_user_ids, get_cache_generation,
+    get_cached_data, get_forum_stats, get_non_actual_company_users,
+    get_profile_image_urls_by_username, get_user_from_request_params,
+    str2bool)
 from edx_solutions_organizations.models import (Organization,
                                                 OrganizationUsersAttributes)
 from edx_solutions_organizations.serializers import BasicOrganizationSerializer
@@ -1530,6 +1531,8 @@ class UsersSocialMetrics(SecureListAPIView):
     forums
     - URI: ```/api/users/{user_id}/courses/{course_id}/metrics/social/```
     - GET: Returns a list of social metrics for that user in the specified course
+    - forum stats of the user are included with `include_stats=true`, last fetched stats are returned
+      marked `stale` while the forum service fails or doesn't respond
     """
 
     def get(self, request, *args, **kwargs):  # pylint: disable=unused-arguments
@@ -1543,18 +1546,30 @@ class UsersSocialMetrics(SecureListAPIView):
             raise Http404
 
         course_key = get_course_key(course_id)
-        cached_social_data = get_cached_data('social', course_id, user.id)
+        generation = get_cache_generation('social', course_id)
+        cached_social_data = get_cached_data('social', course_id, user.id, generation=generation)
         if not cached_social_data:
             social_engagement_score = self._get_user_score(course_key, user)
             course_avg = self._get_course_average_score(course_key)
             data = {'course_avg': course_avg, 'score': social_engagement_score}
-            cache_course_data('social', course_id, {'course_avg': course_avg})
-            cache_course_user_data('social', course_id, user.id, {'score': social_engagement_score})
+            cache_course_data('social', course_id, {'course_avg': course_avg}, generation=generation)
+            cache_course_user_data(
+                'social', course_id, user.id, {'score': social_engagement_score}, generation=generation
+            )
         else:
             data = cached_social_data
 
         if include_stats:
-            data['stats'] = StudentSocialEngagementScore.get_user_engagements_stats(course_key, user.id)
+            try:
+                stats, is_stale = get_forum_stats(
+                    'user_stats', course_id, StudentSocialEngagementScore.get_user_engagements_stats,
+                    course_key, user.id, user_id=user.id
+                )
+            except FORUM_SERVICE_ERRORS as e:
+                log.error("Forum service returned an error: %s", str(e))
+                data['err_msg'] = str(e)
+            else:
+                data['stats'] = dict(stats, stale=True) if is_stale else stats
 
         return Response(data, status.HTTP_200_OK)
 
@@ -1,11 +1,19 @@
 """ API implementation for Secure api calls. """
 
 import ast
+import bisect
 import datetime
 import json
+import logging
+import pickle
 import re
 import socket
 import struct
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from urllib.request import urlopen
 
 from dateutil.parser import parse
@@ -13,23 +21,74 @@ from dateutil.relativedelta import MO, relativedelta
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.cache import cache
-from django.db.models import Func
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db import connection
+from django.db.models import Exists, Func, OuterRef
 from django.shortcuts import get_object_or_404
 from django.utils.timezone import now
-from edx_solutions_organizations.models import Organization
 from lms.djangoapps.discussion.notification_prefs.views import UsernameCipher
 from opaque_keys.edx.keys import CourseKey
+from openedx.core.djangoapps.django_comment_common.comment_client.utils import (
+    CommentClient500Error, CommentClientError, CommentClientMaintenanceError)
 from openedx.core.djangoapps.user_api.accounts.image_helpers import (
     _get_default_profile_image_urls, _get_profile_image_urls,
     _make_profile_image_name, get_profile_image_storage)
 from openedx.core.djangoapps.user_api.accounts.serializers import PROFILE_IMAGE_KEY_PREFIX
 from openedx.core.djangoapps.waffle_utils import WaffleSwitchNamespace
 from PIL import Image
+from requests.exceptions import ConnectionError as RequestConnectionError
+from requests.exceptions import RequestException, Timeout
 from rest_framework.exceptions import ParseError
-from student.roles import CourseObserverRole, CourseRole
+from student.models import CourseAccessRole
+from student.roles import CourseObserverRole
+
+log = logging.getLogger(__name__)
 
 USER_METRICS_CACHE_TTL = 60 * 60
 COURSE_METRICS_CACHE_TTL = 30 * 60
+INVALIDATED_METRICS_CACHE_TTL = 12 * 60 * 60
+ORG_LEADERBOARD_CACHE_TTL = 15 * 60
+ENGAGEMENT_SUMMARY_CACHE_TTL = 60
+STALE_METRICS_CACHE_TTL = 24 * 60 * 60
+TIME_SERIES_CACHE_TTL = 7 * 24 * 60 * 60
+RECOMPUTE_LOCK_TTL = 60
+RECOMPUTE_WAIT_TIMEOUT = 5
+RECOMPUTE_POLL_INTERVAL = 0.1
+EXCLUDE_USERS_CACHE_TTL = 60 * 60
+EXCLUDE_USERS_LOCAL_CACHE_TTL = 5 * 60
+EXCLUDE_USERS_LOCAL_CACHE_MAX_SIZE = 1000
+RANK_INDEX_LOCAL_CACHE_TTL = 5 * 60
+RANK_INDEX_LOCAL_CACHE_MAX_SIZE = 100
+RANK_INDEX_CHANGES_TTL = 60 * 60
+RANK_INDEX_MAX_REPLAYED_CHANGES = 1000
+TIME_SERIES_MAX_WORKERS = 5
+COURSE_METRICS_MAX_WORKERS = 4
+COURSE_METRICS_SECTION_TIMEOUT = 20
+THREAD_STATS_TIMEOUT = 5
+FORUM_STATS_CACHE_TTL = 60
+FORUM_STATS_DEADLINE = 3
+FORUM_STATS_MAX_WORKERS = 8
+FORUM_CIRCUIT_FAILURE_THRESHOLD = 5
+FORUM_CIRCUIT_RESET_TIMEOUT = 30
+CACHE_STATS_FLUSH_INTERVAL = 10
+CACHE_STATS_SIZE_SAMPLE_RATE = 10
+
+# separates the base category from its scope (e.g. organization) in a cache category
+CACHE_CATEGORY_SCOPE_SEPARATOR = ':'
+# categories invalidated on every change of the data they are computed from, which are cached for
+# `INVALIDATED_METRICS_CACHE_TTL`. Score derived categories e.g. `grade` aren't invalidated on score
+# changes, so they expire after the shorter course and user metrics TTLs
+INVALIDATED_CACHE_CATEGORIES = ('course_enrollments', 'exclude_users', 'cities_count')
+# categories whose cached data is computed from data of another category
+CACHE_CATEGORY_DEPENDENCIES = {
+    'course_enrollments': (
+        'progress', 'grade_leaderboard', 'social_leaderboard', 'engagement_summary', 'time_series',
+    ),
+    'exclude_users': ('progress', 'grade', 'social', 'time_series', 'cities_count'),
+    'grade': ('grade_leaderboard', 'passed_count', 'completed_count'),
+    'progress': ('progress_leaderboard',),
+    'social': ('social_leaderboard',),
+}
 
 COHORT_NAMESPACE = 'course_groups'
 COHORT_SWITCH = 'enable_apros_integration'
@@ -113,68 +172,650 @@ def string_list_to_list(string_list):
     return ast.literal_eval(string_list)
 
 
-def get_cache_key(category, course_id, user_id=None):
+def get_cache_category(category, *scopes):
+    """
+    Builds a cache category limited to given scopes e.g. organization id. Scoped categories
+    share cache generation with the base category, so they are invalidated along with it
+    """
+    return CACHE_CATEGORY_SCOPE_SEPARATOR.join([category] + [str(scope) for scope in scopes])
+
+
+def _get_cache_generation_key(category, course_id):
+    """
+    Returns cache key of the generation counter of a base category in given course
+    """
+    return "edx_solutions_api_integration.generation.{category}.{course_id}".format(
+        category=str(category).split(CACHE_CATEGORY_SCOPE_SEPARATOR)[0],
+        course_id=str(course_id),
+    )
+
+
+def _new_cache_generation():
+    """
+    Generations start from current time so that an evicted counter never restarts at a value used before
+    """
+    return int(time.time() * 1000)
+
+
+def get_cache_generations(categories, course_id):
+    """
+    Returns a dict of current generation of each given category in a course, fetched in a single cache round trip
+    """
+    generation_keys = {category: _get_cache_generation_key(category, course_id) for category in categories}
+    generations = cache.get_many(list(set(generation_keys.values())))
+    for generation_key in set(generation_keys.values()) - set(generations):
+        generation = _new_cache_generation()
+        if not cache.add(generation_key, generation, None):
+            generation = cache.get(generation_key, generation)
+        generations[generation_key] = generation
+
+    return {category: generations[generation_key] for category, generation_key in generation_keys.items()}
+
+
+def get_cache_generation(category, course_id):
+    """
+    Returns current generation of a category in a course. Callers which read and then cache data of the
+    category pass it to both, so data is cached under the generation it was computed for
+    """
+    return get_cache_generations([category], course_id)[category]
+
+
+def get_cache_ttl(category, default_ttl):
+    """
+    Returns how long data of a category is cached, longer for categories invalidated on every change
+    """
+    if str(category).split(CACHE_CATEGORY_SCOPE_SEPARATOR)[0] in INVALIDATED_CACHE_CATEGORIES:
+        return INVALIDATED_METRICS_CACHE_TTL
+    return default_ttl
+
+
+def get_cache_key(category, course_id, user_id=None, generation=None):
     """
     :param category: string which represents type of cache data e.g. `grade`, `progress`, `social_score`
     :param course_id: string course_id of course for which data is being cached
     :param user_id: int user_id of user for which data is being cached
+    :param generation: current generation of the category in course, looked up if not given
     :return:
     """
+    if generation is None:
+        generation = get_cache_generation(category, course_id)
 
-    return "edx_solutions_api_integration.{category}.{course_id}.{user_id}".format(
+    return "edx_solutions_api_integration.{category}.{course_id}.{generation}.{user_id}".format(
         category=category,
         course_id=str(course_id),
+        generation=generation,
         user_id=user_id,
     )
 
 
-def get_cached_data(category, course_id, user_id=None):
+class CacheStats:
+    """
+    Counters of cache hits, misses and sets, and of serialized size of cached payloads, tagged by
+    cache category. Each worker counts in process and adds its counts to counters shared by all
+    workers in cache every `flush_interval` seconds, and before reading them. Size of payloads is
+    measured on one set out of `size_sample_rate` of each category and extrapolated to all sets.
+    Categories are registered in numbered slots of a shared count, the first worker adding a category
+    taking its slot, so concurrent flushes never drop each other's categories
+    """
+    EVENTS = ('hits', 'misses', 'sets', 'sampled_sets', 'sampled_bytes')
+    KEY_PREFIX = 'edx_solutions_api_integration.cache_stats'
+
+    def __init__(self, flush_interval=CACHE_STATS_FLUSH_INTERVAL, size_sample_rate=CACHE_STATS_SIZE_SAMPLE_RATE):
+        self.flush_interval = flush_interval
+        self.size_sample_rate = size_sample_rate
+        self._counters = defaultdict(lambda: dict.fromkeys(self.EVENTS, 0))
+        self._set_counts = defaultdict(int)
+        self._flushed_at = time.time()
+        self._lock = threading.Lock()
+
+    def _get_key(self, category, event):
+        return '{}.{}.{}'.format(self.KEY_PREFIX, category, event)
+
+    def _get_registry_key(self, slot='count'):
+        return '{}.categories.{}'.format(self.KEY_PREFIX, slot)
+
+    def _register_categories(self, categories):
+        count_key = self._get_registry_key()
+        for category in categories:
+            if not cache.add(self._get_key(category, 'registered'), True, None):
+                continue
+            try:
+                slot = cache.incr(count_key)
+            except ValueError:
+                cache.add(count_key, 0, None)
+                slot = cache.incr(count_key)
+            cache.set(self._get_registry_key(slot), category, None)
+
+    def _get_categories(self):
+        count = cache.get(self._get_registry_key()) or 0
+        slots = cache.get_many([self._get_registry_key(slot) for slot in range(1, count + 1)])
+        return set(slots.values())
+
+    def _increment(self, category, event, value=1):
+        with self._lock:
+            self._counters[category][event] += value
+            flush_due = time.time() - self._flushed_at >= self.flush_interval
+        if flush_due:
+            self.flush()
+
+    @staticmethod
+    def _get_base_category(category):
+        # scoped categories e.g. `grade:<org_id>` are counted under their base category
+        return category.split(CACHE_CATEGORY_SCOPE_SEPARATOR, 1)[0]
+
+    def record_get(self, category, data):
+        """
+        Records a cache lookup of a category, a miss if no data was found
+        """
+        self._increment(self._get_base_category(category), 'misses' if data is None else 'hits')
+
+    def record_set(self, category, data):
+        """
+        Records caching of data in a category, measuring its pickled size on sampled sets
+        """
+        category = self._get_base_category(category)
+        with self._lock:
+            self._set_counts[category] += 1
+            is_sampled = (self._set_counts[category] - 1) % self.size_sample_rate == 0
+        if is_sampled:
+            with self._lock:
+                self._counters[category]['sampled_sets'] += 1
+                self._counters[category]['sampled_bytes'] += len(pickle.dumps(data, pickle.HIGHEST_PROTOCOL))
+        self._increment(category, 'sets')
+
+    def flush(self):
+        """
+        Adds counts of this worker to shared counters and resets them
+        """
+        with self._lock:
+            counters, self._counters = self._counters, defaultdict(lambda: dict.fromkeys(self.EVENTS, 0))
+            self._flushed_at = time.time()
+        if not counters:
+            return
+
+        self._register_categories(counters)
+        for category, category_counters in counters.items():
+            for event, value in category_counters.items():
+                if not value:
+                    continue
+                key = self._get_key(category, event)
+                if cache.add(key, value, None):
+                    continue
+                try:
+                    cache.incr(key, value)
+                except ValueError:
+                    # counter expired or was reset meanwhile
+                    cache.set(key, value, None)
+
+    def get_stats(self):
+        """
+        Returns a dict of counters of all workers keyed by category, with hit ratio and average payload size
+        """
+        self.flush()
+        categories = self._get_categories()
+        keys = [self._get_key(category, event) for category in categories for event in self.EVENTS]
+        values = cache.get_many(keys)
+        stats = {}
+        for category in categories:
+            counters = {event: values.get(self._get_key(category, event), 0) for event in self.EVENTS}
+            sampled_sets = counters.pop('sampled_sets')
+            sampled_bytes = counters.pop('sampled_bytes')
+            lookups = counters['hits'] + counters['misses']
+            counters['hit_ratio'] = float(counters['hits']) / lookups if lookups else None
+            counters['avg_set_bytes'] = float(sampled_bytes) / sampled_sets if sampled_sets else None
+            counters['set_bytes'] = int(round(counters['avg_set_bytes'] * counters['sets'])) if sampled_sets else 0
+            stats[category] = counters
+        return stats
+
+    def reset(self):
+        """
+        Resets counters of this worker and shared counters
+        """
+        with self._lock:
+            self._counters.clear()
+            self._set_counts.clear()
+        categories = self._get_categories()
+        count = cache.get(self._get_registry_key()) or 0
+        cache.delete_many(
+            [self._get_registry_key(slot) for slot in ['count'] + list(range(1, count + 1))] +
+            [self._get_key(category, 'registered') for category in categories] +
+            [self._get_key(category, event) for category in categories for event in self.EVENTS]
+        )
+
+
+CACHE_STATS = CacheStats()
+
+
+def get_cache_stats():
+    """
+    Returns cache effectiveness counters of all workers keyed by cache category
+    """
+    return CACHE_STATS.get_stats()
+
+
+def reset_cache_stats():
+    """
+    Resets cache effectiveness counters of all workers
+    """
+    CACHE_STATS.reset()
+
+
+def _merge_cached_data(metric_course_data, metric_user_data, user_id=None):
+    """
+    Combines course and user data of a metric the way `get_cached_data` returns it
+    """
+    if user_id:
+        if isinstance(metric_course_data, dict) and isinstance(metric_user_data, dict):
+            metric_course_data.update(metric_user_data)
+            return metric_course_data
+        return None
+    return metric_course_data
+
+
+def get_cached_data(category, course_id, user_id=None, generation=None):
     """
     Fetches cached data for a given metric, course and user
     If user_id is given, it makes sure both course and user data is available, if either
     course or user data is not available it returns None
     """
-    metric_course_key = get_cache_key(category, course_id)
+    if generation is None:
+        generation = get_cache_generation(category, course_id)
+    metric_course_key = get_cache_key(category, course_id, generation=generation)
     metric_course_data = cache.get(metric_course_key)
+    metric_user_data = None
     if user_id:
-        metric_cache_key = get_cache_key(category, course_id, user_id)
+        metric_cache_key = get_cache_key(category, course_id, user_id, generation=generation)
         metric_user_data = cache.get(metric_cache_key)
 
-        if isinstance(metric_course_data, dict) and isinstance(metric_user_data, dict):
-            metric_course_data.update(metric_user_data)
-            return metric_course_data
-    else:
-        return metric_course_data
+    data = _merge_cached_data(metric_course_data, metric_user_data, user_id)
+    CACHE_STATS.record_get(category, data)
+    return data
+
+
+def get_cached_data_many(categories, course_id, user_id=None, generations=None):
+    """
+    Fetches cached data of several metrics for a given course and user in a single cache round trip
+    after looking up generations of the categories, unless given. Returns a dict keyed by category,
+    every value follows the same rules as `get_cached_data`
+    """
+    if generations is None:
+        generations = get_cache_generations(categories, course_id)
+    course_keys = {
+        category: get_cache_key(category, course_id, generation=generations[category]) for category in categories
+    }
+    user_keys = {}
+    if user_id:
+        user_keys = {
+            category: get_cache_key(category, course_id, user_id, generation=generations[category])
+            for category in categories
+        }
+
+    cached_data = cache.get_many(list(course_keys.values()) + list(user_keys.values()))
+    data = {
+        category: _merge_cached_data(
+            cached_data.get(course_keys[category]),
+            cached_data.get(user_keys.get(category)),
+            user_id,
+        )
+        for category in categories
+    }
+    for category, category_data in data.items():
+        CACHE_STATS.record_get(category, category_data)
+    return data
+
+
+def cache_course_data(category, course_id, data, timeout=DEFAULT_TIMEOUT, generation=None):
+    """
+    caches course data for a given metric and course, for the TTL of the category unless `timeout` is given
+    """
+    metric_cache_key = get_cache_key(category, course_id, generation=generation)
+    if timeout is DEFAULT_TIMEOUT:
+        timeout = get_cache_ttl(category, COURSE_METRICS_CACHE_TTL)
+    cache.set(metric_cache_key, data, timeout)
+    CACHE_STATS.record_set(category, data)
 
 
-def cache_course_data(category, course_id, data):
+def cache_course_data_many(category_data, course_id, timeout=COURSE_METRICS_CACHE_TTL):
     """
-    caches course data for a given metric and course
+    caches course data of several metrics for a given course in a single cache round trip
     """
-    metric_cache_key = get_cache_key(category, course_id)
-    cache.set(metric_cache_key, data, COURSE_METRICS_CACHE_TTL)
+    generations = get_cache_generations(list(category_data), course_id)
+    cache.set_many({
+        get_cache_key(category, course_id, generation=generations[category]): data
+        for category, data in category_data.items()
+    }, timeout)
+    for category, data in category_data.items():
+        CACHE_STATS.record_set(category, data)
 
 
-def cache_course_user_data(category, course_id, user_id, data):
+def cache_course_user_data(category, course_id, user_id, data, generation=None):
     """
     caches user data for a given metric and course
     """
-    metric_cache_key = get_cache_key(category, course_id, user_id)
-    cache.set(metric_cache_key, data, USER_METRICS_CACHE_TTL)
+    metric_cache_key = get_cache_key(category, course_id, user_id, generation=generation)
+    cache.set(metric_cache_key, data, get_cache_ttl(category, USER_METRICS_CACHE_TTL))
+    CACHE_STATS.record_set(category, data)
+
+
+def recompute_course_data(category, course_id, compute):
+    """
+    Recomputes course data of a category with `compute` callable in a single worker at a time.
+    While one worker holds the recompute lock, concurrent callers are served the last computed
+    value instead of running the same computation, or when there is none yet, wait up to
+    `RECOMPUTE_WAIT_TIMEOUT` seconds for the holder's value before computing it themselves.
+    Stale copies are not versioned by cache generation, so they outlive invalidation of the category.
+    Returns a tuple of data and a flag telling whether the data is stale
+    """
+    lock_key = "edx_solutions_api_integration.recompute_lock.{category}.{course_id}".format(
+        category=category,
+        course_id=str(course_id),
+    )
+    stale_key = "edx_solutions_api_integration.stale.{category}.{course_id}".format(
+        category=category,
+        course_id=str(course_id),
+    )
+
+    if not cache.add(lock_key, True, RECOMPUTE_LOCK_TTL):
+        stale_data = cache.get(stale_key)
+        if stale_data is not None:
+            return stale_data, True
+        # nothing computed yet to fall back to, so the holder's value is polled for
+        deadline = time.time() + RECOMPUTE_WAIT_TIMEOUT
+        while time.time() < deadline:
+            time.sleep(RECOMPUTE_POLL_INTERVAL)
+            # the holder caches its value before releasing the lock
+            lock_held = cache.get(lock_key) is not None
+            data = cache.get(stale_key)
+            if data is not None:
+                return data, False
+            if not lock_held:
+                # the holder failed to compute data
+                break
+        return compute(), False
+
+    try:
+        data = compute()
+        cache.set(stale_key, data, STALE_METRICS_CACHE_TTL)
+    finally:
+        cache.delete(lock_key)
+    return data, False
+
+
+def invalidate_cache_generation(category, course_id):
+    """
+    Moves a category and categories depending on it to a new generation in given course, which
+    invalidates their course, scoped and user entries at once
+    """
+    generation_key = _get_cache_generation_key(category, course_id)
+    try:
+        cache.incr(generation_key)
+    except ValueError:
+        cache.set(generation_key, _new_cache_generation(), None)
+
+    for dependent_category in CACHE_CATEGORY_DEPENDENCIES.get(category, ()):
+        invalidate_cache_generation(dependent_category, course_id)
 
 
-def invalid_user_data_cache(category, course_id, user_id=None):
+def invalid_user_data_cache(category, course_id, user_id=None):  # pylint: disable=unused-argument
     """
-    Invalidates course and user's data cache for a category in given course
+    Invalidates course and users' data cache for a category in given course
     :param category:
     :param course_id:
-    :param user_id:
+    :param user_id: kept for backward compatibility, data of all users in course is invalidated
     """
-    course_cache_key = get_cache_key(category, course_id)
-    cache.delete(course_cache_key)
-    if user_id:
-        user_cache_key = get_cache_key(category, course_id, user_id)
-        cache.delete(user_cache_key)
+    invalidate_cache_generation(category, course_id)
+
+
+class LocalLRUCache:
+    """
+    Bounded in-process cache which evicts least recently used entries and expires entries
+    after `timeout` seconds. Entries are local to a worker, so keys must change when the
+    data is invalidated e.g. by embedding cache generation from `get_cache_key`
+    """
+
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Returns value of an unexpired entry and marks it as most recently used
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """
+        Adds an entry, evicting least recently used entries beyond `max_size`
+        """
+        with self._lock:
+            self._entries[key] = (time.time() + self.timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """
+        Removes an entry if present
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """
+        Removes all entries
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+EXCLUDE_USERS_LOCAL_CACHE = LocalLRUCache(EXCLUDE_USERS_LOCAL_CACHE_MAX_SIZE, EXCLUDE_USERS_LOCAL_CACHE_TTL)
+
+
+def _get_exclude_users_cached_data(cache_key):
+    """
+    Fetches excluded users from worker's local cache, falling back to shared cache
+    """
+    data = EXCLUDE_USERS_LOCAL_CACHE.get(cache_key)
+    if data is None:
+        data = cache.get(cache_key)
+        if data is not None:
+            EXCLUDE_USERS_LOCAL_CACHE.set(cache_key, data)
+    return data
+
+
+def _cache_exclude_users_data(cache_key, data, timeout=EXCLUDE_USERS_CACHE_TTL):
+    """
+    Caches excluded users in both shared and worker's local cache
+    """
+    cache.set(cache_key, data, timeout)
+    EXCLUDE_USERS_LOCAL_CACHE.set(cache_key, data)
+
+
+class RankIndex:
+    """
+    Sorted scores of a leaderboard, ranking higher scores first and among equal scores the earlier
+    modified first. Position lookups cost O(log N) comparisons instead of counting users ranked above.
+    `excluded_user_ids` are left out of the index when it is built and when scores are updated later
+    """
+
+    def __init__(self, rows=(), excluded_user_ids=()):
+        self.excluded_user_ids = frozenset(excluded_user_ids)
+        self._user_keys = {
+            user_id: self._key(user_id, score, modified)
+            for user_id, score, modified in rows if user_id not in self.excluded_user_ids
+        }
+        self._keys = sorted(self._user_keys.values())
+        self._lock = threading.Lock()
+        # sequence number of the last shared change applied to the index
+        self.applied_change = 0
+
+    @staticmethod
+    def _key(user_id, score, modified):
+        return -(score or 0), modified, user_id
+
+    def __len__(self):
+        return len(self._keys)
+
+    def update(self, user_id, score, modified):
+        """
+        Adds or moves a user's entry to the rank of given score
+        """
+        if user_id in self.excluded_user_ids:
+            return
+        with self._lock:
+            self._remove(user_id)
+            key = self._key(user_id, score, modified)
+            bisect.insort(self._keys, key)
+            self._user_keys[user_id] = key
+
+    def remove(self, user_id):
+        """
+        Removes a user's entry if present
+        """
+        with self._lock:
+            self._remove(user_id)
+
+    def _remove(self, user_id):
+        key = self._user_keys.pop(user_id, None)
+        if key is not None:
+            del self._keys[bisect.bisect_left(self._keys, key)]
+
+    def get_score(self, user_id):
+        """
+        Returns a user's score, None if user has no entry
+        """
+        key = self._user_keys.get(user_id)
+        return -key[0] if key is not None else None
+
+    def get_position(self, user_id):
+        """
+        Returns a user's 1-based position, None if user has no entry
+        """
+        with self._lock:
+            key = self._user_keys.get(user_id)
+            if key is None:
+                return None
+            return bisect.bisect_left(self._keys, key) + 1
+
+
+RANK_INDEX_LOCAL_CACHE = LocalLRUCache(RANK_INDEX_LOCAL_CACHE_MAX_SIZE, RANK_INDEX_LOCAL_CACHE_TTL)
+
+
+def _get_rank_index_changes_key(metric, course_id, sequence=None):
+    """
+    Returns key of the counter of shared changes of a rank index, or of the change with given sequence number
+    """
+    key = "edx_solutions_api_integration.rank_index_changes.{metric}.{course_id}".format(
+        metric=metric,
+        course_id=str(course_id),
+    )
+    if sequence is not None:
+        key = "{key}.{sequence}".format(key=key, sequence=sequence)
+    return key
+
+
+def record_rank_index_change(metric, course_id, user_id, score=None, modified=None):
+    """
+    Shares a change of a user's score with rank indexes of a metric in all workers,
+    `score` of None records removal of the user's entry
+    """
+    counter_key = _get_rank_index_changes_key(metric, course_id)
+    try:
+        sequence = cache.incr(counter_key)
+    except ValueError:
+        # first change of the course, or counter evicted, indexes rebuild when they find the counter behind them
+        cache.add(counter_key, 0, None)
+        try:
+            sequence = cache.incr(counter_key)
+        except ValueError:
+            return
+    cache.set(
+        _get_rank_index_changes_key(metric, course_id, sequence),
+        (user_id, score, modified),
+        RANK_INDEX_CHANGES_TTL,
+    )
+
+
+def _apply_rank_index_change(index, change):
+    user_id, score, modified = change
+    if score is None:
+        index.remove(user_id)
+    else:
+        index.update(user_id, score, modified)
+
+
+def get_rank_index(metric, course_id, build, exclude_users=None):
+    """
+    Returns worker local rank index of a metric in a course. Index is built from rows of
+    (user_id, score, modified) returned by `build` callable, then kept up to date by replaying
+    changes recorded by `record_rank_index_change` in any worker. Index is rebuilt when it
+    expires or falls too far behind shared changes. Users of `exclude_users`, a `UserExclusion`,
+    are left out of the index once when it is built, a separate index is kept for each exclusion
+    and is rebuilt when excluded users change
+    """
+    counter_key = _get_rank_index_changes_key(metric, course_id)
+    index_key = counter_key
+    if exclude_users is not None:
+        index_key = "{key}.{scope}".format(key=counter_key, scope=exclude_users.get_cache_scope())
+    last_change = cache.get(counter_key) or 0
+    index = RANK_INDEX_LOCAL_CACHE.get(index_key)
+    if index is not None and index.applied_change <= last_change <= \
+            index.applied_change + RANK_INDEX_MAX_REPLAYED_CHANGES:
+        sequences = list(range(index.applied_change + 1, last_change + 1))
+        change_keys = [_get_rank_index_changes_key(metric, course_id, sequence) for sequence in sequences]
+        changes = cache.get_many(change_keys) if change_keys else {}
+        if len(changes) == len(change_keys):
+            for change_key in change_keys:
+                _apply_rank_index_change(index, changes[change_key])
+            index.applied_change = last_change
+            return index
+
+    index = RankIndex(build(), excluded_user_ids=exclude_users or ())
+    index.applied_change = last_change
+    RANK_INDEX_LOCAL_CACHE.set(index_key, index)
+    return index
+
+
+def _get_course_access_roles(course_key):
+    """
+    Returns course access roles of a course, the roles excluded users are looked up in
+    """
+    return CourseAccessRole.objects.filter(course_id=course_key, org=course_key.org)
+
+
+def refresh_course_role_user_ids(course_key):
+    """
+    Rebuilds the cached dict of user ids by role in a course from course access roles.
+    The entry never expires, receivers refresh it whenever a course role is saved or deleted
+    """
+    role_user_ids = {}
+    course_roles = _get_course_access_roles(course_key).values_list('role', 'user_id')
+    for role, user_id in course_roles:
+        role_user_ids.setdefault(role, set()).add(user_id)
+
+    cache.set(get_cache_key('course_role_users', course_key), role_user_ids, None)
+    return role_user_ids
+
+
+def get_course_role_user_ids(course_key):
+    """
+    Returns a dict of user ids by role in a course
+    """
+    role_user_ids = cache.get(get_cache_key('course_role_users', course_key))
+    if role_user_ids is None:
+        role_user_ids = refresh_course_role_user_ids(course_key)
+    return role_user_ids
 
 
 def get_aggregate_exclusion_user_ids(course_key, roles=None):  # pylint: disable=invalid-name
@@ -184,23 +825,21 @@ def get_aggregate_exclusion_user_ids(course_key, roles=None):  # pylint: disable
     can either be passed in roles argument or defined in a AGGREGATION_EXCLUDE_ROLES settings variable.
     """
 
-    cache_key = get_cache_key('exclude_users', str(course_key) + '_'.join(roles or 'None'))
-    cached_data = cache.get(cache_key)
+    cache_key = get_cache_key(get_cache_category('exclude_users', *sorted(roles or [])), course_key)
+    cached_data = _get_exclude_users_cached_data(cache_key)
     if cached_data is not None:
-        return cached_data
-    exclude_user_ids = set()
+        # a copy, so that callers can't alter the worker's cached set
+        return set(cached_data)
     exclude_role_list = roles or getattr(settings, 'AGGREGATION_EXCLUDE_ROLES', [CourseObserverRole.ROLE])
 
+    role_user_ids = get_course_role_user_ids(course_key)
+    exclude_user_ids = set()
     for role in exclude_role_list:
-        users = CourseRole(role, course_key).users_with_role()
-        user_ids = set()
-        for user in users:
-            user_ids.add(user.id)
-
-        exclude_user_ids = exclude_user_ids.union(user_ids)
+        exclude_user_ids |= role_user_ids.get(role, set())
 
-    cache.set(cache_key, exclude_user_ids, 60 * 60)
-    return exclude_user_ids
+    # role changes move exclude_users to a new generation, so the entry doesn't need to expire
+    _cache_exclude_users_data(cache_key, exclude_user_ids, timeout=None)
+    return set(exclude_user_ids)
 
 
 def extract_data_params(request):
@@ -270,14 +909,79 @@ def detect_db_engine():
 
 
 def get_time_series_data(queryset, start, end, interval='days', date_field='created', date_field_model=None,
-                         aggregate=None):
+                         aggregate=None, rollup=None, cache_category=None, course_id=None):
     """
     Aggregate over time intervals to compute time series representation of data
+    `rollup` is an optional (course_key, metric, org_id) whose `CourseDailyMetric` values are used
+    for days before today when all of them are rolled up, leaving only today to aggregate.
+    When `cache_category` and `course_id` are given, values of intervals ending before today are cached
+    for `TIME_SERIES_CACHE_TTL`, leaving only intervals still open to compute. Only series bucketed by
+    a date which never changes, like creation date, are to be cached
     """
-    engine = detect_db_engine()
     start, _ = get_interval_bounds(start, interval.rstrip('s'))
     _, end = get_interval_bounds(end, interval.rstrip('s'))
+    today = strip_time(now())
+
+    dt_keys = []
+    dt_key = start
+    while dt_key < end:
+        dt_keys.append(dt_key)
+        dt_key += relativedelta(**{interval: 1})
+
+    data = {}
+    closed_categories = OrderedDict()
+    if cache_category and course_id:
+        closed_categories = OrderedDict(
+            (dt_key, get_cache_category(cache_category, interval, dt_key.strftime('%Y-%m-%d')))
+            for dt_key in dt_keys if dt_key + relativedelta(**{interval: 1}) <= today
+        )
+        cached_data = get_cached_data_many(list(closed_categories.values()), course_id)
+        data = {
+            dt_key: cached_data[category]
+            for dt_key, category in closed_categories.items() if cached_data[category] is not None
+        }
+
+    # intervals from the first one missing in cache on are computed
+    missing_dt_keys = [dt_key for dt_key in dt_keys if dt_key not in data]
+    if missing_dt_keys:
+        computed_data = _get_time_series_values(
+            queryset, missing_dt_keys[0], end, interval, date_field, date_field_model, aggregate, rollup
+        )
+        data.update({dt_key: computed_data.get(dt_key, 0) for dt_key in missing_dt_keys})
+        closed_data = {
+            closed_categories[dt_key]: data[dt_key] for dt_key in missing_dt_keys if dt_key in closed_categories
+        }
+        if closed_data:
+            cache_course_data_many(closed_data, course_id, timeout=TIME_SERIES_CACHE_TTL)
+
+    return [(dt_key, data[dt_key]) for dt_key in dt_keys]
+
+
+def _get_time_series_values(queryset, start, end, interval, date_field, date_field_model, aggregate, rollup):
+    """
+    Computes values of time intervals between start and end, from daily rollups for days before today
+    when available, returns a dict of interval start to value
+    """
+    today = strip_time(now())
+    data = None
+    if rollup and start < today:
+        data = _get_rolled_up_time_series_data(rollup, start, min(end + relativedelta(microseconds=1), today), interval)
+    if data is None:
+        data = _aggregate_time_series_data(queryset, start, end, interval, date_field, date_field_model, aggregate)
+    elif end > today:
+        today_data = _aggregate_time_series_data(
+            queryset, today, end, interval, date_field, date_field_model, aggregate
+        )
+        for dt_key, value in today_data.items():
+            data[dt_key] += value
+    return data
 
+
+def _aggregate_time_series_data(queryset, start, end, interval, date_field, date_field_model, aggregate):
+    """
+    Aggregates raw data between start and end by time interval, returns a dict of interval start to value
+    """
+    engine = detect_db_engine()
     if date_field_model:
         date_field = '`{}`.`{}`'.format(date_field_model._meta.db_table, date_field)  # pylint: disable=W0212
 
@@ -303,16 +1007,344 @@ def get_time_series_data(queryset, start, end, interval='days', date_field='crea
         annotate(agg=aggregate)
 
     today = strip_time(now())
-    data = {strip_time(parse_datetime(item['d'], today)): item['agg'] for item in aggregate_data}
+    data = defaultdict(int)
+    for item in aggregate_data:
+        data[strip_time(parse_datetime(item['d'], today))] += item['agg']
+    return data
 
-    series = []
-    dt_key = start
-    while dt_key < end:
-        value = data.get(dt_key, 0)
-        series.append((dt_key, value,))
-        dt_key += relativedelta(**{interval: 1})
 
-    return series
+def _get_rolled_up_time_series_data(rollup, start, end, interval):
+    """
+    Sums up final daily values of a course metric from start up to end excluded by time interval,
+    returns a dict of interval start to value or None if any of the days isn't rolled up yet
+    """
+    from edx_solutions_api_integration.models import CourseDailyMetric
+    course_key, metric, org_id = rollup
+    if metric not in CourseDailyMetric.ROLLUP_METRICS:
+        return None
+
+    daily_values = CourseDailyMetric.get_daily_values(course_key, metric, start.date(), end.date(), org_id=org_id)
+    if daily_values is None:
+        return None
+
+    data = defaultdict(int)
+    for day, value in daily_values.items():
+        dt_key, _ = get_interval_bounds(strip_time(day), interval.rstrip('s'))
+        data[dt_key] += value
+    return data
+
+
+def _can_use_threads():
+    """
+    Tells whether database queries can run in worker threads, which isn't the case on SQLite
+    whose test databases are not visible to connections of other threads
+    """
+    return detect_db_engine() != 'sqlite'
+
+
+def _call_in_thread(func, *args, **kwargs):
+    """
+    Calls a function in a worker thread, closing thread's database connection when done
+    """
+    try:
+        return func(*args, **kwargs)
+    finally:
+        connection.close()
+
+
+def run_concurrently(calls, max_workers=1):
+    """
+    Runs independent calls, given as a dict of name to (function, args, kwargs), on a pool of at most
+    `max_workers` threads each using its own database connection, and returns a dict of name to result.
+    Calls are run one after another with a single worker or when threads can't be used.
+    """
+    if max_workers <= 1 or len(calls) <= 1 or not _can_use_threads():
+        return {name: func(*args, **kwargs) for name, (func, args, kwargs) in calls.items()}
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(calls))) as executor:
+        futures = {
+            name: executor.submit(_call_in_thread, func, *args, **kwargs)
+            for name, (func, args, kwargs) in calls.items()
+        }
+        return {name: future.result() for name, future in futures.items()}
+
+
+class MetricSection:
+    """
+    Declares a section of a metrics response computed by `compute(context, dependencies_data)` once sections
+    it depends on are computed, `dependencies_data` being their data by section name. A section returns a dict
+    of response data and is reported as timed out when it takes longer than `timeout` seconds, or as unavailable
+    when it raises one of `expected_errors`. Other errors are raised to the caller
+    """
+
+    def __init__(self, compute, dependencies=(), timeout=None, expected_errors=()):
+        self.compute = compute
+        self.dependencies = tuple(dependencies)
+        self.timeout = timeout
+        self.expected_errors = tuple(expected_errors)
+
+
+def _get_sections_order(sections, names):
+    """
+    Returns given section names along with names of sections they depend on, dependencies first
+    """
+    order = []
+
+    def _add_section(name):
+        if name not in order:
+            for dependency in sections[name].dependencies:
+                _add_section(dependency)
+            order.append(name)
+
+    for name in names:
+        _add_section(name)
+    return order
+
+
+def compute_metric_sections(sections, names, context, max_workers=1, timeouts=None):
+    """
+    Computes given sections of a registry of `MetricSection` by name, along with sections they depend on,
+    at most `max_workers` at a time in worker threads each using its own database connection. A section starts
+    as soon as its dependencies are computed and `timeouts` by section name override declared timeouts.
+    Returns merged data of computed sections and a dict of error messages of sections which raised an expected
+    error, timed out or depend on such a section. Sections are computed one after another, without timeouts,
+    with a single worker or when threads can't be used
+    """
+    order = _get_sections_order(sections, names)
+    timeouts = dict(timeouts or {})
+    results, errors = {}, {}
+
+    def _get_dependencies_data(name):
+        return {dependency: results[dependency] for dependency in sections[name].dependencies}
+
+    def _get_failed_dependency(name):
+        return next((dependency for dependency in sections[name].dependencies if dependency in errors), None)
+
+    if max_workers <= 1 or not _can_use_threads():
+        for name in order:
+            failed_dependency = _get_failed_dependency(name)
+            if failed_dependency:
+                errors[name] = "{} is not available".format(failed_dependency)
+                continue
+            try:
+                results[name] = sections[name].compute(context, _get_dependencies_data(name))
+            except sections[name].expected_errors as e:
+                log.warning("Failed to compute %s metrics: %s", name, e)
+                errors[name] = "unavailable"
+    else:
+        pending = list(order)
+        running = {}
+        # a thread per section so sections start once submitted, and sections which timed out only hold
+        # threads of this request, which finish in background once the request is served
+        executor = ThreadPoolExecutor(max_workers=len(order))
+        try:
+            while pending or running:
+                for name in list(pending):
+                    failed_dependency = _get_failed_dependency(name)
+                    if failed_dependency:
+                        errors[name] = "{} is not available".format(failed_dependency)
+                        pending.remove(name)
+                    elif len(running) < max_workers and all(
+                            dependency in results for dependency in sections[name].dependencies
+                    ):
+                        timeout = timeouts.get(name, sections[name].timeout)
+                        future = executor.submit(
+                            _call_in_thread, sections[name].compute, context, _get_dependencies_data(name)
+                        )
+                        running[future] = (name, time.time() + timeout if timeout else None)
+                        pending.remove(name)
+                if not running:
+                    continue
+
+                deadlines = [deadline for _, deadline in running.values() if deadline]
+                wait_timeout = max(min(deadlines) - time.time(), 0) if deadlines else None
+                done, _ = wait(running, timeout=wait_timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, _ = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except sections[name].expected_errors as e:
+                        log.warning("Failed to compute %s metrics: %s", name, e)
+                        errors[name] = "unavailable"
+
+                for future, (name, deadline) in list(running.items()):
+                    if deadline and deadline <= time.time():
+                        # the worker thread can't be interrupted, its result is dropped
+                        log.warning("Computing %s metrics timed out", name)
+                        errors[name] = "timed out"
+                        running.pop(future)
+        finally:
+            executor.shutdown(wait=False)
+
+    data = {}
+    for name in order:
+        data.update(results.get(name, {}))
+    return data, errors
+
+
+class CircuitBreaker:
+    """
+    In-process circuit breaker of calls to a remote service. After `failure_threshold` consecutive failures
+    the circuit opens and calls are refused for `reset_timeout` seconds, then a single trial call is let
+    through which closes the circuit on success or opens it again on failure. State is local to a worker
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def _get_state(self):
+        if self._opened_at is None:
+            return self.CLOSED
+        if time.time() - self._opened_at < self.reset_timeout:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    @property
+    def state(self):
+        """
+        Current state of the circuit
+        """
+        with self._lock:
+            return self._get_state()
+
+    def allow_request(self):
+        """
+        Tells whether a call can be attempted, letting a single trial call through once the circuit is half open
+        """
+        with self._lock:
+            state = self._get_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        """
+        Closes the circuit after a successful call
+        """
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        """
+        Counts a failed call, opening the circuit once failures reach the threshold or a trial call failed
+        """
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                self._opened_at = time.time()
+            self._trial_running = False
+
+    def release_trial(self):
+        """
+        Lets another trial call through after a call which failed for reasons unrelated to the service
+        """
+        with self._lock:
+            self._trial_running = False
+
+    def reset(self):
+        """
+        Closes the circuit and forgets failures
+        """
+        self.record_success()
+
+
+class ForumStatsUnavailable(Exception):
+    """
+    Raised when forum stats can't be fetched and no previous result is cached
+    """
+
+
+# errors of the forum service a forum stats call may raise, which don't mean a bug of the caller
+FORUM_SERVICE_ERRORS = (CommentClientError, RequestException, ForumStatsUnavailable)
+
+
+FORUM_STATS_CIRCUIT_BREAKER = CircuitBreaker(FORUM_CIRCUIT_FAILURE_THRESHOLD, FORUM_CIRCUIT_RESET_TIMEOUT)
+# forum calls outliving their deadline hold one of these threads instead of a request worker
+FORUM_STATS_EXECUTOR = ThreadPoolExecutor(max_workers=FORUM_STATS_MAX_WORKERS)
+
+
+def _fetch_forum_stats(fetch, *args):
+    """
+    Calls the forum service within `FORUM_STATS_DEADLINE` seconds, inline when threads can't be used
+    """
+    if not _can_use_threads():
+        return fetch(*args)
+
+    deadline = getattr(settings, 'FORUM_STATS_DEADLINE', FORUM_STATS_DEADLINE)
+    future = FORUM_STATS_EXECUTOR.submit(_call_in_thread, fetch, *args)
+    try:
+        return future.result(timeout=deadline)
+    except FutureTimeoutError:
+        future.cancel()
+        raise ForumStatsUnavailable("Forum service did not respond in {} seconds".format(deadline))
+
+
+def _is_forum_outage(error):
+    """
+    Tells whether an error of a forum call means the forum service is down or overloaded, unlike
+    errors about the request itself such as a user unknown to the forum
+    """
+    if isinstance(error, (RequestConnectionError, Timeout, ForumStatsUnavailable, CommentClient500Error,
+                          CommentClientMaintenanceError)):
+        return True
+    return isinstance(getattr(error, 'status_code', None), int) and error.status_code >= 500
+
+
+def get_forum_stats(category, course_id, fetch, *args, user_id=None):
+    """
+    Fetches forum stats of a course, or of a user in a course, with `fetch(*args)` guarded by the forum
+    circuit breaker and deadline. Stats are memoized for `FORUM_STATS_CACHE_TTL` seconds and the last good
+    result is served while the forum service fails or the circuit is open, errors are raised only when
+    there is no previous result. Only connection errors, timeouts and server errors open the circuit,
+    errors other than `FORUM_SERVICE_ERRORS` are raised as they are and leave the circuit as it is.
+    Returns a tuple of stats and a flag telling whether they are stale
+    """
+    cache_key = "edx_solutions_api_integration.forum_stats.{category}.{course_id}.{user_id}".format(
+        category=category,
+        course_id=str(course_id),
+        user_id=user_id,
+    )
+    cached = cache.get(cache_key)
+    if cached is not None and time.time() - cached[0] < getattr(settings, 'FORUM_STATS_CACHE_TTL',
+                                                                FORUM_STATS_CACHE_TTL):
+        return cached[1], False
+
+    error = ForumStatsUnavailable("Forum service is unavailable")
+    if FORUM_STATS_CIRCUIT_BREAKER.allow_request():
+        try:
+            stats = _fetch_forum_stats(fetch, *args)
+        except FORUM_SERVICE_ERRORS as e:
+            if _is_forum_outage(e):
+                FORUM_STATS_CIRCUIT_BREAKER.record_failure()
+            else:
+                # forum service answered, so it is up whatever the error
+                FORUM_STATS_CIRCUIT_BREAKER.record_success()
+            log.warning("Failed to fetch %s of course %s from forum service: %s", category, course_id, e)
+            error = e
+        except Exception:
+            FORUM_STATS_CIRCUIT_BREAKER.release_trial()
+            raise
+        else:
+            FORUM_STATS_CIRCUIT_BREAKER.record_success()
+            cache.set(cache_key, (time.time(), stats), STALE_METRICS_CACHE_TTL)
+            return stats, False
+
+    if cached is not None:
+        return cached[1], True
+    raise error
 
 
 def get_user_from_request_params(request, url_params):
@@ -482,21 +1514,117 @@ def get_image_dimensions(image_url):
         return img.size
 
 
+def _get_non_actual_company_users_queryset(exclude_type, organization_id):
+    """
+    Returns users of an organization belonging to a group of `exclude_type` (e.g. company admins) whose
+    first organization, ordered by id, is another one
+    """
+    return User.objects.filter(
+        groups__groupprofile__name=exclude_type,
+        organizations__id=organization_id,
+    ).filter(organizations__id__lt=organization_id)
+
+
 def get_non_actual_company_users(exclude_type, organization_id):
     """
     This helper method will return users which are not part of an actual organization
     """
-    cache_key = get_cache_key('exclude_users', exclude_type, str(organization_id))
-    cached_data = cache.get(cache_key)
+    cache_key = get_cache_key(get_cache_category('non_company_users', exclude_type), organization_id)
+    cached_data = _get_exclude_users_cached_data(cache_key)
     if cached_data is not None:
-        return cached_data
-    admin_users = User.objects.filter(id__in=list(Organization.objects.filter(
-        id=organization_id, users__groups__groupprofile__name=exclude_type
-    ).distinct().values_list('users', flat=True)))
-
-    exclude_user_ids = [user.id for user in admin_users if user.organizations.all()[0].id != int(organization_id)]
-    cache.set(cache_key, exclude_user_ids, 60 * 60)
-    return exclude_user_ids
+        return list(cached_data)
+
+    exclude_user_ids = list(set(
+        _get_non_actual_company_users_queryset(exclude_type, organization_id).values_list('id', flat=True)
+    ))
+    _cache_exclude_users_data(cache_key, exclude_user_ids)
+    return list(exclude_user_ids)
+
+
+class UserExclusion:
+    """
+    Users left out of aggregate queries: users having one of excluded `roles` in a course and, when
+    `organization_id` and `exclude_type` are given, users who are not part of the actual organization.
+    Querysets are filtered with correlated NOT EXISTS subqueries over course roles and organization
+    membership (see `exclude_users_from`), so their SQL doesn't grow with the number of excluded users.
+    Iterating or checking membership reads the cached excluded user ids instead, for code ranking
+    users in Python or passing ids on to other apps
+    """
+
+    def __init__(self, course_key=None, roles=None, organization_id=None, exclude_type=None):
+        self.course_key = course_key
+        self.roles = roles
+        self.organization_id = organization_id
+        self.exclude_type = exclude_type
+        self._user_ids = None
+
+    def get_user_ids(self):
+        """
+        Returns a set of excluded user ids
+        """
+        if self._user_ids is None:
+            user_ids = set()
+            if self.course_key:
+                user_ids |= get_aggregate_exclusion_user_ids(self.course_key, roles=self.roles)
+            if self.organization_id and self.exclude_type:
+                user_ids |= set(get_non_actual_company_users(self.exclude_type, self.organization_id))
+            self._user_ids = user_ids
+        return self._user_ids
+
+    def __iter__(self):
+        return iter(self.get_user_ids())
+
+    def __contains__(self, user_id):
+        return user_id in self.get_user_ids()
+
+    def __len__(self):
+        return len(self.get_user_ids())
+
+    def get_cache_scope(self):
+        """
+        Returns a cache scope identifying excluded users, which changes along with cache generations
+        moved when excluded users change
+        """
+        scopes = []
+        if self.course_key:
+            scopes += [get_cache_generation('exclude_users', self.course_key)] + sorted(self.roles or [])
+        if self.organization_id and self.exclude_type:
+            scopes += [
+                self.organization_id,
+                self.exclude_type,
+                get_cache_generation('non_company_users', self.organization_id),
+            ]
+        return get_cache_category('exclusion', *scopes)
+
+    def exclude_from(self, queryset, user_field='user_id'):
+        """
+        Filters out excluded users from a queryset whose `user_field` holds user ids
+        """
+        if self.course_key:
+            excluded_roles = _get_course_access_roles(self.course_key).filter(
+                user_id=OuterRef(user_field),
+                role__in=self.roles or getattr(settings, 'AGGREGATION_EXCLUDE_ROLES', [CourseObserverRole.ROLE]),
+            )
+            queryset = queryset.annotate(has_excluded_role=Exists(excluded_roles)).filter(has_excluded_role=False)
+
+        if self.organization_id and self.exclude_type:
+            other_company_users = _get_non_actual_company_users_queryset(
+                self.exclude_type, self.organization_id
+            ).filter(id=OuterRef(user_field))
+            queryset = queryset.annotate(
+                is_other_company_user=Exists(other_company_users)
+            ).filter(is_other_company_user=False)
+        return queryset
+
+
+def exclude_users_from(queryset, exclude_users, user_field='user_id'):
+    """
+    Filters out `exclude_users` from a queryset whose `user_field` holds user ids, with NOT EXISTS
+    subqueries for a `UserExclusion` or a NOT IN list of ids otherwise
+    """
+    if isinstance(exclude_users, UserExclusion):
+        return exclude_users.exclude_from(queryset, user_field)
+    return queryset.exclude(**{'{}__in'.format(user_field): exclude_users or []})
 
 
 class Round(Func):